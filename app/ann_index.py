@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+THEME_INDEX_BACKEND = os.getenv("THEME_INDEX_BACKEND", "auto")
+ANN_MIN_SIZE = int(os.getenv("ANN_MIN_SIZE", "5000"))
+ANN_CANDIDATES = int(os.getenv("ANN_CANDIDATES", "32"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+def default_index_dir() -> str:
+    """Directory for persisted index files: THEME_INDEX_DIR, else next to the SQLite database, else ./data."""
+    path = os.getenv("THEME_INDEX_DIR")
+    if not path:
+        database_url = os.getenv("DATABASE_URL", "")
+        if database_url.startswith("sqlite:///") and database_url != "sqlite:///:memory:":
+            path = os.path.dirname(os.path.abspath(database_url[len("sqlite:///"):]))
+        else:
+            path = os.path.abspath("./data")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class IVFIndex:
+    """Inverted-file index in pure NumPy.
+
+    Rows are bucketed by their nearest k-means centroid; a query only scans the
+    buckets of its `nprobe` nearest centroids.
+    """
+
+    name = "ivf"
+
+    def __init__(self, dim: int, nprobe: int = IVF_NPROBE, iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.lists: List[List[int]] = []
+        self.trained_size = 0
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.lists)
+
+    def build(self, matrix: np.ndarray) -> None:
+        """Train centroids on the matrix and assign every row to a bucket."""
+        size = len(matrix)
+        nlist = max(1, int(np.sqrt(size)))
+        rng = np.random.default_rng(self.seed)
+        sample = matrix[rng.choice(size, size=min(size, 64 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        self.centroids = centroids
+        self.lists = [[] for _ in range(nlist)]
+        for start in range(0, size, 8192):
+            assignment = np.argmax(matrix[start:start + 8192] @ centroids.T, axis=1)
+            for offset, c in enumerate(assignment):
+                self.lists[c].append(start + offset)
+        self.trained_size = size
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        self.lists[int(np.argmax(self.centroids @ vector))].append(row)
+
+    def query(self, vector: np.ndarray, k: int) -> np.ndarray:
+        """Return candidate rows from the buckets nearest to the query."""
+        probes = np.argsort(self.centroids @ vector)[-self.nprobe:]
+        return np.fromiter((row for c in probes for row in self.lists[c]), dtype=np.int64)
+
+    def needs_rebuild(self, size: int) -> bool:
+        return size > 2 * self.trained_size
+
+    def save(self, path: str) -> None:
+        lengths = np.array([len(bucket) for bucket in self.lists], dtype=np.int64)
+        rows = np.fromiter((row for bucket in self.lists for row in bucket), dtype=np.int64)
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, lengths=lengths, rows=rows,
+                     trained_size=np.array(self.trained_size))
+
+    def load(self, path: str) -> None:
+        data = np.load(path)
+        self.centroids = data["centroids"]
+        self.lists = [bucket.tolist() for bucket in np.split(data["rows"], np.cumsum(data["lengths"])[:-1])]
+        self.trained_size = int(data["trained_size"])
+
+
+class HnswlibIndex:
+    """HNSW graph index backed by hnswlib."""
+
+    name = "hnswlib"
+
+    def __init__(self, dim: int, m: int = 16, ef_construction: int = 200):
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.index = None
+
+    def __len__(self) -> int:
+        return self.index.get_current_count() if self.index is not None else 0
+
+    def _init(self, capacity: int) -> None:
+        self.index = hnswlib.Index(space="ip", dim=self.dim)
+        self.index.init_index(max_elements=capacity, M=self.m, ef_construction=self.ef_construction)
+        self.index.set_ef(max(64, ANN_CANDIDATES))
+
+    def build(self, matrix: np.ndarray) -> None:
+        self._init(max(1024, 2 * len(matrix)))
+        self.index.add_items(matrix, np.arange(len(matrix)))
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        if len(self) >= self.index.get_max_elements():
+            self.index.resize_index(2 * self.index.get_max_elements())
+        self.index.add_items(vector.reshape(1, -1), np.array([row]))
+
+    def query(self, vector: np.ndarray, k: int) -> np.ndarray:
+        labels, _ = self.index.knn_query(vector.reshape(1, -1), k=min(k, len(self)))
+        return labels[0].astype(np.int64)
+
+    def needs_rebuild(self, size: int) -> bool:
+        return False
+
+    def save(self, path: str) -> None:
+        self.index.save_index(path)
+
+    def load(self, path: str) -> None:
+        self.index = hnswlib.Index(space="ip", dim=self.dim)
+        self.index.load_index(path)
+        self.index.set_ef(max(64, ANN_CANDIDATES))
+
+
+class FaissIndex:
+    """HNSW graph index backed by faiss (inner product on normalized vectors)."""
+
+    name = "faiss"
+
+    def __init__(self, dim: int, m: int = 32):
+        self.dim = dim
+        self.m = m
+        self.index = None
+
+    def __len__(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def build(self, matrix: np.ndarray) -> None:
+        self.index = faiss.IndexHNSWFlat(self.dim, self.m, faiss.METRIC_INNER_PRODUCT)
+        self.index.add(np.ascontiguousarray(matrix, dtype=np.float32))
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        # faiss HNSW assigns sequential labels, which match ThemeIndex rows
+        self.index.add(vector.reshape(1, -1).astype(np.float32))
+
+    def query(self, vector: np.ndarray, k: int) -> np.ndarray:
+        _, labels = self.index.search(vector.reshape(1, -1).astype(np.float32), min(k, len(self)))
+        return labels[0][labels[0] >= 0].astype(np.int64)
+
+    def needs_rebuild(self, size: int) -> bool:
+        return False
+
+    def save(self, path: str) -> None:
+        faiss.write_index(self.index, path)
+
+    def load(self, path: str) -> None:
+        self.index = faiss.read_index(path)
+
+
+BACKENDS = {"ivf": IVFIndex, "hnswlib": HnswlibIndex, "faiss": FaissIndex}
+
+
+def resolve_backend(name: str = THEME_INDEX_BACKEND) -> Optional[str]:
+    """Map a configured backend name to an available one (None means exact search)."""
+    if name == "exact":
+        return None
+    if name == "auto":
+        if hnswlib is not None:
+            return "hnswlib"
+        if faiss is not None:
+            return "faiss"
+        return "ivf"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown theme index backend: {name}")
+    if (name == "hnswlib" and hnswlib is None) or (name == "faiss" and faiss is None):
+        logger.warning(f"Theme index backend {name} is not installed, falling back to ivf")
+        return "ivf"
+    return name
+
+
+def create_backend(name: str, dim: int):
+    return BACKENDS[name](dim)
+
+
+def save_backend(backend, ids: List[int], model_name: str, directory: str) -> None:
+    """Persist an ANN backend with the theme ids its rows refer to."""
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"theme_index.{backend.name}")
+    backend.save(base)
+    with open(f"{base}.json", "w") as f:
+        json.dump({"backend": backend.name, "model": model_name, "dim": backend.dim, "ids": ids}, f)
+
+
+def load_backend(name: str, dim: int, model_name: str, directory: str):
+    """Load a persisted backend, returning it with the theme ids it covers, or (None, [])."""
+    base = os.path.join(directory, f"theme_index.{name}")
+    if not (os.path.exists(base) and os.path.exists(f"{base}.json")):
+        return None, []
+    try:
+        with open(f"{base}.json") as f:
+            meta = json.load(f)
+        if meta["model"] != model_name or meta["dim"] != dim:
+            return None, []
+        backend = create_backend(name, dim)
+        backend.load(base)
+        return backend, meta["ids"]
+    except Exception as e:
+        logger.warning(f"Could not load persisted theme index {base}: {str(e)}")
+        return None, []
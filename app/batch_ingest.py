@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from dotenv import load_dotenv
+
+from .feed_processor import FeedProcessor
+from .feed_stream import FETCH_TIMEOUT, USER_AGENT, download_feed_async
+from .metrics import STAGE_SECONDS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", "20"))
+MAX_FETCHES_PER_HOST = int(os.getenv("MAX_FETCHES_PER_HOST", "2"))
+
+
+class BatchIngester:
+    """Fetch many feeds concurrently and process them through one NLP worker.
+
+    Downloads run on an asyncio HTTP client with a global concurrency cap and
+    a per-host cap, and are written to temporary files rather than held in
+    memory. Fetched feeds are handed to a single worker thread, so the
+    model and theme index are used by one feed at a time while the next feeds
+    are still downloading.
+    """
+
+    def __init__(
+        self,
+        feed_processor: FeedProcessor,
+        max_concurrency: int = MAX_CONCURRENT_FETCHES,
+        per_host: int = MAX_FETCHES_PER_HOST,
+        timeout: float = FETCH_TIMEOUT
+    ):
+        self.feed_processor = feed_processor
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self._nlp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp-worker")
+        logger.info("BatchIngester initialized")
+
+    async def _fetch(
+        self,
+        client: httpx.AsyncClient,
+        feed_url: str
+    ) -> Tuple[int, Dict[str, str], Optional[IO[bytes]], int]:
+        """Download the feed into a temporary file, conditionally if validators from a previous fetch are stored."""
+        loop = asyncio.get_running_loop()
+        etag, modified = await loop.run_in_executor(None, self.feed_processor.get_feed_validators, feed_url)
+        return await download_feed_async(client, feed_url, etag, modified)
+
+    async def _ingest_one(
+        self,
+        client: httpx.AsyncClient,
+        feed_url: str,
+        global_limit: asyncio.Semaphore,
+        host_limits: Dict[str, asyncio.Semaphore]
+    ) -> Dict:
+        """Fetch and process a single feed, returning its report entry."""
+        host = urlparse(feed_url).netloc
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        try:
+            fetch_start = time.time()
+            # Wait for the host first, so feeds queued behind a busy host hold no global slot
+            async with host_limit, global_limit:
+                status, headers, body, size = await self._fetch(client, feed_url)
+            fetch_time = time.time() - fetch_start
+            STAGE_SECONDS.labels("fetch").observe(fetch_time)
+            logger.info(f"Fetched {feed_url} ({size} bytes) in {fetch_time:.2f} seconds")
+        except Exception as e:
+            logger.error(f"Error fetching feed {feed_url}: {str(e)}")
+            return {"feed_url": feed_url, "message": "Error fetching feed", "error": str(e)}
+
+        loop = asyncio.get_running_loop()
+        if status == 304:
+            # Writes go through the NLP worker too, so SQLite sees a single writer
+            await loop.run_in_executor(self._nlp_executor, self.feed_processor.record_not_modified, feed_url)
+            logger.info(f"Feed not modified since last fetch: {feed_url}")
+            return {
+                "feed_url": feed_url,
+                "fetch_time": fetch_time,
+                "message": "Feed not modified",
+                "processed": 0,
+                "skipped": 0,
+                "not_modified": True
+            }
+
+        # The body stays in a temporary file and is parsed incrementally if large; process_feed closes it
+        result = await loop.run_in_executor(
+            self._nlp_executor,
+            self.feed_processor.process_feed,
+            feed_url,
+            body,
+            headers
+        )
+        return {"feed_url": feed_url, "fetch_time": fetch_time, **result}
+
+    async def ingest(self, feed_urls: List[str]) -> Dict:
+        """Ingest many feeds concurrently and return a per-feed report."""
+        start_time = time.time()
+        feed_urls = list(dict.fromkeys(feed_urls))
+        logger.info(f"Starting batch ingestion of {len(feed_urls)} feeds")
+
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency
+        )
+        async with httpx.AsyncClient(
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT}
+        ) as client:
+            feeds = await asyncio.gather(*[
+                self._ingest_one(client, feed_url, global_limit, host_limits) for feed_url in feed_urls
+            ])
+
+        total_time = time.time() - start_time
+        failed = sum(1 for feed in feeds if "error" in feed)
+        not_modified = sum(1 for feed in feeds if feed.get("not_modified"))
+        logger.info(f"Batch ingestion of {len(feed_urls)} feeds completed in {total_time:.2f} seconds ({failed} failed)")
+        return {
+            "message": f"Processed {len(feed_urls) - failed} of {len(feed_urls)} feeds",
+            "processed": sum(feed.get("processed", 0) for feed in feeds),
+            "skipped": sum(feed.get("skipped", 0) for feed in feeds),
+            "failed": failed,
+            "not_modified": not_modified,
+            "total_time": total_time,
+            "feeds": feeds
+        }
+
+    def shutdown(self) -> None:
+        self._nlp_executor.shutdown(wait=True)
+
+
+def read_feed_urls(paths: List[str]) -> List[str]:
+    """Collect feed URLs from arguments, or from files listing one URL per line."""
+    feed_urls = []
+    for path in paths:
+        if os.path.isfile(path):
+            with open(path) as f:
+                feed_urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+        else:
+            feed_urls.append(path)
+    return feed_urls
+
+
+def main(argv: Optional[List[str]] = None):
+    import json
+
+    from .database import create_db_and_tables
+    from .nlp_processor import NLPProcessor
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Ingest many feeds concurrently")
+    parser.add_argument("feeds", nargs="+", help="Feed URLs, or files with one feed URL per line")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_FETCHES)
+    parser.add_argument("--per-host", type=int, default=MAX_FETCHES_PER_HOST)
+    args = parser.parse_args(argv)
+
+    create_db_and_tables()
+    ingester = BatchIngester(
+        FeedProcessor(NLPProcessor()),
+        max_concurrency=args.concurrency,
+        per_host=args.per_host
+    )
+    try:
+        report = asyncio.run(ingester.ingest(read_feed_urls(args.feeds)))
+    finally:
+        ingester.shutdown()
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
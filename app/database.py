@@ -1,12 +1,213 @@
 from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event, inspect, text
+import logging
 import os
+import numpy as np
 from dotenv import load_dotenv
+from .vector_type import EMBEDDING_DIM, pgvector_enabled
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./insights.db")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Logging every statement is expensive, so it is on only at DEBUG unless set explicitly
+SQL_ECHO = os.getenv("SQL_ECHO", str(LOG_LEVEL == "DEBUG")).lower() in ("1", "true", "yes")
+
+# Connection pool (PostgreSQL and other server databases)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # in seconds
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # in seconds
+# SQLite: wait this long for a lock instead of failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+# SQLite: write-ahead logging lets readers run alongside the single writer
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000})
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+# Set on the logger rather than with echo=True, which adds a second handler;
+# WARNING keeps statements out of the log even when the root level is DEBUG
+logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if SQL_ECHO else logging.WARNING)
+
+if engine.dialect.name == "sqlite":
+    # pysqlite's implicit transaction handling breaks SAVEPOINT; let
+    # SQLAlchemy emit BEGIN itself so nested transactions work.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_WAL and DATABASE_URL not in ("sqlite://", "sqlite:///:memory:"):
+            cursor.execute("PRAGMA journal_mode = WAL")
+            # Durable at checkpoints only, which WAL makes safe against corruption
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+def _add_missing_columns():
+    """Add model columns and indexes missing from existing tables (create_all never alters tables).
+
+    Returns the (table, column) pairs that were added.
+    """
+    inspector = inspect(engine)
+    added = set()
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(ddl))
+                added.add((table.name, column.name))
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+    return added
+
+def _backfill_theme_stats():
+    """Compute theme post counts and first/last seen dates from existing posts."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE theme SET "
+            "post_count = (SELECT COUNT(*) FROM post WHERE post.theme_id = theme.id), "
+            "first_seen_at = (SELECT MIN(published_at) FROM post WHERE post.theme_id = theme.id), "
+            "last_seen_at = (SELECT MAX(published_at) FROM post WHERE post.theme_id = theme.id)"
+        ))
+
+SQLITE_SEARCH_DDL = [
+    # External-content FTS5 table: the text lives only in `post`, triggers keep the index in sync
+    "CREATE VIRTUAL TABLE post_fts USING fts5("
+    "title, content, content='post', content_rowid='id', tokenize='porter unicode61')",
+    # Title matches weigh more than content matches in bm25 ranking
+    "INSERT INTO post_fts(post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "INSERT INTO post_fts(post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS post_fts_insert AFTER INSERT ON post BEGIN "
+    "INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_delete AFTER DELETE ON post BEGIN "
+    "INSERT INTO post_fts(post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS post_fts_update AFTER UPDATE OF title, content ON post BEGIN "
+    "INSERT INTO post_fts(post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE post ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_post_search_vector ON post USING GIN (search_vector)",
+]
+
+def _create_search_index():
+    """Create the full-text index over post titles and content for the current dialect."""
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_fts'"
+                )).first()
+                if not exists:
+                    logger.info("Creating post_fts full-text index")
+                    for ddl in SQLITE_SEARCH_DDL:
+                        conn.execute(text(ddl))
+                for ddl in SQLITE_SEARCH_TRIGGERS:
+                    conn.execute(text(ddl))
+            elif engine.dialect.name == "postgresql":
+                for ddl in POSTGRES_SEARCH_DDL:
+                    conn.execute(text(ddl))
+    except Exception as e:
+        logger.warning(f"Could not create full-text search index: {str(e)}")
+
+POSTGRES_VECTOR_INDEX_DDL = [
+    # Cosine distance matches the normalized embeddings ThemeIndex searches
+    "CREATE INDEX IF NOT EXISTS ix_theme_embedding_hnsw ON theme USING hnsw (embedding vector_cosine_ops)",
+]
+
+def _create_vector_extension():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+def _convert_embedding_columns(batch_size: int = 1000):
+    """Convert embedding BLOB (bytea) columns left by earlier versions to pgvector columns.
+
+    Embeddings whose dimension differs from EMBEDDING_DIM are dropped and
+    re-encoded when the theme index loads.
+    """
+    inspector = inspect(engine)
+    for table in ("theme", "post"):
+        if not inspector.has_table(table):
+            continue
+        with engine.begin() as conn:
+            data_type = conn.execute(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = 'embedding'"
+            ), {"table": table}).scalar()
+        if data_type != "bytea":
+            continue
+        logger.info(f"Converting {table}.embedding to vector({EMBEDDING_DIM})")
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN embedding_vector vector({EMBEDDING_DIM})"))
+            last_id = 0
+            while True:
+                rows = conn.execute(text(
+                    f"SELECT id, embedding FROM {table} WHERE id > :last_id AND embedding IS NOT NULL "
+                    "ORDER BY id LIMIT :limit"
+                ), {"last_id": last_id, "limit": batch_size}).all()
+                if not rows:
+                    break
+                values = []
+                for row_id, blob in rows:
+                    embedding = np.frombuffer(bytes(blob), dtype=np.float32)
+                    if len(embedding) == EMBEDDING_DIM:
+                        values.append({"id": row_id, "vector": "[" + ",".join(map(str, embedding.tolist())) + "]"})
+                if values:
+                    conn.execute(text(
+                        f"UPDATE {table} SET embedding_vector = CAST(:vector AS vector) WHERE id = :id"
+                    ), values)
+                last_id = rows[-1][0]
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN embedding"))
+            conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN embedding_vector TO embedding"))
 
-engine = create_engine(DATABASE_URL, echo=True)
+def _create_vector_index():
+    """Create the approximate nearest-neighbour index used by PgvectorThemeIndex."""
+    try:
+        with engine.begin() as conn:
+            for ddl in POSTGRES_VECTOR_INDEX_DDL:
+                conn.execute(text(ddl))
+    except Exception as e:
+        logger.warning(f"Could not create theme embedding index: {str(e)}")
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine) 
\ No newline at end of file
+    use_pgvector = pgvector_enabled(engine.dialect.name)
+    if use_pgvector:
+        _create_vector_extension()
+    SQLModel.metadata.create_all(engine)
+    added = _add_missing_columns()
+    if ("theme", "post_count") in added:
+        _backfill_theme_stats()
+    _create_search_index()
+    if use_pgvector:
+        _convert_embedding_columns()
+        _create_vector_index()
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .ann_index import default_index_dir
+from .metrics import CACHE_LOOKUPS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_BYTES = int(os.getenv("EMBEDDING_CACHE_BYTES", str(64 * 1024 * 1024)))
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+# Bounds the number of parameters in one SQLite IN (...) lookup
+DISK_LOOKUP_BATCH = 500
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Hash of the model name and whitespace-normalized text."""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.blake2b(f"{model_name}\0{normalized}".encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """Two-tier cache of sentence embeddings.
+
+    The first tier is an in-process LRU bounded by the bytes of the cached
+    vectors. The second is a SQLite file shared by every process and kept
+    across restarts. Vectors found on disk are promoted into the LRU.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = EMBEDDING_CACHE_BYTES,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        disk: bool = EMBEDDING_CACHE_DISK
+    ):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.disk = disk
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Open the disk tier on first use, disabling it if the file can't be opened."""
+        if self._conn is None and self.disk:
+            try:
+                if self.path is None:
+                    self.path = os.path.join(default_index_dir(), "embedding_cache.db")
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS embedding (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                logger.warning(f"Embedding disk cache disabled, could not open {self.path}: {str(e)}")
+                self.disk = False
+        return self._conn
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        if vector.nbytes > self.max_bytes:
+            return
+        self._memory[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """Look keys up in memory, then on disk; returns None for misses."""
+        with self._lock:
+            found: Dict[bytes, np.ndarray] = {}
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            memory_hits = sum(1 for key in keys if key in found)
+
+            missing = list(dict.fromkeys(key for key in keys if key not in found))
+            conn = self._connection() if missing else None
+            if conn is not None:
+                try:
+                    for start in range(0, len(missing), DISK_LOOKUP_BATCH):
+                        batch = missing[start:start + DISK_LOOKUP_BATCH]
+                        rows = conn.execute(
+                            f"SELECT key, vector FROM embedding WHERE key IN ({','.join('?' * len(batch))})", batch
+                        ).fetchall()
+                        for key, blob in rows:
+                            vector = np.frombuffer(blob, dtype=np.float32)
+                            found[key] = vector
+                            self._remember(key, vector)
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache lookup failed: {str(e)}")
+            hits = sum(1 for key in keys if key in found)
+            self.memory_hits += memory_hits
+            self.disk_hits += hits - memory_hits
+            self.misses += len(keys) - hits
+            CACHE_LOOKUPS.labels("embedding", "hit").inc(memory_hits)
+            CACHE_LOOKUPS.labels("embedding", "disk_hit").inc(hits - memory_hits)
+            CACHE_LOOKUPS.labels("embedding", "miss").inc(len(keys) - hits)
+            return [found.get(key) for key in keys]
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Store freshly computed vectors in both tiers."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                # Copy so a cached row doesn't keep the whole batch array alive
+                self._remember(key, vector.copy())
+            conn = self._connection()
+            if conn is not None:
+                try:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO embedding (key, vector) VALUES (?, ?)",
+                        [(key, vector.tobytes()) for key, vector in zip(keys, vectors)]
+                    )
+                    conn.commit()
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache write failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        """Hit counters and current size, for sizing the cache."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_enabled": self.disk,
+            }
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR")
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8", "remote")
+
+
+def onnx_model_dir(model_name: str) -> str:
+    """Directory holding the exported ONNX model and tokenizer for a model name."""
+    return ONNX_MODEL_DIR or os.path.join("data", "onnx", model_name.replace("/", "__"))
+
+
+class TorchEncoder:
+    """sentence-transformers model running on torch, optionally int8-quantized.
+
+    Dynamic quantization converts the Linear layers' weights to int8 at load
+    time, which speeds up CPU inference at a small cost in accuracy.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, model=None):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.inference_backend = "torch-int8" if quantize else "torch"
+        self.model = model
+
+    def load(self) -> None:
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+        if self.quantize:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class OnnxEncoder:
+    """Transformer exported to ONNX, run with ONNX Runtime without importing torch.
+
+    Reproduces the sentence-transformers pipeline: tokenize, run the
+    transformer, pool the token embeddings (mean or CLS, as recorded at
+    export) and L2-normalize.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, directory: Optional[str] = None):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.inference_backend = "onnx-int8" if quantize else "onnx"
+        self.directory = directory or onnx_model_dir(model_name)
+        self.session = None
+        self.tokenizer = None
+        self.input_names = set()
+        self.pooling = "mean"
+        self.max_seq_length = 256
+
+    def load(self) -> None:
+        if onnxruntime is None:
+            raise RuntimeError("The onnx embedding backends need onnxruntime (pip install onnxruntime)")
+        filename = "model.int8.onnx" if self.quantize else "model.onnx"
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            raise RuntimeError(
+                f"{path} not found; export it with: python -m app.preload_model --export onnx"
+                + (" --quantize" if self.quantize else "")
+            )
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(self.directory, "encoder.json")) as f:
+            config = json.load(f)
+        self.pooling = config.get("pooling", "mean")
+        self.max_seq_length = config.get("max_seq_length", self.max_seq_length)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.directory)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            inputs = {name: value.astype(np.int64) for name, value in tokens.items() if name in self.input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+            if self.pooling == "cls":
+                pooled = token_embeddings[:, 0]
+            else:
+                mask = tokens["attention_mask"][..., None].astype(np.float32)
+                pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled)
+        embeddings = np.concatenate(batches).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+
+def create_encoder(backend: str, model_name: str, model=None):
+    """Build the (not yet loaded) encoder for an EMBEDDING_BACKEND value."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if backend == "remote":
+        from .nlp_worker import RemoteEncoder
+        return RemoteEncoder(model_name)
+    quantize = backend.endswith("-int8")
+    if backend.startswith("onnx"):
+        return OnnxEncoder(model_name, quantize=quantize)
+    return TorchEncoder(model_name, quantize=quantize, model=model)
@@ -1,23 +1,101 @@
 import feedparser
+import hashlib
+import io
+import json
 import logging
+import os
+import threading
 import time
-from datetime import datetime
-from typing import List, Tuple, Dict
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import IO, Callable, List, Tuple, Dict, Optional, Union
+from sqlalchemy import case, or_, update
 from sqlmodel import Session, select
 from fastapi import BackgroundTasks
 import asyncio
+import numpy as np
 
-from .models import Post, Theme, PostCreate
+from .models import Feed, Post, Theme, PostCreate
 from .database import engine
+from .feed_stream import download_feed, is_http_url, iter_entries, streaming_enabled
+from .metrics import FEEDS, STAGE_SECONDS, observe_feed
 from .nlp_processor import NLPProcessor
+from .post_index import PostIndex
+from .response_cache import invalidate_all, invalidate_posts
+from .theme_clustering import THEME_MERGE_THRESHOLD, recluster_themes
+from .pgvector_index import PgvectorThemeIndex
+from .theme_index import ThemeIndex, from_blob, to_blob
+from .vector_type import pgvector_enabled
 
 logger = logging.getLogger(__name__)
 
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "200"))
+FEED_POLL_INTERVAL = int(os.getenv("FEED_POLL_INTERVAL", "3600"))
+MAX_FEED_ITEMS = int(os.getenv("MAX_FEED_ITEMS", "0")) or None
+
 class FeedProcessor:
-    def __init__(self, nlp_processor: NLPProcessor):
+    def __init__(
+        self,
+        nlp_processor: NLPProcessor,
+        chunk_size: int = INGEST_CHUNK_SIZE,
+        max_items: Optional[int] = MAX_FEED_ITEMS
+    ):
         self.nlp_processor = nlp_processor
+        self.chunk_size = chunk_size
+        self.max_items = max_items
+        self.theme_index: Optional[ThemeIndex] = None
+        self.post_index: Optional[PostIndex] = None
+        # Fetching and thesis extraction run in parallel; theme assignment and
+        # the writes of a chunk are serialized, so a theme created by one feed
+        # is visible to the next and SQLite sees a single writer of posts and themes
+        self.write_lock = threading.RLock()
         logger.info("FeedProcessor initialized")
 
+    def load_theme_index(self, session: Session, rebuild: bool = False) -> ThemeIndex:
+        """Load the cached theme embeddings into memory, or use the pgvector index on PostgreSQL."""
+        index_class = PgvectorThemeIndex if pgvector_enabled(engine.dialect.name) else ThemeIndex
+        self.theme_index = index_class.load(session, self.nlp_processor, rebuild=rebuild)
+        return self.theme_index
+
+    def load_post_index(self, session: Session) -> PostIndex:
+        """Open the memory-mapped post embedding matrix."""
+        self.post_index = PostIndex.load(session, self.nlp_processor.model_name)
+        return self.post_index
+
+    def recluster_themes(self, threshold: float = THEME_MERGE_THRESHOLD) -> Dict:
+        """Recompute theme centroids, merge near-duplicate themes and reload the theme index."""
+        with self.write_lock, Session(engine) as session:
+            result = recluster_themes(session, self.nlp_processor.model_name, threshold)
+            self.load_theme_index(session)
+        self.theme_index.save()
+        invalidate_all()
+        return result
+
+    def _assign_theme(self, session: Session, thesis: str, embedding, new_themes: List[Theme]) -> int:
+        """Return the id of the matching theme, inserting a new one if none is similar.
+
+        New themes are flushed (not committed) so they get an id inside the
+        current transaction, and are added to the index so later entries in
+        the same feed can match them.
+        """
+        is_similar, theme_id = self.nlp_processor.find_similar_theme(embedding, self.theme_index)
+        if is_similar:
+            logger.debug(f"Using existing theme {theme_id}")
+            return theme_id
+
+        theme = Theme(
+            thesis=thesis,
+            embedding=to_blob(embedding),
+            embedding_model=self.nlp_processor.model_name
+        )
+        with session.begin_nested():
+            session.add(theme)
+            session.flush()
+        self.theme_index.add(theme.id, embedding)
+        new_themes.append(theme)
+        logger.debug(f"Created new theme {theme.id}")
+        return theme.id
+
     def _extract_content(self, entry) -> str:
         """Extract content from an RSS entry, handling different feed formats."""
         logger.debug(f"Extracting content from entry: {entry.title if hasattr(entry, 'title') else 'No title'}")
@@ -63,169 +141,491 @@ class FeedProcessor:
             logger.warning(f"Error parsing date for entry {entry.link}: {str(e)}")
             return datetime.now()
 
-    def process_feed(self, feed_url: str) -> Dict:
-        """Process a feed URL and return the results."""
+    def _get_updated_date(self, entry) -> Optional[datetime]:
+        """Extract the entry's last-updated timestamp, if the feed provides one."""
+        if hasattr(entry, 'updated_parsed') and entry.updated_parsed:
+            return datetime(*entry.updated_parsed[:6])
+        return None
+
+    def _content_hash(self, entry, content: str) -> str:
+        """Hash the fields of an entry that feed into a stored post."""
+        title = entry.title if hasattr(entry, 'title') else ''
+        return hashlib.sha256(f"{title}\0{content}".encode("utf-8")).hexdigest()
+
+    def get_feed_validators(self, feed_url: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return the ETag and Last-Modified values stored for a feed."""
+        with Session(engine) as session:
+            feed = session.exec(select(Feed).where(Feed.url == feed_url)).first()
+            if feed is None:
+                return None, None
+            return feed.etag, feed.last_modified
+
+    def _record_fetch(
+        self,
+        feed_url: str,
+        etag: Optional[str],
+        modified: Optional[str],
+        status: Optional[int],
+        entry_ids: Optional[List[str]]
+    ) -> None:
+        """Store the validators and entry ids from a fetch of the feed.
+
+        The feed's next poll is pushed back a full interval, so the scheduler
+        does not poll a feed that was just ingested through the API.
+        """
+        try:
+            with Session(engine) as session:
+                feed = session.exec(select(Feed).where(Feed.url == feed_url)).first()
+                if feed is None:
+                    feed = Feed(url=feed_url)
+                feed.last_fetched_at = datetime.utcnow()
+                feed.next_poll_at = feed.last_fetched_at + timedelta(seconds=FEED_POLL_INTERVAL)
+                feed.last_status = status
+                if status != 304:
+                    feed.etag = etag
+                    feed.last_modified = modified
+                if entry_ids is not None:
+                    feed.last_entry_ids = json.dumps(entry_ids)
+                session.add(feed)
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Could not record fetch state for {feed_url}: {str(e)}")
+
+    def record_not_modified(self, feed_url: str) -> None:
+        """Note a 304 response, keeping the stored validators."""
+        self._record_fetch(feed_url, None, None, 304, None)
+
+    def _update_theme_stats(self, session: Session, saved: List[Tuple]) -> None:
+        """Apply post count and first/last seen changes for the themes posts joined or left.
+
+        First/last seen dates only ever widen; they are not narrowed when a
+        post moves to another theme.
+        """
+        deltas: Dict[int, int] = {}
+        seen: Dict[int, Tuple[datetime, datetime]] = {}
+        for post, _, old_theme_id, _ in saved:
+            if post.theme_id == old_theme_id or post.theme_id is None:
+                continue
+            deltas[post.theme_id] = deltas.get(post.theme_id, 0) + 1
+            if old_theme_id is not None:
+                deltas[old_theme_id] = deltas.get(old_theme_id, 0) - 1
+        for post, _, _, _ in saved:
+            if post.theme_id is None:
+                continue
+            first, last = seen.get(post.theme_id, (post.published_at, post.published_at))
+            seen[post.theme_id] = (min(first, post.published_at), max(last, post.published_at))
+
+        for theme_id in set(deltas) | set(seen):
+            values = {"post_count": Theme.post_count + deltas.get(theme_id, 0)}
+            if theme_id in seen:
+                first, last = seen[theme_id]
+                values["first_seen_at"] = case(
+                    (or_(Theme.first_seen_at == None, Theme.first_seen_at > first), first),  # noqa: E711
+                    else_=Theme.first_seen_at
+                )
+                values["last_seen_at"] = case(
+                    (or_(Theme.last_seen_at == None, Theme.last_seen_at < last), last),  # noqa: E711
+                    else_=Theme.last_seen_at
+                )
+            session.execute(
+                update(Theme).where(Theme.id == theme_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+    def _current_embedding(self, post: Optional[Post]) -> Optional[np.ndarray]:
+        """The stored thesis embedding of a post, if it was computed with the current model."""
+        if post is None or post.embedding is None or post.embedding_model != self.nlp_processor.model_name:
+            return None
+        return from_blob(post.embedding)
+
+    def _update_theme_centroids(self, session: Session, saved: List[Tuple]) -> Dict[int, np.ndarray]:
+        """Move the centroids of themes that posts joined or left, and return them.
+
+        A theme's embedding is the running mean of its posts' thesis
+        embeddings, with its post count as the weight of the current mean.
+        Posts stored without an embedding leave the mean unchanged; the
+        re-clustering job (app.theme_clustering) recomputes exact centroids.
+        """
+        sums: Dict[int, np.ndarray] = {}
+        counts: Dict[int, int] = {}
+
+        def fold(theme_id: Optional[int], vector: Optional[np.ndarray], sign: int) -> None:
+            if theme_id is None or vector is None:
+                return
+            sums[theme_id] = sums.get(theme_id, 0) + sign * vector
+            counts[theme_id] = counts.get(theme_id, 0) + sign
+
+        for post, values, old_theme_id, old_embedding in saved:
+            new_embedding = from_blob(values["embedding"]) if values["embedding"] is not None else None
+            if post.theme_id == old_theme_id and (
+                new_embedding is None and old_embedding is None
+                or new_embedding is not None and old_embedding is not None
+                and np.array_equal(new_embedding, old_embedding)
+            ):
+                continue
+            fold(old_theme_id, old_embedding, -1)
+            fold(post.theme_id, new_embedding, 1)
+        if not sums:
+            return {}
+
+        centroids = {}
+        model_name = self.nlp_processor.model_name
+        rows = session.exec(
+            select(Theme.id, Theme.embedding, Theme.embedding_model, Theme.post_count)
+            .where(Theme.id.in_(list(sums)))
+        ).all()
+        for theme_id, blob, embedding_model, post_count in rows:
+            if blob is not None and embedding_model == model_name and post_count > 0:
+                total = from_blob(blob) * post_count + sums[theme_id]
+                size = post_count + counts[theme_id]
+            else:
+                total, size = sums[theme_id], counts[theme_id]
+            if size <= 0 or not np.any(total):
+                continue
+            centroids[theme_id] = (total / size).astype(np.float32)
+        if centroids:
+            session.execute(
+                update(Theme),
+                [
+                    {"id": theme_id, "embedding": to_blob(centroid), "embedding_model": model_name}
+                    for theme_id, centroid in centroids.items()
+                ]
+            )
+        return centroids
+
+    def _process_chunk(
+        self,
+        session: Session,
+        chunk: List[Tuple],
+        existing_hashes: Dict[str, Optional[str]],
+        timings: Dict[str, float]
+    ) -> int:
+        """Extract theses for a chunk of entries and persist them in one transaction.
+
+        Thesis extraction runs outside `write_lock`, so several feeds can
+        use the model at once; theme assignment and the writes hold it.
+        Returns the number of posts written.
+        """
+        thesis_start = time.time()
+        theses = self.nlp_processor.extract_thesis_batch([content for _, content, _ in chunk])
+        thesis_time = time.time() - thesis_start
+        timings["thesis"] = timings.get("thesis", 0.0) + thesis_time
+        logger.info(f"Extracted theses for {len(chunk)} entries in {thesis_time:.2f} seconds")
+
+        with self.write_lock:
+            return self._persist_chunk(session, chunk, theses, existing_hashes, timings)
+
+    def _persist_chunk(
+        self,
+        session: Session,
+        chunk: List[Tuple],
+        theses: List[Tuple],
+        existing_hashes: Dict[str, Optional[str]],
+        timings: Dict[str, float]
+    ) -> int:
+        """Assign themes to a chunk's posts and write them in one transaction.
+
+        Posts are written in a single flush; if that fails, each post is
+        retried in its own savepoint so one bad entry doesn't lose the chunk.
+        Must be called with `write_lock` held. Returns the number of posts written.
+        """
+        write_start = time.time()
+        similarity_time = 0.0
+        existing_posts = {}
+        existing_urls = [entry.link for entry, _, _ in chunk if entry.link in existing_hashes]
+        if existing_urls:
+            existing_posts = {
+                post.url: post for post in session.exec(select(Post).where(Post.url.in_(existing_urls))).all()
+            }
+
+        # Pair each post with the field values to apply, so updates can be
+        # re-applied if the bulk flush is rolled back
+        writes = []
+        new_themes: List[Theme] = []
+        for (entry, content, content_hash), (thesis_statements, thesis_embedding) in zip(chunk, theses):
+            try:
+                post = existing_posts.get(entry.link)
+                if post is None and not thesis_statements:
+                    logger.warning(f"No thesis found for post: {entry.link}")
+                    continue
+
+                values = {
+                    "content": content,
+                    "published_at": self._get_published_date(entry),
+                    "feed_updated_at": self._get_updated_date(entry),
+                    "content_hash": content_hash,
+                }
+                if hasattr(entry, 'title'):
+                    values["title"] = entry.title
+                old_theme_id = post.theme_id if post is not None else None
+                old_embedding = self._current_embedding(post)
+                if post is None:
+                    post = Post(url=entry.link, **{"title": "No title", **values})
+
+                if thesis_statements:
+                    thesis = ' '.join(thesis_statements)
+                    logger.debug(f"Found thesis: {thesis[:100]}...")
+                    similarity_start = time.time()
+                    values["theme_id"] = self._assign_theme(session, thesis, thesis_embedding, new_themes)
+                    similarity_time += time.time() - similarity_start
+                    values["embedding"] = to_blob(thesis_embedding)
+                    values["embedding_model"] = self.nlp_processor.model_name
+                else:
+                    values["embedding"] = None
+                    values["embedding_model"] = None
+                writes.append((post, values, old_theme_id, old_embedding))
+            except Exception as e:
+                logger.error(f"Error processing entry {entry.link if hasattr(entry, 'link') else 'No link'}: {str(e)}")
+
+        saved = []
+        try:
+            with session.begin_nested():
+                for post, values, _, _ in writes:
+                    for field, value in values.items():
+                        setattr(post, field, value)
+                    session.add(post)
+                session.flush()
+            saved = writes
+        except Exception as e:
+            logger.warning(f"Bulk write failed ({str(e)}), retrying {len(writes)} posts individually")
+            for write in writes:
+                post, values, _, _ = write
+                try:
+                    with session.begin_nested():
+                        for field, value in values.items():
+                            setattr(post, field, value)
+                        session.add(post)
+                        session.flush()
+                    saved.append(write)
+                except Exception as e:
+                    logger.error(f"Error saving post {post.url}: {str(e)}")
+        written = len(saved)
+        # Themes created for posts that then failed to save would stay behind with no posts
+        used = {values.get("theme_id") for _, values, _, _ in saved}
+        orphans = [theme for theme in new_themes if theme.id not in used]
+        if orphans:
+            for theme in orphans:
+                session.delete(theme)
+            session.flush()
+            self.theme_index.remove([theme.id for theme in orphans])
+            new_themes = [theme for theme in new_themes if theme.id in used]
+            logger.info(f"Dropped {len(orphans)} new themes whose posts failed to save")
+        # Centroids are weighted by the post counts from before this chunk
+        centroids = self._update_theme_centroids(session, saved)
+        self._update_theme_stats(session, saved)
+        embeddings = [
+            (post.id, from_blob(values["embedding"]) if values["embedding"] is not None else None)
+            for post, values, _, _ in saved
+        ]
+
+        try:
+            session.commit()
+        except Exception:
+            session.rollback()
+            self.theme_index.remove([theme.id for theme in new_themes])
+            raise
+        self.theme_index.update(centroids)
+        self.post_index.update(embeddings)
+        if saved:
+            invalidate_posts(
+                theme_id for _, values, old_theme_id, _ in saved
+                for theme_id in (values.get("theme_id"), old_theme_id)
+            )
+
+        session.expunge_all()
+        write_time = time.time() - write_start - similarity_time
+        timings["similarity"] = timings.get("similarity", 0.0) + similarity_time
+        timings["write"] = timings.get("write", 0.0) + write_time
+        logger.info(f"Saved {written} posts and {len(new_themes)} new themes in {write_time:.2f} seconds")
+        return written
+
+    def process_feed(
+        self,
+        feed_url: str,
+        content: Optional[Union[bytes, IO[bytes]]] = None,
+        headers: Optional[Dict] = None,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict:
+        """Process a feed URL and return the results.
+
+        If `content` is given it is parsed instead of fetching `feed_url`;
+        it is either bytes or a binary file, such as a body from
+        `feed_stream.download_feed`, which is closed once processed.
+        `headers` are the HTTP response headers it was fetched with. Feeds
+        larger than FEED_STREAM_MIN_BYTES are parsed incrementally and
+        processed a chunk at a time, so memory does not grow with the feed.
+        `progress`, if given, is called with the keyword counters
+        entries_seen, processed, skipped and timings as work completes.
+        """
+        report = progress or (lambda **counters: None)
         logger.info(f"Starting feed processing: {feed_url}")
-        
+        body = None
+
         try:
             # Parse the feed
             feed_start = time.time()
             logger.info(f"Attempting to parse feed: {feed_url}")
-            feed = feedparser.parse(feed_url)
-            
-            # Log feed details
-            logger.info(f"Feed status: {feed.status if hasattr(feed, 'status') else 'No status'}")
-            logger.info(f"Feed version: {feed.version if hasattr(feed, 'version') else 'No version'}")
-            logger.info(f"Feed headers: {feed.headers if hasattr(feed, 'headers') else 'No headers'}")
-            logger.info(f"Feed bozo: {feed.bozo}")
-            if feed.bozo:
-                logger.error(f"Feed parsing error: {feed.bozo_exception}")
-            
-            if feed.bozo:
-                logger.error(f"Error parsing feed {feed_url}: {feed.bozo_exception}")
-                return {"message": "Error parsing feed", "error": str(feed.bozo_exception)}
-                
-            feed_time = time.time() - feed_start
-            logger.info(f"Feed parsed in {feed_time:.2f} seconds. Found {len(feed.entries)} entries.")
-            
-            if not feed.entries:
-                logger.warning(f"No entries found in feed: {feed_url}")
-                return {"message": "No entries found in feed"}
+            status = None
+            timings = {}
+            if content is None and is_http_url(feed_url):
+                # Download to a temporary file first so a large feed can be parsed incrementally
+                etag, modified = self.get_feed_validators(feed_url)
+                fetch_start = time.time()
+                status, headers, content, _ = download_feed(feed_url, etag, modified)
+                timings["fetch"] = time.time() - fetch_start
+                etag, modified = headers.get('etag', etag), headers.get('last-modified', modified)
+            elif content is not None:
+                validators = {key.lower(): value for key, value in (headers or {}).items()}
+                etag, modified = validators.get('etag'), validators.get('last-modified')
+
+            if content is not None and not isinstance(content, (bytes, bytearray)):
+                # A downloaded body: parse it incrementally unless it is small
+                body, content = content, None
+                size = body.seek(0, io.SEEK_END)
+                body.seek(0)
+                if not streaming_enabled(size):
+                    content = body.read()
+                    body.close()
+                    body = None
+            elif content is not None and streaming_enabled(len(content)):
+                body, content = io.BytesIO(content), None
+
+            if body is None and status != 304:
+                if content is not None:
+                    feed = feedparser.parse(content, response_headers=headers)
+                else:
+                    etag, modified = self.get_feed_validators(feed_url)
+                    feed = feedparser.parse(feed_url, etag=etag, modified=modified)
+                    etag, modified = feed.get('etag', etag), feed.get('modified', modified)
+                status = getattr(feed, 'status', status)
 
-            processed_posts = []
+            if status == 304:
+                self.record_not_modified(feed_url)
+                if "fetch" in timings:
+                    STAGE_SECONDS.labels("fetch").observe(timings["fetch"])
+                total_time = time.time() - feed_start
+                logger.info(f"Feed not modified since last fetch: {feed_url}")
+                FEEDS.labels("not_modified").inc()
+                return {
+                    "message": "Feed not modified",
+                    "processed": 0,
+                    "skipped": 0,
+                    "not_modified": True,
+                    "total_time": total_time
+                }
+
+            if body is not None:
+                logger.info(f"Streaming feed entries in chunks of {self.chunk_size}")
+                entries = iter_entries(body)
+            else:
+                # Log feed details
+                logger.info(f"Feed status: {feed.status if hasattr(feed, 'status') else 'No status'}")
+                logger.info(f"Feed version: {feed.version if hasattr(feed, 'version') else 'No version'}")
+                logger.debug(f"Feed headers: {feed.headers if hasattr(feed, 'headers') else 'No headers'}")
+                logger.info(f"Feed bozo: {feed.bozo}")
+                if feed.bozo:
+                    logger.error(f"Feed parsing error: {feed.bozo_exception}")
+
+                if feed.bozo:
+                    logger.error(f"Error parsing feed {feed_url}: {feed.bozo_exception}")
+                    FEEDS.labels("error").inc()
+                    return {"message": "Error parsing feed", "error": str(feed.bozo_exception)}
+
+                logger.info(f"Feed parsed in {time.time() - feed_start:.2f} seconds. Found {len(feed.entries)} entries.")
+                if self.max_items and len(feed.entries) > self.max_items:
+                    logger.info(f"Limiting feed to the first {self.max_items} entries (MAX_FEED_ITEMS)")
+                entries = iter(feed.entries)
+            if self.max_items:
+                entries = islice(entries, self.max_items)
+
+            timings["parse"] = time.time() - feed_start - timings.get("fetch", 0.0)
+            entries_seen = 0
+            entry_ids = []
+            processed_posts = 0
             skipped_posts = 0
-            
+            report(entries_seen=0, processed=0, skipped=0, timings=timings)
+
             with Session(engine) as session:
-                # Get existing themes for similarity comparison
+                # Get cached theme embeddings for similarity comparison
                 themes_start = time.time()
-                existing_themes = session.exec(
-                    select(Theme.id, Theme.thesis)
-                ).all()
+                with self.write_lock:
+                    if self.theme_index is None:
+                        self.load_theme_index(session)
+                    if self.post_index is None:
+                        self.load_post_index(session)
                 themes_time = time.time() - themes_start
-                logger.info(f"Retrieved {len(existing_themes)} existing themes in {themes_time:.2f} seconds")
-
-                # Get existing post URLs to avoid processing duplicates
-                urls_start = time.time()
-                existing_urls = set(session.exec(
-                    select(Post.url)
-                ).all())
-                urls_time = time.time() - urls_start
-                logger.info(f"Retrieved existing URLs in {urls_time:.2f} seconds")
-
-                for i, entry in enumerate(feed.entries):
-                    try:
-                        logger.info(f"Processing entry {i+1}/{len(feed.entries)}: {entry.title if hasattr(entry, 'title') else 'No title'}")
-                        logger.debug(f"Entry details: {entry}")
-                        
-                        # Skip if post already exists
-                        if entry.link in existing_urls:
-                            logger.info(f"Updating existing post: {entry.link}")
-                            # Get the existing post
-                            existing_post = session.exec(
-                                select(Post).where(Post.url == entry.link)
-                            ).first()
-                            
-                            # Update content and metadata
+                logger.info(f"Theme index holds {len(self.theme_index)} themes ({themes_time:.2f} seconds)")
+
+                while True:
+                    # Entries are read a chunk at a time; a streamed feed is parsed as they are pulled
+                    parse_start = time.time()
+                    batch = list(islice(entries, self.chunk_size))
+                    timings["parse"] += time.time() - parse_start
+                    if not batch:
+                        break
+                    entries_seen += len(batch)
+                    entry_ids.extend(entry.get('id', entry.get('link')) for entry in batch)
+
+                    # Get the stored content hashes of this chunk's posts to skip unchanged entries
+                    urls_start = time.time()
+                    links = [entry.link for entry in batch if hasattr(entry, 'link')]
+                    existing_hashes = dict(session.exec(
+                        select(Post.url, Post.content_hash).where(Post.url.in_(links))
+                    ).all())
+                    # End the read transaction so the chunk's writes start from a fresh snapshot
+                    session.commit()
+                    timings["lookup"] = timings.get("lookup", 0.0) + time.time() - urls_start
+
+                    pending = []
+                    for entry in batch:
+                        try:
                             content = self._extract_content(entry)
-                            if content:
-                                existing_post.content = content
-                                
-                            if hasattr(entry, 'title'):
-                                existing_post.title = entry.title
-                                
-                            existing_post.published_at = self._get_published_date(entry)
-                            
-                            # Extract and update thesis if content changed
-                            if content:
-                                thesis_statements = self.nlp_processor.extract_thesis(content)
-                                if thesis_statements:
-                                    thesis = ' '.join(thesis_statements)
-                                    # Check for similar themes
-                                    is_similar, theme_id = self.nlp_processor.find_similar_theme(
-                                        thesis, existing_themes
-                                    )
-                                    if is_similar:
-                                        existing_post.theme_id = theme_id
-                                    else:
-                                        theme = Theme(thesis=thesis)
-                                        session.add(theme)
-                                        session.commit()
-                                        session.refresh(theme)
-                                        existing_post.theme_id = theme.id
-                                        existing_themes.append((theme.id, theme.thesis))
-                            
-                            session.add(existing_post)
-                            session.commit()
-                            processed_posts.append(existing_post)
-                            continue
-
-                        # Extract content using the new method
-                        content = self._extract_content(entry)
-                        if not content:
-                            logger.warning(f"No content found for post: {entry.link}")
-                            continue
-
-                        # Extract thesis
-                        thesis_start = time.time()
-                        logger.info(f"Extracting thesis for: {entry.title if hasattr(entry, 'title') else 'No title'}")
-                        thesis_statements = self.nlp_processor.extract_thesis(content)
-                        thesis_time = time.time() - thesis_start
-                        
-                        if not thesis_statements:
-                            logger.warning(f"No thesis found for post: {entry.link}")
-                            continue
-
-                        thesis = ' '.join(thesis_statements)
-                        logger.info(f"Found thesis: {thesis[:100]}...")
-                        
-                        # Check for similar themes
-                        theme_start = time.time()
-                        is_similar, theme_id = self.nlp_processor.find_similar_theme(
-                            thesis, existing_themes
-                        )
-                        theme_time = time.time() - theme_start
-
-                        # Create or get theme
-                        if is_similar:
-                            theme = session.get(Theme, theme_id)
-                            logger.info(f"Using existing theme {theme_id}")
-                        else:
-                            theme = Theme(thesis=thesis)
-                            session.add(theme)
-                            session.commit()
-                            session.refresh(theme)
-                            existing_themes.append((theme.id, theme.thesis))
-                            logger.info(f"Created new theme {theme.id}")
-
-                        # Create post with the new date extraction method
-                        post = Post(
-                            title=entry.title if hasattr(entry, 'title') else 'No title',
-                            url=entry.link,
-                            content=content,
-                            published_at=self._get_published_date(entry),
-                            theme_id=theme.id
-                        )
-                        session.add(post)
-                        session.commit()
-                        processed_posts.append(post)
-                        
-                        logger.info(f"Processed post: {entry.link} (thesis: {thesis_time:.2f}s, theme: {theme_time:.2f}s)")
+                            content_hash = self._content_hash(entry, content)
+                            if existing_hashes.get(entry.link) == content_hash:
+                                logger.debug(f"Skipping unchanged post: {entry.link}")
+                                skipped_posts += 1
+                                continue
+                            if not content:
+                                logger.warning(f"No content found for post: {entry.link}")
+                                continue
+                            pending.append((entry, content, content_hash))
+                        except Exception as e:
+                            logger.error(f"Error reading entry {entry.link if hasattr(entry, 'link') else 'No link'}: {str(e)}")
+
+                    if pending:
+                        processed_posts += self._process_chunk(session, pending, existing_hashes, timings)
+                    report(
+                        entries_seen=entries_seen, processed=processed_posts,
+                        skipped=skipped_posts, timings=timings
+                    )
+
+            if not entries_seen:
+                logger.warning(f"No entries found in feed: {feed_url}")
+                self._record_fetch(feed_url, etag, modified, status, [])
+                return {"message": "No entries found in feed"}
 
-                    except Exception as e:
-                        logger.error(f"Error processing entry {entry.link if hasattr(entry, 'link') else 'No link'}: {str(e)}")
-                        continue
+            with self.write_lock:
+                self.theme_index.save()
+            self._record_fetch(feed_url, etag, modified, status, entry_ids)
 
             total_time = time.time() - feed_start
+            timings["total"] = total_time
             logger.info(f"Feed processing completed in {total_time:.2f} seconds")
-            logger.info(f"Processed {len(processed_posts)} posts, skipped {skipped_posts} posts")
-            
+            logger.info(f"Processed {processed_posts} posts, skipped {skipped_posts} posts")
+            observe_feed(timings, processed_posts, skipped_posts, entries_seen - processed_posts - skipped_posts)
+
             return {
-                "message": f"Successfully processed {len(processed_posts)} posts",
-                "processed": len(processed_posts),
+                "message": f"Successfully processed {processed_posts} posts",
+                "processed": processed_posts,
                 "skipped": skipped_posts,
-                "total_time": total_time
+                "total_time": total_time,
+                "timings": timings
             }
 
         except Exception as e:
             logger.error(f"Error in feed processing: {str(e)}")
-            return {"message": "Error processing feed", "error": str(e)} 
\ No newline at end of file
+            FEEDS.labels("error").inc()
+            return {"message": "Error processing feed", "error": str(e)}
+        finally:
+            if body is not None:
+                body.close() 
\ No newline at end of file
@@ -0,0 +1,160 @@
+import logging
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import IO, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+import feedparser
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+USER_AGENT = "InsightExtractor/1.0"
+# auto: stream feeds larger than FEED_STREAM_MIN_BYTES; true: always; false: never
+FEED_STREAMING = os.getenv("FEED_STREAMING", "auto").lower()
+FEED_STREAM_MIN_BYTES = int(os.getenv("FEED_STREAM_MIN_BYTES", str(8 * 1024 * 1024)))
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+RSS1_NS = "http://purl.org/rss/1.0/"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+# Minimal documents an entry is re-parsed in, by the namespace of the entry element
+ENTRY_WRAPPERS = {
+    "": ('<rss version="2.0"><channel>', "</channel></rss>"),
+    ATOM_NS: (f'<feed xmlns="{ATOM_NS}">', "</feed>"),
+    RSS1_NS: (f'<rdf:RDF xmlns:rdf="{RDF_NS}" xmlns="{RSS1_NS}">', "</rdf:RDF>"),
+}
+
+
+def streaming_enabled(size: Optional[int] = None) -> bool:
+    """Whether a feed of `size` bytes (None if unknown yet) should be parsed incrementally."""
+    if FEED_STREAMING in ("1", "true", "yes"):
+        return True
+    if FEED_STREAMING in ("0", "false", "no"):
+        return False
+    return size is None or size > FEED_STREAM_MIN_BYTES
+
+
+def is_http_url(feed_url: str) -> bool:
+    return urlparse(feed_url).scheme in ("http", "https")
+
+
+def conditional_headers(etag: Optional[str] = None, modified: Optional[str] = None) -> Dict[str, str]:
+    """If-None-Match and If-Modified-Since headers for the validators of a previous fetch."""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    return headers
+
+
+def download_feed(
+    feed_url: str,
+    etag: Optional[str] = None,
+    modified: Optional[str] = None,
+    timeout: float = FETCH_TIMEOUT
+) -> Tuple[int, Dict[str, str], Optional[IO[bytes]], int]:
+    """GET a feed into a temporary file, conditionally if validators are given.
+
+    The body is kept in memory up to FEED_STREAM_MIN_BYTES and spills to disk
+    beyond that. Returns the status, headers, body (None on 304) and size.
+    """
+    headers = {"User-Agent": USER_AGENT, **conditional_headers(etag, modified)}
+    with httpx.stream("GET", feed_url, headers=headers, timeout=timeout, follow_redirects=True) as response:
+        response_headers = {key.lower(): value for key, value in response.headers.items()}
+        if response.status_code == 304:
+            return 304, response_headers, None, 0
+        response.raise_for_status()
+        body = tempfile.SpooledTemporaryFile(max_size=FEED_STREAM_MIN_BYTES)
+        size = 0
+        try:
+            for chunk in response.iter_bytes():
+                body.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+        return response.status_code, response_headers, body, size
+
+
+async def download_feed_async(
+    client: httpx.AsyncClient,
+    feed_url: str,
+    etag: Optional[str] = None,
+    modified: Optional[str] = None
+) -> Tuple[int, Dict[str, str], Optional[IO[bytes]], int]:
+    """`download_feed` on a shared async client."""
+    async with client.stream("GET", feed_url, headers=conditional_headers(etag, modified)) as response:
+        response_headers = {key.lower(): value for key, value in response.headers.items()}
+        if response.status_code == 304:
+            return 304, response_headers, None, 0
+        response.raise_for_status()
+        body = tempfile.SpooledTemporaryFile(max_size=FEED_STREAM_MIN_BYTES)
+        size = 0
+        try:
+            async for chunk in response.aiter_bytes():
+                body.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+        return response.status_code, response_headers, body, size
+
+
+def _split_tag(tag: str) -> Tuple[str, str]:
+    if tag.startswith("{"):
+        namespace, _, name = tag[1:].partition("}")
+        return namespace, name
+    return "", tag
+
+
+def iter_entries(source: IO[bytes]) -> Iterator[feedparser.FeedParserDict]:
+    """Yield the entries of an RSS or Atom document one at a time.
+
+    The document is read with an incremental XML parser. Each <item> or
+    <entry> element is re-serialized on its own and handed to feedparser, so
+    entries look exactly like those of `feedparser.parse`. The element is
+    then dropped from the tree, which keeps memory bounded by the largest
+    entry rather than the whole feed.
+
+    The XML parser is strict, so documents it rejects, such as feeds using
+    HTML entities like &nbsp;, are re-read whole by feedparser, which
+    recovers from them; the entries not yet yielded are yielded from that
+    parse. ET.ParseError is raised only if feedparser finds no entries either.
+    """
+    parents = []
+    entries_read = 0
+    try:
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                parents.append(element)
+                continue
+            parents.pop()
+            namespace, name = _split_tag(element.tag)
+            if name not in ("item", "entry") or namespace not in ENTRY_WRAPPERS:
+                continue
+            head, tail = ENTRY_WRAPPERS[namespace]
+            document = f'<?xml version="1.0" encoding="utf-8"?>{head}{ET.tostring(element, encoding="unicode")}{tail}'
+            if parents:
+                parents[-1].remove(element)
+            parsed = feedparser.parse(document.encode("utf-8"))
+            entries_read += 1
+            if parsed.entries:
+                yield parsed.entries[0]
+            else:
+                logger.warning(f"Could not parse feed entry: {parsed.get('bozo_exception')}")
+    except ET.ParseError as e:
+        logger.warning(f"Feed is not well-formed XML ({str(e)}), parsing it whole instead")
+        source.seek(0)
+        parsed = feedparser.parse(source.read())
+        if not parsed.entries:
+            raise
+        yield from parsed.entries[entries_read:]
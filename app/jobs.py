@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from sqlmodel import Session, select
+
+from .database import engine
+from .feed_processor import FeedProcessor
+from .models import IngestJob
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+
+def job_status(job: IngestJob) -> Dict:
+    """Serialize a job for the API, decoding its timings."""
+    status = job.model_dump(exclude={"timings"})
+    status["timings"] = json.loads(job.timings) if job.timings else {}
+    return status
+
+
+class JobQueue:
+    """Run feed ingestion jobs on a dedicated worker pool.
+
+    Jobs are persisted in the ingestjob table before they are queued, so
+    jobs that were queued or running when the process stopped are picked up
+    again by `resume` at the next startup. Job rows are written with short
+    single-row commits outside the feed processor's write lock, so submitting
+    and progress updates never wait for a feed being processed.
+    """
+
+    def __init__(self, feed_processor: FeedProcessor, workers: int = INGEST_WORKERS):
+        self.feed_processor = feed_processor
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job")
+        logger.info(f"JobQueue initialized with {workers} workers")
+
+    def submit(self, feed_url: str) -> IngestJob:
+        """Persist a new job for the feed and queue it."""
+        with Session(engine) as session:
+            job = IngestJob(feed_url=feed_url)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        self._executor.submit(self._run, job.id)
+        logger.info(f"Queued ingest job {job.id} for {feed_url}")
+        return job
+
+    def resume(self) -> int:
+        """Re-queue jobs left queued or running by a previous process."""
+        with Session(engine) as session:
+            jobs = session.exec(
+                select(IngestJob).where(IngestJob.status.in_(["queued", "running"])).order_by(IngestJob.id)
+            ).all()
+            for job in jobs:
+                job.status = "queued"
+                session.add(job)
+            session.commit()
+            job_ids = [job.id for job in jobs]
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} ingest jobs")
+        return len(job_ids)
+
+    def get(self, job_id: int) -> Optional[IngestJob]:
+        with Session(engine) as session:
+            return session.get(IngestJob, job_id)
+
+    def _update(self, job_id: int, **fields) -> None:
+        with Session(engine) as session:
+            job = session.get(IngestJob, job_id)
+            for field, value in fields.items():
+                setattr(job, field, value)
+            session.add(job)
+            session.commit()
+
+    def _report_progress(self, job_id: int, timings: Dict[str, float], **counters) -> None:
+        try:
+            self._update(job_id, timings=json.dumps(timings), **counters)
+        except Exception as e:
+            logger.warning(f"Could not record progress for job {job_id}: {str(e)}")
+
+    def _run(self, job_id: int) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        logger.info(f"Starting ingest job {job_id}: {job.feed_url}")
+        self._update(job_id, status="running", started_at=datetime.utcnow())
+        try:
+            result = self.feed_processor.process_feed(
+                job.feed_url,
+                progress=lambda **counters: self._report_progress(job_id, **counters)
+            )
+            fields = {
+                "status": "failed" if "error" in result else "completed",
+                "message": result.get("message"),
+                "error": result.get("error"),
+                "processed": result.get("processed", 0),
+                "skipped": result.get("skipped", 0),
+            }
+            if "timings" in result:
+                fields["timings"] = json.dumps(result["timings"])
+        except Exception as e:
+            logger.error(f"Ingest job {job_id} failed: {str(e)}")
+            fields = {"status": "failed", "error": str(e)}
+        self._update(job_id, finished_at=datetime.utcnow(), **fields)
+        logger.info(f"Finished ingest job {job_id}: {fields['status']}")
+
+    def shutdown(self) -> None:
+        """Stop the workers; jobs that had not started stay queued for the next startup."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
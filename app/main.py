@@ -1,19 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
 from typing import List, Optional
 import logging
 import uvicorn
 import time
+from datetime import datetime
 
-from .models import Theme, Post, ThemeCreate, PostCreate
-from .database import engine, create_db_and_tables
+from .models import Feed, Theme, Post, ThemeCreate, PostCreate
+from .database import LOG_LEVEL, engine, create_db_and_tables
 from .feed_processor import FeedProcessor
-from .nlp_processor import NLPProcessor
+from .batch_ingest import BatchIngester
+from .scheduler import SCHEDULER_ENABLED, FeedScheduler
+from .jobs import JobQueue, job_status
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page, parse_fields, stream_ndjson
+from .search import search_posts, semantic_search
+from .nlp_processor import EMBEDDING_WARMUP, NLPProcessor
+from .metrics import render as render_metrics
+from .profiling import PROFILING_ENABLED, StackSampler
+from .response_cache import KEPT_HEADERS, RESPONSE_CACHE_ENABLED, etag_matches, get_response_cache, response_key, route_tags
 
 # Configure logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -33,9 +43,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """With ?profile=1, run the request under the stack sampler and return folded stacks instead."""
+        if request.query_params.get("profile") not in ("1", "true"):
+            return await call_next(request)
+        sampler = StackSampler()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+            # Drain the body so streamed responses are profiled to the end
+            async for _ in response.body_iterator:
+                pass
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Profiled {request.url.path} ({response.status_code}) in {elapsed:.3f} seconds")
+        return PlainTextResponse(sampler.folded(), headers={
+            "X-Profile-Status": str(response.status_code),
+            "X-Profile-Seconds": f"{elapsed:.6f}",
+        })
+
+if RESPONSE_CACHE_ENABLED:
+    @app.middleware("http")
+    async def cache_response(request: Request, call_next):
+        """Serve repeated reads of the cached listings from memory, answering If-None-Match with 304."""
+        tags = route_tags(request.url.path) if request.method == "GET" else None
+        if (tags is None or request.query_params.get("format") == "ndjson"
+                or request.query_params.get("profile") in ("1", "true")):
+            return await call_next(request)
+        cache = get_response_cache()
+        key = response_key(request.url.path, request.query_params.multi_items())
+        cached = cache.get(key)
+        if cached is None:
+            # Versions are read before rendering, so a write committed meanwhile leaves the entry stale
+            versions = cache.versions(tags)
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            headers = {name: value for name, value in response.headers.items() if name in KEPT_HEADERS}
+            cached = cache.set(key, body, headers, versions)
+        headers = {**cached.headers, "ETag": cached.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), cached.etag):
+            headers.pop("content-type", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, headers=headers)
+
 # Initialize processors
 nlp_processor = None
 feed_processor = None
+batch_ingester = None
+feed_scheduler = None
+job_queue = None
 
 @app.on_event("startup")
 async def startup_event():
@@ -45,8 +107,11 @@ async def startup_event():
         
         logger.info("Step 1: Initializing NLP processor...")
         try:
-            global nlp_processor, feed_processor
+            global nlp_processor, feed_processor, batch_ingester, feed_scheduler, job_queue
             nlp_processor = NLPProcessor()  # Model will be loaded on first use
+            if EMBEDDING_WARMUP:
+                # Pay for loading the model now rather than on the first request
+                nlp_processor.warm_up()
             logger.info("NLP processor initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize NLP processor: {str(e)}")
@@ -59,12 +124,45 @@ async def startup_event():
         except Exception as e:
             logger.error(f"Failed to initialize feed processor: {str(e)}")
             raise
-            
+
+        logger.info("Step 3: Loading embedding indexes...")
+        try:
+            create_db_and_tables()
+            with Session(engine) as session:
+                feed_processor.load_theme_index(session)
+                feed_processor.load_post_index(session)
+            logger.info("Theme and post embedding indexes loaded successfully")
+        except Exception as e:
+            logger.error(f"Failed to load embedding indexes: {str(e)}")
+            raise
+
+        logger.info("Step 4: Initializing batch ingester...")
+        batch_ingester = BatchIngester(feed_processor)
+
+        logger.info("Step 5: Starting ingest job workers...")
+        job_queue = JobQueue(feed_processor)
+        job_queue.resume()
+
+        if SCHEDULER_ENABLED:
+            logger.info("Step 6: Starting feed scheduler...")
+            feed_scheduler = FeedScheduler(feed_processor)
+            feed_scheduler.start()
+
         logger.info("=== Application initialization complete ===")
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+def shutdown_event():
+    """Wait for in-flight feed processing before exiting."""
+    if feed_scheduler:
+        feed_scheduler.shutdown()
+    if job_queue:
+        job_queue.shutdown()
+    if batch_ingester:
+        batch_ingester.shutdown()
+
 @app.post("/init-db")
 async def init_db():
     """Initialize the database tables."""
@@ -85,86 +183,246 @@ async def root():
         "endpoints": {
             "GET /": "This help message",
             "POST /init-db": "Initialize the database",
-            "POST /ingest": "Ingest a new RSS feed",
+            "POST /ingest": "Queue a job to ingest a new RSS feed",
+            "GET /jobs/{job_id}": "Get the status and progress of an ingest job",
+            "POST /ingest/batch": "Ingest many RSS feeds concurrently",
+            "POST /feeds": "Register a feed for scheduled polling",
+            "GET /feeds": "Get registered feeds and their polling state",
             "GET /posts": "Get all posts",
             "GET /themes": "Get all themes",
             "GET /posts/{post_id}": "Get a specific post",
             "GET /themes/{theme_id}": "Get a specific theme",
             "GET /posts/theme/{theme_id}": "Get all posts for a theme",
-            "GET /posts/search": "Search posts by title or content"
+            "GET /posts/search": "Search posts by title or content, ranked by relevance",
+            "GET /search/semantic": "Find posts and themes similar in meaning to a query",
+            "GET /stats/embedding-cache": "Get embedding cache hit counters and size"
         }
     }
 
-@app.post("/ingest")
+@app.post("/ingest", status_code=202)
 def ingest_feed(feed_url: str) -> dict:
-    """Ingest a feed URL and process its posts."""
+    """Queue a job to ingest a feed URL and return its id."""
     try:
         logger.info(f"Received request to ingest feed: {feed_url}")
         
-        if not feed_processor:
-            logger.error("Feed processor not initialized")
-            raise HTTPException(status_code=500, detail="Feed processor not initialized")
+        if not job_queue:
+            logger.error("Job queue not initialized")
+            raise HTTPException(status_code=500, detail="Job queue not initialized")
             
-        logger.info(f"Starting feed processing for: {feed_url}")
-        start_time = time.time()
-        result = feed_processor.process_feed(feed_url)
-        total_time = time.time() - start_time
-        logger.info(f"Feed processing completed in {total_time:.2f} seconds")
-        
-        return result
+        job = job_queue.submit(feed_url)
+        return {"job_id": job.id, "status": job.status}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing feed: {str(e)}")
+        logger.error(f"Error queuing feed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/posts")
-def get_posts():
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int) -> dict:
+    """Get the status, progress counters and timings of an ingest job."""
+    job = job_queue.get(job_id) if job_queue else None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@app.post("/ingest/batch")
+async def ingest_feeds(feed_urls: List[str] = Body(..., embed=True)) -> dict:
+    """Fetch many feed URLs concurrently and process them through one NLP worker."""
+    if not batch_ingester:
+        logger.error("Batch ingester not initialized")
+        raise HTTPException(status_code=500, detail="Batch ingester not initialized")
+    if not feed_urls:
+        raise HTTPException(status_code=422, detail="feed_urls must not be empty")
+
+    logger.info(f"Received request to ingest {len(feed_urls)} feeds")
+    try:
+        return await batch_ingester.ingest(feed_urls)
+    except Exception as e:
+        logger.error(f"Error processing feeds: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/feeds")
+def register_feed(feed_url: str) -> Feed:
+    """Register a feed for scheduled polling (or reactivate it)."""
     try:
         with Session(engine) as session:
-            posts = session.exec(select(Post)).all()
-            return posts
+            feed = session.exec(select(Feed).where(Feed.url == feed_url)).first()
+            if feed is None:
+                feed = Feed(url=feed_url)
+            feed.active = True
+            session.add(feed)
+            session.commit()
+            session.refresh(feed)
+            logger.info(f"Registered feed for polling: {feed_url}")
+            return feed
+    except Exception as e:
+        logger.error(f"Error registering feed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/feeds")
+def get_feeds():
+    try:
+        with Session(engine) as session:
+            return session.exec(select(Feed)).all()
+    except Exception as e:
+        logger.error(f"Error retrieving feeds: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Pipeline metrics in the Prometheus text format."""
+    data, content_type = render_metrics()
+    return Response(content=data, media_type=content_type)
+
+@app.get("/stats/embedding-cache")
+def get_embedding_cache_stats() -> dict:
+    """Hit counters and size of the sentence embedding cache."""
+    if not nlp_processor:
+        raise HTTPException(status_code=500, detail="NLP processor not initialized")
+    return nlp_processor.cache.stats()
+
+POST_FIELDS = ("id", "title", "url", "content", "published_at", "ingested_at",
+               "content_hash", "feed_updated_at", "theme_id")
+THEME_FIELDS = ("id", "thesis", "created_at", "post_count", "first_seen_at", "last_seen_at")
+TIMELINE_FIELDS = ["title", "url", "published_at", "ingested_at"]
+
+def list_rows(model, allowed_fields, fields, order_by, cursor, limit, format, response, filters=()):
+    """Serve a keyset-paginated listing as a JSON page or an NDJSON stream.
+
+    JSON responses return one page and put the cursor of the next page in the
+    X-Next-Cursor header. NDJSON streams every matching row unless a limit is
+    given.
+    """
+    selected = parse_fields(fields, allowed_fields)
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(model, selected, order_by, cursor, limit, filters),
+            media_type="application/x-ndjson"
+        )
+    rows, next_cursor = fetch_page(model, selected, order_by, cursor, limit or DEFAULT_PAGE_SIZE, filters)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+@app.get("/posts")
+def get_posts(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", pattern="^(id|published_at)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,title,url"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """List posts a page at a time, optionally projecting fields or streaming NDJSON."""
+    try:
+        return list_rows(Post, POST_FIELDS, fields, order_by, cursor, limit, format, response)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving posts: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/posts/search")
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, description="Words to search for in post titles and content"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Full-text search over posts, best matches first, returning snippets instead of content."""
+    try:
+        results, next_cursor = search_posts(q, cursor, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching posts: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/search/semantic")
+def search_semantic(
+    q: str = Query(..., min_length=1, description="Text to find similar posts and themes for"),
+    k: int = Query(10, ge=1, le=100),
+    kind: str = Query("all", pattern="^(posts|themes|all)$"),
+    theme_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Rank posts and themes by embedding similarity to the query."""
+    if not feed_processor:
+        logger.error("Feed processor not initialized")
+        raise HTTPException(status_code=500, detail="Feed processor not initialized")
+    try:
+        return semantic_search(feed_processor, q, k, kind, theme_id, start, end)
+    except Exception as e:
+        logger.error(f"Error in semantic search: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/themes")
-def get_themes():
+def get_themes(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", pattern="^(id|created_at)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,thesis"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """List themes a page at a time, optionally projecting fields or streaming NDJSON."""
     try:
-        with Session(engine) as session:
-            themes = session.exec(select(Theme)).all()
-            return themes
+        return list_rows(Theme, THEME_FIELDS, fields, order_by, cursor, limit, format, response)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving themes: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/themes/{theme_id}")
-async def get_theme_timeline(theme_id: int):
-    """Get a timeline of posts for a specific theme."""
+def get_theme_timeline(
+    theme_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get a timeline of posts for a specific theme, oldest first.
+
+    Posts are read in (theme_id, published_at) index order, a page at a time;
+    `start` and `end` bound the published dates.
+    """
     with Session(engine) as session:
-        theme = session.get(Theme, theme_id)
-        if not theme:
-            raise HTTPException(status_code=404, detail="Theme not found")
-        
-        posts = sorted(theme.posts, key=lambda x: x.published_at)
-        return {
-            "theme_id": theme.id,
-            "thesis": theme.thesis,
-            "posts": [
-                {
-                    "title": post.title,
-                    "url": post.url,
-                    "published_at": post.published_at,
-                    "ingested_at": post.ingested_at
-                }
-                for post in posts
-            ]
-        }
+        theme = session.exec(
+            select(Theme.id, Theme.thesis, Theme.post_count, Theme.first_seen_at, Theme.last_seen_at)
+            .where(Theme.id == theme_id)
+        ).first()
+    if not theme:
+        raise HTTPException(status_code=404, detail="Theme not found")
+
+    filters = [Post.theme_id == theme_id]
+    if start:
+        filters.append(Post.published_at >= start)
+    if end:
+        filters.append(Post.published_at <= end)
+    posts, next_cursor = fetch_page(Post, TIMELINE_FIELDS, "published_at", cursor, limit, filters)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {
+        "theme_id": theme.id,
+        "thesis": theme.thesis,
+        "post_count": theme.post_count,
+        "first_seen_at": theme.first_seen_at,
+        "last_seen_at": theme.last_seen_at,
+        "posts": posts
+    }
 
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        log_level="debug",
+        log_level=LOG_LEVEL.lower(),
         reload=True,
         workers=1
     ) 
\ No newline at end of file
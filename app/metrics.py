@@ -0,0 +1,60 @@
+import os
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+load_dotenv()
+
+# Set to a writable directory when running several API worker processes so
+# /metrics aggregates all of them (see the prometheus_client docs)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Seconds spent per feed in each ingestion stage: fetch (the HTTP download), parse, lookup, thesis, "
+    "similarity and write",
+    ["stage"], buckets=STAGE_BUCKETS
+)
+FEED_SECONDS = Histogram(
+    "feed_processing_seconds", "End-to-end seconds to process one feed", buckets=STAGE_BUCKETS
+)
+ENCODE_SECONDS = Histogram(
+    "embedding_encode_seconds", "Seconds per call to the embedding model", ["backend"], buckets=STAGE_BUCKETS
+)
+ENCODED_SENTENCES = Counter(
+    "embedding_encoded_sentences_total", "Sentences encoded by the embedding model", ["backend"]
+)
+FEEDS = Counter("feeds_processed_total", "Feeds processed, by outcome: ok, not_modified or error", ["outcome"])
+ENTRIES = Counter(
+    "feed_entries_total", "Feed entries seen, by result: processed, skipped (unchanged) or failed", ["result"]
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit, disk_hit or miss)", ["cache", "result"]
+)
+
+
+def observe_feed(timings: Dict[str, float], processed: int, skipped: int, failed: int) -> None:
+    """Record the stage timings and entry counts of one processed feed."""
+    for stage, seconds in timings.items():
+        if stage == "total":
+            FEED_SECONDS.observe(seconds)
+        else:
+            STAGE_SECONDS.labels(stage).observe(seconds)
+    FEEDS.labels("ok").inc()
+    ENTRIES.labels("processed").inc(processed)
+    ENTRIES.labels("skipped").inc(skipped)
+    ENTRIES.labels("failed").inc(failed)
+
+
+def render() -> Tuple[bytes, str]:
+    """All metrics in the Prometheus text format, and its content type."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,23 +1,67 @@
 from datetime import datetime
 from typing import List, Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
+from .vector_type import EmbeddingType
+
 class Post(SQLModel, table=True):
+    __table_args__ = (Index("ix_post_theme_id_published_at", "theme_id", "published_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     url: str = Field(unique=True)
     content: str
     published_at: datetime
     ingested_at: datetime = Field(default_factory=datetime.utcnow)
+    content_hash: Optional[str] = Field(default=None)
+    feed_updated_at: Optional[datetime] = Field(default=None)
     theme_id: Optional[int] = Field(default=None, foreign_key="theme.id")
+    # Thesis embedding, mirrored into the memory-mapped post index for semantic search
+    embedding: Optional[bytes] = Field(default=None, exclude=True, sa_type=EmbeddingType)
+    embedding_model: Optional[str] = Field(default=None, exclude=True)
     theme: Optional["Theme"] = Relationship(back_populates="posts")
 
 class Theme(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     thesis: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Centroid of the posts' thesis embeddings, moved as posts join or leave
+    embedding: Optional[bytes] = Field(default=None, exclude=True, sa_type=EmbeddingType)
+    embedding_model: Optional[str] = Field(default=None, exclude=True)
+    # Maintained incrementally as posts are assigned to the theme
+    post_count: int = 0
+    first_seen_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
     posts: List[Post] = Relationship(back_populates="theme")
 
+class Feed(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    url: str = Field(unique=True)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    last_fetched_at: Optional[datetime] = None
+    last_status: Optional[int] = None
+    last_entry_ids: Optional[str] = None  # JSON list of the entry ids seen on the last full fetch
+    active: bool = True  # polled by the scheduler
+    next_poll_at: Optional[datetime] = None
+    error_count: int = 0
+    last_error: Optional[str] = None
+
+class IngestJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    feed_url: str
+    status: str = Field(default="queued", index=True)  # queued, running, completed or failed
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    entries_seen: int = 0
+    processed: int = 0
+    skipped: int = 0
+    timings: Optional[str] = None  # JSON object of stage timings in seconds
+    message: Optional[str] = None
+    error: Optional[str] = None
+
 class ThemeCreate(SQLModel):
     thesis: str
 
@@ -1,82 +1,197 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import logging
 import os
-from typing import List, Tuple, Optional
+import threading
+import time
+from typing import List, Tuple, Optional, Union
 from dotenv import load_dotenv
 
+from .embedding_cache import EmbeddingCache, cache_key
+from .encoders import EMBEDDING_BACKEND, create_encoder
+from .metrics import ENCODE_SECONDS, ENCODED_SENTENCES
+from .text_processing import sample_sentences, split_sentences
+from .theme_index import ThemeIndex, normalize
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "false").lower() in ("1", "true", "yes")
+# Most sentences of one post that are encoded when picking its thesis (0 = no limit)
+MAX_THESIS_CANDIDATES = int(os.getenv("MAX_THESIS_CANDIDATES", "64"))
+
 class NLPProcessor:
-    def __init__(self, model: Optional[SentenceTransformer] = None):
-        """Initialize the NLP processor with an optional preloaded model."""
-        self._model = model
+    def __init__(
+        self,
+        model=None,
+        cache: Optional[EmbeddingCache] = None,
+        backend: str = EMBEDDING_BACKEND
+    ):
+        """Initialize the NLP processor with an optional preloaded model and embedding cache.
+
+        `backend` selects the inference backend: torch, torch-int8, onnx,
+        onnx-int8 (see app.encoders) or remote, the shared NLP worker process
+        (see app.nlp_worker).
+        """
+        self.model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        self.backend = backend
+        self._encoder = create_encoder(backend, self.model_name, model=model)
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        # Embeddings from other backends differ slightly, so they are cached separately
+        inference_backend = self._encoder.inference_backend
+        self.cache_namespace = (
+            self.model_name if inference_backend == "torch" else f"{self.model_name}@{inference_backend}"
+        )
+        self.cache = cache if cache is not None else EmbeddingCache()
         self.max_thesis_sentences = 3  # Maximum number of sentences to return as thesis
-        logger.info("NLPProcessor initialized (model will be loaded on first use)")
+        self.max_candidates = MAX_THESIS_CANDIDATES
+        logger.info(f"NLPProcessor initialized with the {backend} backend (model will be loaded on first use)")
 
     @property
-    def model(self) -> SentenceTransformer:
+    def encoder(self):
         """Lazy load the model when first needed."""
-        if self._model is None:
-            logger.info("Loading sentence transformer model...")
-            self._model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("Model loaded successfully")
-        return self._model
+        with self._load_lock:
+            if not self._loaded:
+                logger.info(f"Loading {self.model_name} with the {self.backend} backend...")
+                start = time.time()
+                self._encoder.load()
+                self._loaded = True
+                logger.info(f"Model loaded successfully in {time.time() - start:.2f} seconds")
+        return self._encoder
+
+    def warm_up(self) -> None:
+        """Load the model and run one inference so the first request doesn't pay for it."""
+        start = time.time()
+        self.encoder.encode(["Warm-up sentence for the embedding model."], batch_size=1)
+        logger.info(f"Embedding model warmed up in {time.time() - start:.2f} seconds")
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into L2-normalized float32 embeddings.
+
+        Texts found in the embedding cache are not re-encoded, and repeated
+        texts within the call are encoded once.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [cache_key(self.cache_namespace, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, cached)):
+            if vector is None:
+                missing.setdefault(key, i)
+        if missing:
+            encoder = self.encoder
+            start = time.perf_counter()
+            computed = encoder.encode([texts[i] for i in missing.values()], batch_size=batch_size)
+            ENCODE_SECONDS.labels(self.backend).observe(time.perf_counter() - start)
+            ENCODED_SENTENCES.labels(self.backend).inc(len(missing))
+            self.cache.put_many(list(missing), computed)
+            by_key = dict(zip(missing, computed))
+            cached = [vector if vector is not None else by_key[key] for key, vector in zip(keys, cached)]
+        return np.stack(cached)
+
+    def _split_sentences(self, text: str) -> List[str]:
+        """Split text (plain or HTML) into candidate thesis sentences.
+
+        Long posts are capped at `max_candidates` sentences: the opening ones,
+        where posts usually state their point, plus an even spread of the rest.
+        """
+        return sample_sentences(split_sentences(text), self.max_candidates)
+
+    def _select_thesis(self, sentences: List[str], embeddings: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Pick the most central sentences and the normalized mean of their embeddings."""
+        # Ranking by similarity to the normalized mean embedding orders sentences
+        # as their average similarity to all others does, in O(n) instead of an n x n matrix
+        centrality = embeddings @ normalize(embeddings.mean(axis=0))
+        count = min(self.max_thesis_sentences, len(sentences))
+        central_indices = np.argsort(centrality, kind="stable")[::-1][:count]
+
+        thesis_embedding = normalize(embeddings[central_indices].mean(axis=0))
+        return [sentences[i] for i in central_indices], thesis_embedding
 
     def extract_thesis(self, text: str) -> List[str]:
         """Extract thesis statements from text."""
+        return self.extract_thesis_batch([text])[0][0]
+
+    def extract_thesis_batch(
+        self, texts: List[str], batch_size: int = ENCODE_BATCH_SIZE
+    ) -> List[Tuple[List[str], Optional[np.ndarray]]]:
+        """Extract thesis statements for many texts with a single encode pass.
+
+        Sentences from all texts are flattened and sorted by length so each
+        batch pads to similar lengths, encoded together, then split back per
+        text. Returns a (thesis sentences, thesis embedding) pair per text;
+        texts without sentences (or on error) give ([], None).
+        """
         try:
             # Split text into sentences
-            sentences = text.split('.')
-            sentences = [s.strip() for s in sentences if s.strip()]
-            
-            if not sentences:
-                return []
-            
-            # Get embeddings for all sentences
-            embeddings = self.model.encode(sentences)
-            
-            # Calculate similarity matrix
-            similarity_matrix = cosine_similarity(embeddings)
-            
-            # Find the most central sentences (highest average similarity to others)
-            avg_similarities = np.mean(similarity_matrix, axis=1)
-            central_indices = np.argsort(avg_similarities)[-self.max_thesis_sentences:][::-1]
-            
-            # Return the most central sentences as the thesis
-            return [sentences[i] for i in central_indices]
-            
+            sentence_lists = [self._split_sentences(text) for text in texts]
+            flat = [sentence for sentences in sentence_lists for sentence in sentences]
+            if not flat:
+                return [([], None) for _ in texts]
+
+            # Get embeddings for all sentences, encoding in length order
+            order = sorted(range(len(flat)), key=lambda i: len(flat[i]))
+            sorted_embeddings = self.encode([flat[i] for i in order], batch_size=batch_size)
+            embeddings = np.empty_like(sorted_embeddings)
+            embeddings[order] = sorted_embeddings
+
+            results = []
+            offset = 0
+            for sentences in sentence_lists:
+                count = len(sentences)
+                if count:
+                    results.append(self._select_thesis(sentences, embeddings[offset:offset + count]))
+                else:
+                    results.append(([], None))
+                offset += count
+            return results
+
         except Exception as e:
             logger.error(f"Error extracting thesis: {str(e)}")
-            return []
+            return [([], None) for _ in texts]
 
-    def find_similar_theme(self, thesis: str, existing_themes: List[Tuple[int, str]], threshold: float = 0.8) -> Tuple[bool, Optional[int]]:
-        """Find if there's a similar theme to the given thesis."""
+    def find_similar_theme(
+        self,
+        thesis: Union[str, np.ndarray],
+        existing_themes: Union[ThemeIndex, "PgvectorThemeIndex", List[Tuple[int, str]]],
+        threshold: float = 0.8
+    ) -> Tuple[bool, Optional[int]]:
+        """Find if there's a similar theme to the given thesis.
+
+        `thesis` may be text or a precomputed embedding. `existing_themes` is
+        either a theme index (ThemeIndex, or PgvectorThemeIndex on PostgreSQL)
+        or a list of (id, thesis) pairs, which are encoded on the fly.
+        """
         try:
-            if not existing_themes:
+            if isinstance(existing_themes, list) and not existing_themes:
                 return False, None
-                
-            # Get embedding for the new thesis
-            thesis_embedding = self.model.encode([thesis])[0]
-            
-            # Get embeddings for existing themes
-            theme_texts = [theme[1] for theme in existing_themes]
-            theme_embeddings = self.model.encode(theme_texts)
-            
-            # Calculate similarities
-            similarities = cosine_similarity([thesis_embedding], theme_embeddings)[0]
-            
-            # Find the most similar theme
-            max_similarity_idx = np.argmax(similarities)
-            max_similarity = similarities[max_similarity_idx]
-            
+
+            # Texts are embedded the way a post's thesis is, so they compare with stored themes
+            if isinstance(thesis, str):
+                thesis_embedding = self.extract_thesis_batch([thesis])[0][1]
+                if thesis_embedding is None:
+                    return False, None
+            else:
+                thesis_embedding = thesis
+
+            if not isinstance(existing_themes, list):
+                index = existing_themes
+            else:
+                index = ThemeIndex()
+                theses = self.extract_thesis_batch([theme[1] for theme in existing_themes])
+                for (theme_id, _), (_, embedding) in zip(existing_themes, theses):
+                    if embedding is not None:
+                        index.add(theme_id, embedding)
+
+            theme_id, max_similarity = index.search(thesis_embedding)
             if max_similarity >= threshold:
-                return True, existing_themes[max_similarity_idx][0]
+                return True, theme_id
             return False, None
             
         except Exception as e:
             logger.error(f"Error finding similar theme: {str(e)}")
-            return False, None 
\ No newline at end of file
+            return False, None
@@ -0,0 +1,270 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional, Union
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NLP_WORKER_ADDRESS = os.getenv("NLP_WORKER_ADDRESS", "127.0.0.1:8765")
+NLP_WORKER_BACKEND = os.getenv("NLP_WORKER_BACKEND", "torch")
+# Shared secret for connections to the worker, which unpickles what it receives.
+# Without it, each API process starts a private worker with a random key.
+NLP_WORKER_AUTHKEY = os.getenv("NLP_WORKER_AUTHKEY") or None
+NLP_WORKER_START_TIMEOUT = float(os.getenv("NLP_WORKER_START_TIMEOUT", "120"))
+NLP_BATCH_MAX_SIZE = int(os.getenv("NLP_BATCH_MAX_SIZE", "256"))
+NLP_BATCH_MAX_WAIT_MS = float(os.getenv("NLP_BATCH_MAX_WAIT_MS", "10"))
+
+
+def parse_address(address: str) -> Union[str, tuple]:
+    """`host:port` for TCP, anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+class _Request:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+class EmbeddingServer:
+    """Serve encode requests from every API worker through one model copy.
+
+    Each connection gets a thread that queues its requests; a single batching
+    thread encodes requests arriving within `max_wait` seconds of each other,
+    up to `max_batch` sentences, as one batch.
+    """
+
+    def __init__(
+        self,
+        encoder,
+        max_batch: int = NLP_BATCH_MAX_SIZE,
+        max_wait: float = NLP_BATCH_MAX_WAIT_MS / 1000,
+        encode_batch_size: int = 64
+    ):
+        self.encoder = encoder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.encode_batch_size = encode_batch_size
+        self.batches = 0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+
+    def serve_forever(self, listener: Listener) -> None:
+        threading.Thread(target=self._batch_loop, name="nlp-batcher", daemon=True).start()
+        logger.info(f"NLP worker listening on {listener.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"Rejected NLP worker connection: {str(e)}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    texts = conn.recv()
+                except (EOFError, OSError):
+                    return
+                request = _Request(texts)
+                self._queue.put(request)
+                request.done.wait()
+                conn.send(("error", request.error) if request.error else ("ok", request.result))
+
+    def _next_batch(self) -> List[_Request]:
+        """Block for one request, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _batch_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                embeddings = self.encoder.encode(texts, batch_size=self.encode_batch_size)
+                offset = 0
+                for request in batch:
+                    request.result = embeddings[offset:offset + len(request.texts)]
+                    offset += len(request.texts)
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(texts)} sentences: {str(e)}")
+                for request in batch:
+                    request.error = str(e)
+            self.batches += 1
+            for request in batch:
+                request.done.set()
+
+
+def serve(address: str, backend: str, model_name: Optional[str], authkey: bytes, ready=None):
+    """Load the model and serve it on `address` until the process is stopped.
+
+    `ready`, if given, is a pipe connection that receives the bound address
+    (or None if the address is taken) before the model loads.
+    """
+    from .encoders import create_encoder
+
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    try:
+        # Bind before loading the model so a second starter fails fast
+        listener = Listener(parse_address(address), backlog=64, authkey=authkey)
+    except OSError as e:
+        logger.info(f"NLP worker not started, {address} is in use: {str(e)}")
+        if ready is not None:
+            ready.send(None)
+        return
+    if ready is not None:
+        ready.send(listener.address)
+        ready.close()
+    logger.info(f"Loading {model_name} with the {backend} backend for the NLP worker...")
+    encoder = create_encoder(backend, model_name)
+    encoder.load()
+    EmbeddingServer(encoder).serve_forever(listener)
+
+
+def _serve_child(address: str, backend: str, model_name: str, authkey: bytes, ready) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    serve(address, backend, model_name, authkey, ready)
+
+
+class RemoteEncoder:
+    """Encoder that sends sentences to the shared NLP worker.
+
+    Each thread keeps its own connection. With an `authkey` (NLP_WORKER_AUTHKEY),
+    the worker on `address` is shared: if nothing is listening there it is
+    started as a child process (unless `spawn` is false), and when several API
+    workers race to start it, one binds the address and the others connect.
+    Without a key, this process starts a private worker on a free local port,
+    protected by a random key.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        address: str = NLP_WORKER_ADDRESS,
+        backend: str = NLP_WORKER_BACKEND,
+        spawn: bool = True,
+        authkey: Optional[str] = NLP_WORKER_AUTHKEY
+    ):
+        self.model_name = model_name
+        self.shared = bool(authkey)
+        self.address = address if self.shared else "127.0.0.1:0"
+        self.authkey = authkey.encode() if self.shared else os.urandom(32)
+        self.inference_backend = backend
+        self.spawn = spawn
+        self._local = threading.local()
+        self._process = None
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        return Client(parse_address(self.address), authkey=self.authkey)
+
+    def _start_worker(self) -> None:
+        """Start the worker as a child process and wait until it has bound its address."""
+        import multiprocessing
+
+        context = multiprocessing.get_context("spawn")
+        ready, child_ready = context.Pipe(duplex=False)
+        logger.info(f"Starting NLP worker on {self.address}")
+        self._process = context.Process(
+            target=_serve_child,
+            args=(self.address, self.inference_backend, self.model_name, self.authkey, child_ready),
+            name="nlp-worker", daemon=True
+        )
+        self._process.start()
+        child_ready.close()
+        if not ready.poll(NLP_WORKER_START_TIMEOUT):
+            raise RuntimeError(f"NLP worker did not start on {self.address}")
+        try:
+            address = ready.recv()
+        except EOFError:
+            raise RuntimeError("NLP worker exited before binding its address")
+        if address is None and not self.shared:
+            raise RuntimeError("NLP worker could not bind a local port")
+        if address is not None:
+            self.address = "%s:%d" % address if isinstance(address, tuple) else address
+
+    def load(self) -> None:
+        with self._start_lock:
+            if self.shared or self._process is not None:
+                try:
+                    self._local.conn = self._connect()
+                    return
+                except OSError:
+                    if not self.spawn:
+                        raise
+            # Connecting waits until the worker has loaded the model and accepts
+            self._start_worker()
+            deadline = time.monotonic() + NLP_WORKER_START_TIMEOUT
+            while True:
+                try:
+                    self._local.conn = self._connect()
+                    return
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Could not connect to the NLP worker on {self.address}")
+                    time.sleep(0.2)
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    if not self.shared and self._process is None:
+                        self.load()
+                    conn = self._local.conn = self._connect()
+                conn.send(list(texts))
+                status, payload = conn.recv()
+                break
+            except (EOFError, OSError):
+                # The worker restarted or the connection dropped; reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise
+                if self.spawn:
+                    self.load()
+        if status != "ok":
+            raise RuntimeError(f"NLP worker failed to encode: {payload}")
+        return payload
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Serve the embedding model to API workers")
+    parser.add_argument("--address", default=NLP_WORKER_ADDRESS, help="host:port or Unix socket path")
+    parser.add_argument("--backend", default=NLP_WORKER_BACKEND, help="torch, torch-int8, onnx or onnx-int8")
+    args = parser.parse_args()
+    if not NLP_WORKER_AUTHKEY:
+        parser.error("set NLP_WORKER_AUTHKEY to a secret shared with the API workers")
+    serve(args.address, args.backend, None, NLP_WORKER_AUTHKEY.encode())
@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import literal, tuple_
+from sqlmodel import Session, SQLModel, select
+
+from .database import engine
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: str) -> List:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if order_by != "id":
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """Validate a comma-separated field list, defaulting to every allowed field."""
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def build_query(
+    model: Type[SQLModel],
+    fields: List[str],
+    order_by: str,
+    cursor: Optional[str],
+    filters: Sequence = ()
+):
+    """Select only the requested columns (plus the sort key), ordered for keyset paging."""
+    key_columns = [getattr(model, order_by), model.id] if order_by != "id" else [model.id]
+    key_names = [column.key for column in key_columns]
+    columns = [getattr(model, field) for field in fields]
+    columns += [column for column in key_columns if column.key not in fields]
+    query = select(*columns)
+    for condition in filters:
+        query = query.where(condition)
+    if cursor:
+        values = decode_cursor(cursor, order_by)
+        if order_by == "id":
+            query = query.where(model.id > values[0])
+        else:
+            bound = [literal(value, type_=column.type) for value, column in zip(values, key_columns)]
+            query = query.where(tuple_(*key_columns) > tuple_(*bound))
+    return query.order_by(*key_columns), key_names
+
+
+def fetch_page(
+    model: Type[SQLModel],
+    fields: List[str],
+    order_by: str,
+    cursor: Optional[str],
+    limit: int,
+    filters: Sequence = ()
+) -> Tuple[List[Dict], Optional[str]]:
+    """Return one page of rows as dicts and the cursor of the next page, if any."""
+    query, key_names = build_query(model, fields, order_by, cursor, filters)
+    with Session(engine) as session:
+        rows = session.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]._mapping[name] for name in key_names])
+    return [{field: row._mapping[field] for field in fields} for row in rows], next_cursor
+
+
+def stream_ndjson(
+    model: Type[SQLModel],
+    fields: List[str],
+    order_by: str,
+    cursor: Optional[str],
+    limit: Optional[int],
+    filters: Sequence = ()
+) -> Iterator[str]:
+    """Yield rows as NDJSON lines, fetching them in batches from a streaming cursor."""
+    query, _ = build_query(model, fields, order_by, cursor, filters)
+    if limit:
+        query = query.limit(limit)
+    with Session(engine) as session:
+        result = session.execute(query.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+        for row in result:
+            yield json.dumps(jsonable_encoder({field: row._mapping[field] for field in fields})) + "\n"
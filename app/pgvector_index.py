@@ -0,0 +1,97 @@
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text
+from sqlmodel import Session, func, select
+
+from .models import Theme
+from .theme_index import ThemeIndex, encode_stale_themes, normalize
+from .vector_type import EMBEDDING_DIM, Vector
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Candidates the HNSW graph search keeps; higher is slower but closer to exact
+PGVECTOR_EF_SEARCH = int(os.getenv("PGVECTOR_EF_SEARCH", "40"))
+
+
+class PgvectorThemeIndex:
+    """Theme matching served by a pgvector HNSW index in PostgreSQL.
+
+    Has the interface of ThemeIndex, but searches run as nearest-neighbour
+    queries on theme.embedding, so no theme embeddings are held in memory
+    and every API process sees the themes the others commit. Themes created
+    in a transaction that has not committed yet are invisible to the
+    query's connection, so they are kept in a small in-memory ThemeIndex
+    until `save`, which the feed processor calls once the feed is committed.
+    """
+
+    def __init__(self, engine, model_name: str, ef_search: int = PGVECTOR_EF_SEARCH):
+        self.engine = engine
+        self.model_name = model_name
+        self.ef_search = ef_search
+        self._pending = ThemeIndex(model_name=model_name)
+
+    def __len__(self) -> int:
+        with Session(self.engine) as session:
+            stored = session.exec(select(func.count(Theme.id)).where(Theme.embedding != None)).one()  # noqa: E711
+        return stored + len(self._pending)
+
+    def _nearest(self, embedding: np.ndarray, k: int, theme_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        vector = normalize(embedding).reshape(-1)
+        query = (
+            "SELECT id, 1 - (embedding <=> :vector) AS similarity FROM theme "
+            "WHERE embedding IS NOT NULL AND embedding_model = :model"
+        )
+        params = {"vector": vector, "model": self.model_name, "k": k}
+        if theme_ids is not None:
+            query += " AND id = ANY(:theme_ids)"
+            params["theme_ids"] = list(theme_ids)
+        statement = text(query + " ORDER BY embedding <=> :vector LIMIT :k").bindparams(
+            bindparam("vector", type_=Vector(EMBEDDING_DIM))
+        )
+        with self.engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL hnsw.ef_search = {int(self.ef_search)}"))
+            rows = conn.execute(statement, params).all()
+        results = {theme_id: float(similarity) for theme_id, similarity in rows}
+        for theme_id, similarity in self._pending.top_k(vector, k, theme_ids):
+            results[theme_id] = similarity
+        return sorted(results.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def search(self, embedding: np.ndarray) -> Tuple[Optional[int], float]:
+        """Return the id and cosine similarity of the closest theme."""
+        nearest = self._nearest(embedding, 1)
+        return nearest[0] if nearest else (None, 0.0)
+
+    def top_k(
+        self, embedding: np.ndarray, k: int, theme_ids: Optional[List[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (theme id, cosine similarity) pairs, best first."""
+        return self._nearest(embedding, k, theme_ids)
+
+    def add(self, theme_id: int, embedding: np.ndarray) -> None:
+        """Track a theme flushed in the current transaction until it is committed."""
+        self._pending.add(theme_id, embedding)
+
+    def update(self, embeddings: Dict[int, np.ndarray]) -> None:
+        """Centroids are read from the database; only pending themes need updating."""
+        self._pending.update(embeddings)
+
+    def remove(self, theme_ids: List[int]) -> None:
+        self._pending.remove(theme_ids)
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """Forget pending themes, which are committed by the time this is called."""
+        self._pending = ThemeIndex(model_name=self.model_name)
+
+    @classmethod
+    def load(cls, session: Session, nlp_processor, rebuild: bool = False) -> "PgvectorThemeIndex":
+        """Encode missing or stale theme embeddings and return an index over the theme table."""
+        encode_stale_themes(session, nlp_processor, rebuild)
+        index = cls(session.get_bind(), nlp_processor.model_name)
+        logger.info("Using the pgvector theme index")
+        return index
@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .ann_index import default_index_dir
+from .models import Post
+from .theme_index import from_blob, normalize, to_blob
+
+logger = logging.getLogger(__name__)
+
+SCAN_BLOCK_ROWS = 65536
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    if len(scores) > k:
+        best = np.argpartition(scores, -k)[-k:]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(scores[best])[::-1]]
+
+
+class PostIndex:
+    """Memory-mapped float32 matrix of post thesis embeddings, one row per post id.
+
+    Row `i` holds the embedding of post `i`; rows of posts without an
+    embedding are zero and never returned. The file grows by doubling and a
+    JSON sidecar records the model, dimension and number of stored rows so
+    startup can tell whether the file still matches the database.
+    """
+
+    def __init__(self, path: str, model_name: Optional[str] = None, dim: Optional[int] = None):
+        self.path = path
+        self.meta_path = f"{path}.json"
+        self.model_name = model_name
+        self.dim = dim
+        self.size = 0  # one past the highest post id stored
+        self.count = 0  # number of posts with an embedding
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _reserve(self, rows: int) -> None:
+        """Make sure the file has room for `rows` rows, remapping it if it grows."""
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows <= capacity:
+            return
+        capacity = max(1024, capacity * 2, rows)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self.path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _write_meta(self) -> None:
+        with open(self.meta_path, "w") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "size": self.size, "count": self.count}, f)
+
+    def update(self, rows: Iterable[Tuple[int, Optional[np.ndarray]]]) -> None:
+        """Store (post id, embedding) pairs; an embedding of None clears the row."""
+        rows = [(post_id, embedding) for post_id, embedding in rows if embedding is not None or post_id < self.size]
+        if not rows:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = next(len(embedding) for _, embedding in rows if embedding is not None)
+            self._reserve(max(post_id for post_id, _ in rows) + 1)
+            for post_id, embedding in rows:
+                had_row = bool(post_id < self.size and self._matrix[post_id].any())
+                if embedding is None:
+                    self._matrix[post_id] = 0
+                    self.count -= had_row
+                else:
+                    self._matrix[post_id] = normalize(embedding).reshape(-1)
+                    self.count += not had_row
+                self.size = max(self.size, post_id + 1)
+            self._matrix.flush()
+            self._write_meta()
+
+    def search(self, embedding: np.ndarray, k: int, post_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """Return up to k (post id, cosine similarity) pairs, best first.
+
+        With `post_ids`, only those posts are ranked; otherwise the whole
+        matrix is scanned in blocks, keeping the best k of each.
+        """
+        with self._lock:
+            if self._matrix is None or not self.size:
+                return []
+            vector = normalize(embedding).reshape(-1)
+            if post_ids is not None:
+                ids = np.fromiter((i for i in post_ids if i < self.size), dtype=np.int64)
+                rows = self._matrix[ids]
+                keep = rows.any(axis=1)
+                ids, scores = ids[keep], rows[keep] @ vector
+            else:
+                ids = np.empty(0, dtype=np.int64)
+                scores = np.empty(0, dtype=np.float32)
+                for start in range(0, self.size, SCAN_BLOCK_ROWS):
+                    block = self._matrix[start:min(self.size, start + SCAN_BLOCK_ROWS)]
+                    block_scores = block @ vector
+                    # Empty rows score exactly 0; rule them out before picking the best
+                    zero = np.flatnonzero(block_scores == 0)
+                    block_scores[zero[~block[zero].any(axis=1)]] = -np.inf
+                    best = top_k(block_scores, k)
+                    best = best[np.isfinite(block_scores[best])]
+                    ids = np.concatenate([ids, best + start])
+                    scores = np.concatenate([scores, block_scores[best]])
+            best = top_k(scores, k)
+            return [(int(ids[i]), float(scores[i])) for i in best]
+
+    def rebuild(self, session: Session) -> None:
+        """Rewrite the file from the embeddings stored on the post rows."""
+        with self._lock:
+            self._matrix = None
+            for path in (self.path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.size = self.count = 0
+            self.dim = None
+        query = (
+            select(Post.id, Post.embedding)
+            .where(Post.embedding != None, Post.embedding_model == self.model_name)  # noqa: E711
+            .order_by(Post.id)
+            .execution_options(yield_per=1000)
+        )
+        batch = []
+        for post_id, blob in session.exec(query):
+            batch.append((post_id, from_blob(blob)))
+            if len(batch) == 1000:
+                self.update(batch)
+                batch = []
+        self.update(batch)
+        logger.info(f"Rebuilt post embedding index with {self.count} posts")
+
+    @classmethod
+    def load(cls, session: Session, model_name: str, directory: Optional[str] = None) -> "PostIndex":
+        """Open the memory-mapped index, rebuilding it if it is out of step with the database."""
+        directory = directory or default_index_dir()
+        os.makedirs(directory, exist_ok=True)
+        index = cls(os.path.join(directory, "post_embeddings.f32"), model_name=model_name)
+        stored = session.exec(
+            select(func.count(Post.id)).where(
+                Post.embedding != None, Post.embedding_model == model_name  # noqa: E711
+            )
+        ).one()
+        try:
+            with open(index.meta_path) as f:
+                meta = json.load(f)
+            if meta["model"] != model_name or meta["count"] != stored:
+                raise ValueError("index does not match the database")
+            if meta["dim"] is not None:
+                index.dim = meta["dim"]
+                index.size, index.count = meta["size"], meta["count"]
+                capacity = os.path.getsize(index.path) // (index.dim * 4)
+                index._matrix = np.memmap(index.path, dtype=np.float32, mode="r+", shape=(capacity, index.dim))
+        except Exception as e:
+            logger.info(f"Rebuilding post embedding index ({str(e)})")
+            index.rebuild(session)
+        logger.info(f"Loaded post embedding index with {len(index)} posts")
+        return index
+
+
+def backfill_post_embeddings(batch_size: int = 200):
+    """Compute thesis embeddings for posts stored without one (or with a stale one)."""
+    from .database import engine
+    from .nlp_processor import NLPProcessor
+
+    nlp_processor = NLPProcessor()
+    with Session(engine) as session:
+        missing = session.exec(
+            select(Post.id).where(
+                (Post.embedding == None) | (Post.embedding_model != nlp_processor.model_name)  # noqa: E711
+            )
+        ).all()
+        logger.info(f"Encoding thesis embeddings for {len(missing)} posts")
+        for start in range(0, len(missing), batch_size):
+            posts = session.exec(select(Post).where(Post.id.in_(missing[start:start + batch_size]))).all()
+            theses = nlp_processor.extract_thesis_batch([post.content for post in posts])
+            for post, (_, embedding) in zip(posts, theses):
+                post.embedding = to_blob(embedding) if embedding is not None else None
+                post.embedding_model = nlp_processor.model_name if embedding is not None else None
+                session.add(post)
+            session.commit()
+        return PostIndex.load(session, nlp_processor.model_name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Manage the memory-mapped post embedding index")
+    parser.add_argument("command", choices=["backfill"], help="backfill: embed posts stored without an embedding")
+    parser.parse_args()
+    backfill_post_embeddings()
@@ -1,5 +1,10 @@
 from sentence_transformers import SentenceTransformer
+import argparse
+import json
 import logging
+import os
+
+from .encoders import onnx_model_dir
 
 # Configure logging
 logging.basicConfig(
@@ -8,18 +13,79 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def preload_model():
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+def preload_model(model_name: str = MODEL_NAME):
     """
     Pre-download the SentenceTransformer model to improve initial loading time.
     """
     try:
         logger.info("Starting model pre-download...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        model = SentenceTransformer(model_name)
         logger.info("Model successfully downloaded and cached")
         return model
     except Exception as e:
         logger.error(f"Error preloading model: {str(e)}")
         raise
 
+def export_onnx(model: SentenceTransformer, model_name: str = MODEL_NAME, output_dir: str = None, quantize: bool = False):
+    """
+    Export the model's transformer to ONNX for the onnx embedding backends.
+
+    Writes model.onnx (and model.int8.onnx with `quantize`), the tokenizer and
+    an encoder.json describing pooling, to the directory the backend reads.
+    """
+    import torch
+
+    output_dir = output_dir or onnx_model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    transformer = model[0].auto_model
+    tokenizer = model.tokenizer
+
+    logger.info(f"Exporting {model_name} to ONNX in {output_dir}...")
+    sample = tokenizer(["An example sentence to trace the model."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    transformer.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    pooling = "mean"
+    for module in model:
+        if type(module).__name__ == "Pooling" and module.get_pooling_mode_str() == "cls":
+            pooling = "cls"
+    with open(os.path.join(output_dir, "encoder.json"), "w") as f:
+        json.dump({"model": model_name, "pooling": pooling, "max_seq_length": model.max_seq_length}, f)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing ONNX model weights to int8...")
+        quantize_dynamic(
+            os.path.join(output_dir, "model.onnx"),
+            os.path.join(output_dir, "model.int8.onnx"),
+            weight_type=QuantType.QInt8,
+        )
+    logger.info("ONNX export complete")
+    return output_dir
+
 if __name__ == "__main__":
-    preload_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download the embedding model and optionally export it")
+    parser.add_argument("--export", choices=["onnx"], help="Also export the model for the onnx backends")
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8-quantized ONNX model")
+    parser.add_argument("--output-dir", help="Export directory (default: ONNX_MODEL_DIR or data/onnx/<model>)")
+    args = parser.parse_args()
+
+    model = preload_model()
+    if args.export == "onnx":
+        export_onnx(model, output_dir=args.output_dir, quantize=args.quantize)
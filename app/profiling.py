@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StackSampler:
+    """Sampling profiler over every thread of the process.
+
+    While running, a background thread records the stack of each thread
+    that is executing code from the app package every `interval` seconds,
+    so work handed to thread pools (sync endpoints, the NLP executor) is
+    captured too. Idle threads are skipped. Samples from concurrent requests
+    are mixed in, so profile on a quiet instance.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(APP_DIR)
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if in_app:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Samples in the folded-stack format read by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .metrics import CACHE_LOOKUPS
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # responses kept per process
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))  # in seconds
+# redis://host:6379/0 to share cached responses and invalidations between API processes
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+# Every cached response depends on this tag, so bumping it clears the whole cache
+ALL = "all"
+
+# Cached GET routes and the tags their responses depend on
+CACHED_ROUTES = [
+    (re.compile(r"^/posts$"), lambda match: ("posts",)),
+    (re.compile(r"^/themes$"), lambda match: ("themes",)),
+    (re.compile(r"^/themes/(\d+)$"), lambda match: (theme_tag(int(match.group(1))),)),
+]
+
+# Response headers stored with the body
+KEPT_HEADERS = ("content-type", "x-next-cursor")
+
+
+def theme_tag(theme_id: int) -> str:
+    return f"theme:{theme_id}"
+
+
+def route_tags(path: str) -> Optional[Tuple[str, ...]]:
+    """Tags of a cacheable route, or None if responses for the path are not cached."""
+    for pattern, tags in CACHED_ROUTES:
+        match = pattern.match(path)
+        if match:
+            return (ALL,) + tags(match)
+    return None
+
+
+def response_key(path: str, query: Iterable[Tuple[str, str]]) -> str:
+    """Cache key of a request: the path and its query parameters in a canonical order."""
+    return path + "?" + "&".join(f"{name}={value}" for name, value in sorted(query))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: Dict[str, str]
+    etag: str
+    versions: Dict[str, int] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+
+class ResponseCache:
+    """LRU cache of rendered JSON responses with a TTL and tag-based invalidation.
+
+    Each response is stored with the version of every tag it depends on
+    (e.g. "themes" or "theme:42"); invalidating a tag bumps its version, so
+    entries stored under an older version are treated as misses. With
+    RESPONSE_CACHE_URL set, entries and tag versions live in Redis and are
+    shared by every process; otherwise they are local to this process.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        url: Optional[str] = RESPONSE_CACHE_URL
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if url:
+            if redis is None:
+                raise RuntimeError("RESPONSE_CACHE_URL is set but the redis package is not installed (pip install redis)")
+            self._redis = redis.Redis.from_url(url)
+            logger.info(f"Sharing the response cache through {url}")
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Current version of each tag; read before rendering a response that will be stored."""
+        tags = list(tags)
+        if self._redis is not None:
+            values = self._redis.mget([f"response-version:{tag}" for tag in tags])
+            return {tag: int(value or 0) for tag, value in zip(tags, values)}
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the cached response if it has neither expired nor been invalidated."""
+        entry = self._load(key)
+        if entry is not None and entry.versions != self.versions(entry.versions):
+            entry = None
+        CACHE_LOOKUPS.labels("response", "hit" if entry is not None else "miss").inc()
+        return entry
+
+    def _load(self, key: str) -> Optional[CachedResponse]:
+        if self._redis is not None:
+            data = self._redis.get(f"response:{key}")
+            if data is None:
+                return None
+            stored = json.loads(data)
+            return CachedResponse(
+                body=stored["body"].encode("utf-8"), headers=stored["headers"],
+                etag=stored["etag"], versions=stored["versions"]
+            )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, body: bytes, headers: Dict[str, str], versions: Dict[str, int]) -> CachedResponse:
+        """Store a rendered response under the tag versions read before it was rendered."""
+        entry = CachedResponse(
+            body=body, headers=headers, etag=make_etag(body),
+            versions=versions, expires_at=time.monotonic() + self.ttl
+        )
+        if self._redis is not None:
+            data = json.dumps({
+                "body": body.decode("utf-8"), "headers": headers,
+                "etag": entry.etag, "versions": versions
+            })
+            self._redis.set(f"response:{key}", data, ex=max(int(self.ttl), 1))
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Make every response depending on any of the tags stale."""
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return
+        if self._redis is not None:
+            pipeline = self._redis.pipeline()
+            for tag in tags:
+                pipeline.incr(f"response-version:{tag}")
+            pipeline.execute()
+        else:
+            with self._lock:
+                for tag in tags:
+                    self._versions[tag] = self._versions.get(tag, 0) + 1
+        logger.debug(f"Invalidated cached responses for {len(tags)} tags")
+
+    def invalidate_all(self) -> None:
+        self.invalidate([ALL])
+
+    def clear(self) -> None:
+        """Drop this process's cached responses."""
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """The process-wide response cache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def invalidate_posts(theme_ids: Iterable[Optional[int]]) -> None:
+    """Invalidate the post and theme listings and the timelines of the given themes."""
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    tags: List[str] = ["posts", "themes"]
+    tags.extend(theme_tag(theme_id) for theme_id in theme_ids if theme_id is not None)
+    try:
+        get_response_cache().invalidate(tags)
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached responses: {str(e)}")
+
+
+def invalidate_all() -> None:
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    try:
+        get_response_cache().invalidate_all()
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached responses: {str(e)}")
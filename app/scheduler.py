@@ -0,0 +1,142 @@
+import logging
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from dotenv import load_dotenv
+from sqlmodel import Session, or_, select
+
+from .database import engine
+from .feed_processor import FEED_POLL_INTERVAL, FeedProcessor
+from .models import Feed
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_TICK = int(os.getenv("SCHEDULER_TICK", "30"))
+SCHEDULER_MAX_CONCURRENT_FEEDS = int(os.getenv("SCHEDULER_MAX_CONCURRENT_FEEDS", "4"))
+SCHEDULER_MAX_BACKOFF = int(os.getenv("SCHEDULER_MAX_BACKOFF", str(24 * 3600)))
+THEME_MERGE_INTERVAL = int(os.getenv("THEME_MERGE_INTERVAL", "0"))  # 0 disables the merge job
+
+
+class FeedScheduler:
+    """Poll registered feeds in the background.
+
+    A tick job checks for due feeds every `tick` seconds and starts a one-off
+    poll job for each, on a thread pool of `max_concurrent` workers. A feed is
+    never polled twice at once; after a poll it is rescheduled `interval`
+    seconds later plus up to 10% jitter, and after failures the delay doubles
+    per consecutive error up to `max_backoff`. With a `merge_interval`, themes
+    are re-clustered that often.
+    """
+
+    def __init__(
+        self,
+        feed_processor: FeedProcessor,
+        interval: int = FEED_POLL_INTERVAL,
+        tick: int = SCHEDULER_TICK,
+        max_concurrent: int = SCHEDULER_MAX_CONCURRENT_FEEDS,
+        max_backoff: int = SCHEDULER_MAX_BACKOFF,
+        merge_interval: int = THEME_MERGE_INTERVAL
+    ):
+        self.feed_processor = feed_processor
+        self.interval = interval
+        self.tick = tick
+        self.max_concurrent = max_concurrent
+        self.max_backoff = max_backoff
+        self.merge_interval = merge_interval
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self.scheduler = BackgroundScheduler(
+            executors={"default": ThreadPoolExecutor(max_concurrent)},
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": tick}
+        )
+        logger.info("FeedScheduler initialized")
+
+    def start(self) -> None:
+        self.scheduler.add_job(
+            self.poll_due_feeds, "interval", seconds=self.tick, id="poll-due-feeds",
+            next_run_time=datetime.now()
+        )
+        if self.merge_interval:
+            self.scheduler.add_job(self.merge_themes, "interval", seconds=self.merge_interval, id="merge-themes")
+        self.scheduler.start()
+        logger.info(f"Feed scheduler started (interval {self.interval}s, {self.max_concurrent} concurrent feeds)")
+
+    def shutdown(self) -> None:
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+
+    def _next_poll_at(self, error_count: int) -> datetime:
+        delay = min(self.interval * 2 ** error_count, max(self.interval, self.max_backoff))
+        return datetime.utcnow() + timedelta(seconds=delay + random.uniform(0, 0.1 * self.interval))
+
+    def poll_due_feeds(self) -> None:
+        """Start poll jobs for active feeds whose next poll time has passed."""
+        try:
+            with Session(engine) as session:
+                due = session.exec(
+                    select(Feed.url)
+                    .where(Feed.active == True)  # noqa: E712
+                    .where(or_(Feed.next_poll_at == None, Feed.next_poll_at <= datetime.utcnow()))  # noqa: E711
+                    .order_by(Feed.next_poll_at)
+                ).all()
+        except Exception as e:
+            logger.error(f"Error loading due feeds: {str(e)}")
+            return
+
+        for feed_url in due:
+            with self._lock:
+                if feed_url in self._running:
+                    continue
+                self._running.add(feed_url)
+            self.scheduler.add_job(self.poll_feed, args=[feed_url], id=f"poll:{feed_url}", replace_existing=True)
+
+    def merge_themes(self) -> None:
+        """Re-cluster themes, merging near-duplicates."""
+        try:
+            result = self.feed_processor.recluster_themes()
+            logger.info(f"Theme merge job finished: {result}")
+        except Exception as e:
+            logger.error(f"Error merging themes: {str(e)}")
+
+    def poll_feed(self, feed_url: str) -> Optional[dict]:
+        """Process one feed and reschedule it, backing off after errors."""
+        result = None
+        error = None
+        try:
+            logger.info(f"Polling feed: {feed_url}")
+            result = self.feed_processor.process_feed(feed_url)
+            error = result.get("error")
+        except Exception as e:
+            error = str(e)
+        finally:
+            self._reschedule(feed_url, error)
+            with self._lock:
+                self._running.discard(feed_url)
+        return result
+
+    def _reschedule(self, feed_url: str, error: Optional[str]) -> None:
+        try:
+            with Session(engine) as session:
+                feed = session.exec(select(Feed).where(Feed.url == feed_url)).first()
+                if feed is None:
+                    return
+                if error:
+                    feed.error_count += 1
+                    feed.last_error = error
+                    logger.warning(f"Polling {feed_url} failed ({feed.error_count} in a row): {error}")
+                else:
+                    feed.error_count = 0
+                    feed.last_error = None
+                feed.next_poll_at = self._next_poll_at(feed.error_count)
+                session.add(feed)
+                session.commit()
+        except Exception as e:
+            logger.error(f"Error rescheduling feed {feed_url}: {str(e)}")
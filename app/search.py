@@ -0,0 +1,185 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, func, text
+from sqlmodel import Session, select
+
+from .database import engine
+from .models import Post, Theme
+from .pagination import decode_cursor, encode_cursor
+from .theme_index import ID_BATCH
+
+SNIPPET_TOKENS = 16
+# Semantic searches whose filters match at most this many posts score just those posts
+FILTERED_SCAN_ROWS = 50000
+
+SQLITE_SEARCH = """
+SELECT post.id, post.title, post.url, post.published_at, post.theme_id,
+       snippet(post_fts, -1, '<b>', '</b>', '...', :tokens) AS snippet,
+       post_fts.rank AS score
+FROM post_fts JOIN post ON post.id = post_fts.rowid
+WHERE post_fts MATCH :query {after}
+ORDER BY post_fts.rank, post.id
+LIMIT :limit
+"""
+
+POSTGRES_SEARCH = """
+SELECT * FROM (
+    SELECT post.id, post.title, post.url, post.published_at, post.theme_id,
+           ts_headline('english', coalesce(post.content, post.title), query,
+                       'MaxFragments=1, MinWords=5, MaxWords=' || :tokens) AS snippet,
+           -ts_rank_cd(post.search_vector, query) AS score
+    FROM post, websearch_to_tsquery('english', :query) AS query
+    WHERE post.search_vector @@ query
+) AS matches
+WHERE true {after}
+ORDER BY score, id
+LIMIT :limit
+"""
+
+
+def fts_query(query: str) -> str:
+    """Quote each word so user input can't be parsed as FTS5 query syntax."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_posts(query: str, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Return one page of posts matching `query`, best first, with highlighted snippets.
+
+    Scores are ascending (lower is better, as with bm25), so the page cursor is
+    the (score, id) of the last row.
+    """
+    params = {"tokens": SNIPPET_TOKENS, "limit": limit + 1}
+    if engine.dialect.name == "sqlite":
+        sql, score, row_id = SQLITE_SEARCH, "post_fts.rank", "post.id"
+        params["query"] = fts_query(query)
+    elif engine.dialect.name == "postgresql":
+        sql, score, row_id = POSTGRES_SEARCH, "score", "id"
+        params["query"] = query
+    else:
+        raise HTTPException(status_code=501, detail=f"Full-text search is not supported on {engine.dialect.name}")
+    if not params["query"]:
+        return [], None
+
+    after = ""
+    if cursor:
+        values = decode_cursor(cursor, "id")
+        if len(values) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        params["after_score"], params["after_id"] = values
+        after = f"AND ({score} > :after_score OR ({score} = :after_score AND {row_id} > :after_id))"
+    with Session(engine) as session:
+        statement = text(sql.format(after=after)).columns(published_at=DateTime)
+        rows = session.execute(statement, params).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]["score"], rows[-1]["id"]])
+    return [dict(row) for row in rows], next_cursor
+
+
+def rank_posts(session: Session, post_index, embedding, k: int, filters: List) -> List[Tuple[int, float]]:
+    """The k posts matching `filters` closest to the embedding, as (post id, similarity) pairs.
+
+    Filters matching at most FILTERED_SCAN_ROWS posts are resolved in SQL and
+    only those rows are scored. Broader filters rank the whole index and check
+    the best candidates against the filters in SQL, widening the candidates
+    until k of them match; the result is the same exact top k.
+    """
+    if not filters:
+        return post_index.search(embedding, k)
+    matching = session.exec(select(func.count(Post.id)).where(*filters)).one()
+    if not matching:
+        return []
+    if matching <= FILTERED_SCAN_ROWS:
+        return post_index.search(embedding, k, session.exec(select(Post.id).where(*filters)).all())
+
+    total = len(post_index)
+    # Expect matching / total of the candidates to pass the filters, with a margin
+    candidates = min(total, k + 2 * k * total // matching)
+    while True:
+        ranked = post_index.search(embedding, candidates)
+        ids = [post_id for post_id, _ in ranked]
+        allowed = set()
+        for start in range(0, len(ids), ID_BATCH):
+            allowed.update(session.exec(
+                select(Post.id).where(Post.id.in_(ids[start:start + ID_BATCH]), *filters)
+            ).all())
+        kept = [(post_id, score) for post_id, score in ranked if post_id in allowed]
+        if len(kept) >= k or candidates >= total:
+            return kept[:k]
+        candidates = min(total, candidates * 4)
+
+
+def semantic_search(
+    feed_processor,
+    query: str,
+    k: int,
+    kind: str = "all",
+    theme_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict:
+    """Rank posts and themes by cosine similarity to the query's embedding.
+
+    Only the query is encoded, through thesis extraction like the posts;
+    posts are ranked against the memory-mapped post index and themes against
+    the in-memory theme index. Theme and date filters are applied as in
+    `rank_posts`.
+    """
+    # The query is embedded the way a post's thesis is, so it compares with stored posts and themes
+    embedding = feed_processor.nlp_processor.extract_thesis_batch([query])[0][1]
+    results = {"query": query}
+    if embedding is None:
+        results.update({key: [] for key in ("posts", "themes") if kind in (key, "all")})
+        return results
+
+    with Session(engine) as session:
+        if kind in ("posts", "all"):
+            filters = []
+            if theme_id is not None:
+                filters.append(Post.theme_id == theme_id)
+            if start:
+                filters.append(Post.published_at >= start)
+            if end:
+                filters.append(Post.published_at <= end)
+            ranked = []
+            if feed_processor.post_index:
+                ranked = rank_posts(session, feed_processor.post_index, embedding, k, filters)
+            rows = {
+                row.id: row for row in session.exec(
+                    select(Post.id, Post.title, Post.url, Post.published_at, Post.theme_id)
+                    .where(Post.id.in_([post_id for post_id, _ in ranked]))
+                ).all()
+            }
+            results["posts"] = [
+                {**rows[post_id]._asdict(), "score": score} for post_id, score in ranked if post_id in rows
+            ]
+
+        if kind in ("themes", "all"):
+            theme_ids = None
+            if theme_id is not None:
+                theme_ids = [theme_id]
+            elif start or end:
+                # Themes whose first-last seen range overlaps the requested dates
+                candidates = select(Theme.id)
+                if start:
+                    candidates = candidates.where(Theme.last_seen_at >= start)
+                if end:
+                    candidates = candidates.where(Theme.first_seen_at <= end)
+                theme_ids = session.exec(candidates).all()
+            ranked = feed_processor.theme_index.top_k(embedding, k, theme_ids) if feed_processor.theme_index else []
+            rows = {
+                row.id: row for row in session.exec(
+                    select(Theme.id, Theme.thesis, Theme.post_count, Theme.first_seen_at, Theme.last_seen_at)
+                    .where(Theme.id.in_([theme_id for theme_id, _ in ranked]))
+                ).all()
+            }
+            results["themes"] = [
+                {**rows[theme_id]._asdict(), "score": score} for theme_id, score in ranked if theme_id in rows
+            ]
+    return results
@@ -0,0 +1,91 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import List
+
+# Tags whose text is never prose
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+# Tags that end a block of text, so sentences never run across them
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "pre", "table", "tr", "td", "th", "section", "article",
+    "header", "footer", "figure", "figcaption", "hr",
+}
+
+URL_PATTERN = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+# A sentence ends at . ! or ? (plus up to two closing quotes/brackets, which
+# stay with it) followed by whitespace and an uppercase letter, digit or
+# opening quote, so decimals, version numbers and most abbreviations don't split
+SENTENCE_BOUNDARY = re.compile(
+    r"(?:(?<=[.!?])|(?<=[.!?][\"')\]])|(?<=[.!?][\"')\]]{2}))\s+(?=[\"'(\[]?[A-Z0-9])"
+)
+MIN_SENTENCE_WORDS = 3
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skipping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def strip_html(text: str) -> str:
+    """Convert HTML to plain text, keeping block boundaries as newlines."""
+    if "<" not in text:
+        return unescape(text)
+    extractor = _TextExtractor()
+    try:
+        extractor.feed(text)
+        extractor.close()
+    except Exception:
+        return unescape(re.sub(r"<[^>]+>", " ", text))
+    return "".join(extractor.parts)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split HTML or plain text into prose sentences.
+
+    Markup, URLs and fragments shorter than MIN_SENTENCE_WORDS words (menu
+    items, "Read more", bylines) are dropped, unless that leaves nothing, as
+    for a post that is only a short title.
+    """
+    sentences = []
+    fragments = []
+    for block in strip_html(text).split("\n"):
+        block = re.sub(r"\s+", " ", URL_PATTERN.sub(" ", block)).strip()
+        if not block:
+            continue
+        for sentence in SENTENCE_BOUNDARY.split(block):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= MIN_SENTENCE_WORDS:
+                sentences.append(sentence)
+            elif re.search(r"\w", sentence):
+                fragments.append(sentence)
+    return sentences or fragments
+
+
+def sample_sentences(sentences: List[str], limit: int) -> List[str]:
+    """Cap the candidates of a long post, keeping its opening and an even spread of the rest."""
+    if limit <= 0 or len(sentences) <= limit:
+        return sentences
+    lead = limit // 2
+    spread = limit - lead
+    # Evenly spaced from the first sentence after the lead to the last one
+    step = (len(sentences) - 1 - lead) / max(spread - 1, 1)
+    return sentences[:lead] + [sentences[lead + round(i * step)] for i in range(spread)]
@@ -0,0 +1,203 @@
+import argparse
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from .models import Post, Theme
+from .theme_index import ID_BATCH, from_blob, normalize, to_blob
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+THEME_MERGE_THRESHOLD = float(os.getenv("THEME_MERGE_THRESHOLD", "0.85"))
+# Rows of the centroid similarity matrix computed at once (rows x themes floats)
+THEME_MERGE_CHUNK = int(os.getenv("THEME_MERGE_CHUNK", "256"))
+POST_SCAN_BATCH = 5000
+
+
+def recompute_centroids(session: Session, model_name: str) -> int:
+    """Set each theme's embedding to the mean of its posts' thesis embeddings.
+
+    Corrects the drift of the running centroids kept during ingestion. Themes
+    without member embeddings keep their current embedding. Returns the
+    number of themes updated.
+    """
+    theme_ids = session.exec(select(Theme.id).order_by(Theme.id)).all()
+    if not theme_ids:
+        return 0
+    positions = {theme_id: row for row, theme_id in enumerate(theme_ids)}
+    sums = None
+    counts = np.zeros(len(theme_ids), dtype=np.int64)
+    result = session.execute(
+        select(Post.theme_id, Post.embedding)
+        .where(Post.theme_id != None, Post.embedding != None, Post.embedding_model == model_name)  # noqa: E711
+        .execution_options(yield_per=POST_SCAN_BATCH)
+    )
+    for rows in result.partitions():
+        rows = [(positions[theme_id], blob) for theme_id, blob in rows if theme_id in positions]
+        if not rows:
+            continue
+        vectors = np.stack([from_blob(blob) for _, blob in rows])
+        if sums is None:
+            sums = np.zeros((len(theme_ids), vectors.shape[1]), dtype=np.float64)
+        targets = np.fromiter((row for row, _ in rows), dtype=np.int64, count=len(rows))
+        np.add.at(sums, targets, vectors)
+        np.add.at(counts, targets, 1)
+    if sums is None:
+        return 0
+
+    updated = np.flatnonzero(counts)
+    centroids = (sums[updated] / counts[updated, None]).astype(np.float32)
+    for start in range(0, len(updated), ID_BATCH):
+        session.execute(update(Theme), [
+            {"id": theme_ids[row], "embedding": to_blob(centroid), "embedding_model": model_name}
+            for row, centroid in zip(updated[start:start + ID_BATCH], centroids[start:start + ID_BATCH])
+        ])
+    logger.info(f"Recomputed centroids of {len(updated)} themes")
+    return len(updated)
+
+
+def find_merges(
+    ids: np.ndarray,
+    matrix: np.ndarray,
+    counts: np.ndarray,
+    threshold: float = THEME_MERGE_THRESHOLD,
+    chunk_size: int = THEME_MERGE_CHUNK
+) -> Dict[int, int]:
+    """Map each near-duplicate theme id to the id of the theme it merges into.
+
+    Themes are visited from the most to the least posts (oldest first on
+    ties); a theme not yet absorbed keeps its id and absorbs every later theme
+    whose centroid is within `threshold` cosine similarity of its own. Unlike
+    transitive merging this never chains dissimilar themes together.
+    Similarities are computed `chunk_size` rows at a time against the themes
+    after them, so memory stays at chunk_size x len(ids) floats.
+    """
+    order = np.lexsort((ids, -counts))
+    ids = ids[order]
+    matrix = normalize(matrix[order])
+    absorbed = np.zeros(len(ids), dtype=bool)
+    merges: Dict[int, int] = {}
+    for start in range(0, len(ids), chunk_size):
+        similarities = matrix[start:start + chunk_size] @ matrix[start:].T
+        for offset, row in enumerate(similarities):
+            i = start + offset
+            if absorbed[i]:
+                continue
+            members = np.flatnonzero(row[offset + 1:] >= threshold) + i + 1
+            members = members[~absorbed[members]]
+            absorbed[members] = True
+            for j in members:
+                merges[int(ids[j])] = int(ids[i])
+    return merges
+
+
+def merge_themes(session: Session, merges: Dict[int, int]) -> None:
+    """Reassign the posts of merged themes in bulk and fold the themes into their targets.
+
+    Target themes get the summed post counts, the widest first/last seen
+    dates and the post-count-weighted mean of the centroids; merged themes
+    are deleted.
+    """
+    groups: Dict[int, List[int]] = {}
+    for theme_id, target_id in merges.items():
+        groups.setdefault(target_id, []).append(theme_id)
+
+    for target_id, theme_ids in groups.items():
+        for start in range(0, len(theme_ids), ID_BATCH):
+            session.execute(
+                update(Post).where(Post.theme_id.in_(theme_ids[start:start + ID_BATCH]))
+                .values(theme_id=target_id)
+                .execution_options(synchronize_session=False)
+            )
+
+    involved = list(groups) + list(merges)
+    themes: Dict[int, Theme] = {}
+    for start in range(0, len(involved), ID_BATCH):
+        batch = involved[start:start + ID_BATCH]
+        # Reload so centroids written by recompute_centroids are not read stale
+        for theme in session.exec(
+            select(Theme).where(Theme.id.in_(batch)).execution_options(populate_existing=True)
+        ):
+            themes[theme.id] = theme
+
+    for target_id, theme_ids in groups.items():
+        target = themes[target_id]
+        group = [target] + [themes[theme_id] for theme_id in theme_ids]
+        weights = np.array([theme.post_count for theme in group], dtype=np.float64)
+        if weights.sum() > 0 and all(theme.embedding is not None for theme in group):
+            vectors = np.stack([from_blob(theme.embedding) for theme in group])
+            target.embedding = to_blob(np.average(vectors, axis=0, weights=weights).astype(np.float32))
+        target.post_count = int(weights.sum())
+        first_seen = [theme.first_seen_at for theme in group if theme.first_seen_at is not None]
+        last_seen = [theme.last_seen_at for theme in group if theme.last_seen_at is not None]
+        target.first_seen_at = min(first_seen) if first_seen else None
+        target.last_seen_at = max(last_seen) if last_seen else None
+        session.add(target)
+    session.flush()
+
+    merged = list(merges)
+    for start in range(0, len(merged), ID_BATCH):
+        session.execute(
+            delete(Theme).where(Theme.id.in_(merged[start:start + ID_BATCH]))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def recluster_themes(
+    session: Session,
+    model_name: str,
+    threshold: float = THEME_MERGE_THRESHOLD,
+    chunk_size: int = THEME_MERGE_CHUNK,
+    recompute: bool = True
+) -> Dict:
+    """Recompute theme centroids and merge near-duplicate themes in one transaction."""
+    recomputed = recompute_centroids(session, model_name) if recompute else 0
+    rows = session.exec(
+        select(Theme.id, Theme.embedding, Theme.post_count)
+        .where(Theme.embedding != None, Theme.embedding_model == model_name)  # noqa: E711
+        .order_by(Theme.id)
+    ).all()
+    merges = {}
+    if rows:
+        ids = np.array([theme_id for theme_id, _, _ in rows], dtype=np.int64)
+        matrix = np.stack([from_blob(blob) for _, blob, _ in rows])
+        counts = np.array([post_count for _, _, post_count in rows], dtype=np.int64)
+        merges = find_merges(ids, matrix, counts, threshold, chunk_size)
+        if merges:
+            merge_themes(session, merges)
+    session.commit()
+    logger.info(f"Merged {len(merges)} of {len(rows)} themes (threshold {threshold})")
+    return {
+        "themes": len(rows),
+        "merged": len(merges),
+        "remaining": len(rows) - len(merges),
+        "centroids_recomputed": recomputed,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(
+        description="Recompute theme centroids and merge near-duplicate themes (run while the API is stopped)"
+    )
+    parser.add_argument("--threshold", type=float, default=THEME_MERGE_THRESHOLD)
+    parser.add_argument("--no-recompute", action="store_true", help="merge on the running centroids as stored")
+    args = parser.parse_args()
+
+    from .database import engine
+
+    with Session(engine) as session:
+        recluster_themes(
+            session, os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"), args.threshold,
+            recompute=not args.no_recompute
+        )
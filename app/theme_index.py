@@ -0,0 +1,300 @@
+import argparse
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, or_, select
+
+from .ann_index import (
+    ANN_CANDIDATES, ANN_MIN_SIZE, create_backend, default_index_dir,
+    load_backend, resolve_backend, save_backend
+)
+from .models import Post, Theme
+
+logger = logging.getLogger(__name__)
+
+# Bounds the number of parameters in one IN (...) clause
+ID_BATCH = 500
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector or a matrix of row vectors as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def to_blob(embedding: np.ndarray) -> bytes:
+    """Serialize an embedding for storage in a BLOB column."""
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    """Deserialize an embedding stored with `to_blob`."""
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class ThemeIndex:
+    """Contiguous matrix of normalized theme embeddings aligned with theme ids.
+
+    Rows are appended in place (the backing array grows by doubling) so adding
+    a theme never re-encodes or copies the existing ones on every insert.
+
+    With an ANN `backend` ("ivf", "hnswlib" or "faiss"), searches on indexes of
+    at least `min_size` themes only rerank the backend's candidate rows;
+    smaller indexes always use the exact scan.
+    """
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        backend: Optional[str] = None,
+        min_size: int = ANN_MIN_SIZE,
+        candidates: int = ANN_CANDIDATES,
+        model_name: Optional[str] = None
+    ):
+        self.dim = dim
+        self.ids: List[int] = []
+        self._matrix = np.empty((0, dim or 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.min_size = min_size
+        self.candidates = candidates
+        self.model_name = model_name
+        self._ann = None
+        self._dirty = False
+        self._moved = 0  # rows updated since the ANN backend was built
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the populated rows of the embedding matrix."""
+        return self._matrix[:len(self.ids)]
+
+    def add(self, theme_id: int, embedding: np.ndarray) -> None:
+        """Append a theme embedding to the index."""
+        vector = normalize(embedding).reshape(-1)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vector.shape[0]
+                self._matrix = np.empty((0, self.dim), dtype=np.float32)
+            if vector.shape[0] != self.dim:
+                raise ValueError(f"Embedding has dimension {vector.shape[0]}, index expects {self.dim}")
+            size = len(self.ids)
+            if size == self._matrix.shape[0]:
+                grown = np.empty((max(16, size * 2), self.dim), dtype=np.float32)
+                grown[:size] = self._matrix[:size]
+                self._matrix = grown
+            self._matrix[size] = vector
+            self.ids.append(theme_id)
+            self._dirty = True
+            if self._ann is not None and not self._ann.needs_rebuild(len(self.ids)):
+                self._ann.add(size, vector)
+            elif self.backend and len(self.ids) >= self.min_size:
+                self._build_ann()
+
+    def update(self, embeddings: Dict[int, np.ndarray]) -> None:
+        """Replace the embeddings of themes already in the index, as their centroids move.
+
+        The ANN backend keeps proposing candidates from the old vectors, which
+        are then reranked on the updated matrix; it is rebuilt once a quarter
+        of the rows have moved.
+        """
+        if not embeddings:
+            return
+        with self._lock:
+            rows = {theme_id: row for row, theme_id in enumerate(self.ids)}
+            for theme_id, embedding in embeddings.items():
+                row = rows.get(theme_id)
+                if row is not None:
+                    self._matrix[row] = normalize(embedding).reshape(-1)
+                    self._moved += 1
+            self._dirty = True
+            if self._ann is not None and self._moved * 4 > len(self.ids):
+                self._build_ann()
+
+    def remove(self, theme_ids: List[int]) -> None:
+        """Drop themes from the index, rebuilding the ANN backend if one is active."""
+        drop = set(theme_ids)
+        with self._lock:
+            keep = [row for row, theme_id in enumerate(self.ids) if theme_id not in drop]
+            if len(keep) == len(self.ids):
+                return
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self.ids = [self.ids[row] for row in keep]
+            self._dirty = True
+            if self._ann is not None:
+                if self.backend and len(self.ids) >= self.min_size:
+                    self._build_ann()
+                else:
+                    self._ann = None
+
+    def _build_ann(self) -> None:
+        logger.info(f"Building {self.backend} theme index over {len(self.ids)} themes")
+        self._ann = create_backend(self.backend, self.dim)
+        self._ann.build(self.matrix)
+        self._moved = 0
+
+    def search(self, embedding: np.ndarray) -> Tuple[Optional[int], float]:
+        """Return the id and cosine similarity of the closest theme."""
+        with self._lock:
+            if not self.ids:
+                return None, 0.0
+            vector = normalize(embedding).reshape(-1)
+            rows = self._ann.query(vector, self.candidates) if self._ann is not None else None
+            if rows is None or not len(rows):
+                similarities = self.matrix @ vector
+                best = int(np.argmax(similarities))
+                return self.ids[best], float(similarities[best])
+            similarities = self._matrix[rows] @ vector
+            best = int(np.argmax(similarities))
+            return self.ids[int(rows[best])], float(similarities[best])
+
+    def top_k(
+        self, embedding: np.ndarray, k: int, theme_ids: Optional[List[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (theme id, cosine similarity) pairs, best first, by exact scan.
+
+        With `theme_ids`, only those themes are ranked.
+        """
+        with self._lock:
+            if not self.ids:
+                return []
+            if theme_ids is None:
+                rows = np.arange(len(self.ids))
+            else:
+                allowed = set(theme_ids)
+                rows = np.array([row for row, theme_id in enumerate(self.ids) if theme_id in allowed], dtype=np.int64)
+            similarities = self._matrix[rows] @ normalize(embedding).reshape(-1)
+            best = np.argsort(similarities)[::-1][:k]
+            return [(self.ids[int(rows[i])], float(similarities[i])) for i in best]
+
+    def search_exact(self, embedding: np.ndarray) -> Tuple[Optional[int], float]:
+        """Brute-force search ignoring any ANN backend."""
+        with self._lock:
+            if not self.ids:
+                return None, 0.0
+            similarities = self.matrix @ normalize(embedding).reshape(-1)
+            best = int(np.argmax(similarities))
+            return self.ids[best], float(similarities[best])
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """Persist the ANN backend, if any, so startup can skip rebuilding it."""
+        with self._lock:
+            if self._ann is None or not self._dirty:
+                return
+            try:
+                save_backend(self._ann, list(self.ids), self.model_name, directory or default_index_dir())
+                self._dirty = False
+            except Exception as e:
+                logger.warning(f"Could not persist theme index: {str(e)}")
+
+    def _restore_ann(self, directory: Optional[str] = None) -> None:
+        """Reuse a persisted ANN backend that covers a prefix of the current themes."""
+        ann, ids = load_backend(self.backend, self.dim, self.model_name, directory or default_index_dir())
+        if ann is None or ids != self.ids[:len(ids)] or ann.needs_rebuild(len(self.ids)):
+            self._build_ann()
+            return
+        for row in range(len(ids), len(self.ids)):
+            ann.add(row, self._matrix[row])
+        self._ann = ann
+        self._dirty = len(ids) != len(self.ids)
+
+    @classmethod
+    def load(cls, session: Session, nlp_processor, rebuild: bool = False) -> "ThemeIndex":
+        """Load stored theme embeddings, encoding any that are missing or stale.
+
+        Embeddings computed with a different model than the processor's are
+        treated as stale; `rebuild=True` re-encodes every theme.
+        """
+        encode_stale_themes(session, nlp_processor, rebuild)
+        index = cls(model_name=nlp_processor.model_name)
+        for theme_id, embedding in session.exec(
+            select(Theme.id, Theme.embedding).where(Theme.embedding != None).order_by(Theme.id)  # noqa: E711
+        ):
+            index.add(theme_id, from_blob(embedding))
+        index.backend = resolve_backend()
+        if index.backend and len(index) >= index.min_size:
+            if rebuild:
+                index._build_ann()
+            else:
+                index._restore_ann()
+            index.save()
+        logger.info(f"Loaded theme index with {len(index)} themes")
+        return index
+
+
+def encode_stale_themes(session: Session, nlp_processor, rebuild: bool = False) -> int:
+    """Encode themes stored without an embedding from the processor's model (every theme with `rebuild`).
+
+    A theme's embedding is the centroid of its posts' thesis embeddings, so
+    it is recomputed from posts already encoded with the model. Themes
+    without such posts fall back to thesis extraction over the theme's text,
+    the same representation a post's thesis gets.
+    """
+    query = select(Theme).order_by(Theme.id)
+    if not rebuild:
+        query = query.where(or_(
+            Theme.embedding == None, Theme.embedding_model == None,  # noqa: E711
+            Theme.embedding_model != nlp_processor.model_name
+        ))
+    stale = session.exec(query).all()
+    if not stale:
+        return 0
+    logger.info(f"Encoding {len(stale)} theme embeddings")
+
+    sums: Dict[int, np.ndarray] = {}
+    counts: Dict[int, int] = {}
+    for start in range(0, len(stale), ID_BATCH):
+        theme_ids = [theme.id for theme in stale[start:start + ID_BATCH]]
+        for theme_id, blob in session.exec(
+            select(Post.theme_id, Post.embedding).where(
+                Post.theme_id.in_(theme_ids), Post.embedding != None,  # noqa: E711
+                Post.embedding_model == nlp_processor.model_name
+            )
+        ):
+            sums[theme_id] = sums.get(theme_id, 0) + from_blob(blob).astype(np.float64)
+            counts[theme_id] = counts.get(theme_id, 0) + 1
+    embeddings = {theme_id: (total / counts[theme_id]).astype(np.float32) for theme_id, total in sums.items()}
+
+    missing = [theme for theme in stale if theme.id not in embeddings]
+    if missing:
+        theses = nlp_processor.extract_thesis_batch([theme.thesis for theme in missing])
+        for theme, (_, embedding) in zip(missing, theses):
+            if embedding is None:
+                logger.warning(f"Could not encode theme {theme.id}: no sentences in its thesis")
+                continue
+            embeddings[theme.id] = embedding
+
+    for theme in stale:
+        if theme.id in embeddings:
+            theme.embedding = to_blob(embeddings[theme.id])
+            theme.embedding_model = nlp_processor.model_name
+            session.add(theme)
+    session.commit()
+    return len(embeddings)
+
+
+def rebuild_theme_index():
+    """Re-encode and store every theme embedding with the current model."""
+    from .database import engine
+    from .nlp_processor import NLPProcessor
+
+    with Session(engine) as session:
+        index = ThemeIndex.load(session, NLPProcessor(), rebuild=True)
+    return index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Manage the stored theme embedding index")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: re-encode all theme embeddings")
+    parser.parse_args()
+    rebuild_theme_index()
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+load_dotenv()
+
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:
+    Vector = None
+
+# Dimension of the pgvector columns; must match EMBEDDING_MODEL (384 for all-MiniLM-L6-v2)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+# auto: use pgvector on PostgreSQL when the pgvector package is installed
+PGVECTOR = os.getenv("PGVECTOR", "auto").lower()
+
+
+def pgvector_enabled(dialect_name: str) -> bool:
+    """Whether embeddings are stored as pgvector columns for this database dialect."""
+    if dialect_name != "postgresql" or PGVECTOR in ("0", "false", "no"):
+        return False
+    if Vector is None:
+        if PGVECTOR == "auto":
+            return False
+        raise RuntimeError("PGVECTOR is enabled but the pgvector package is not installed (pip install pgvector)")
+    return True
+
+
+class EmbeddingType(TypeDecorator):
+    """float32 embedding stored as a BLOB, or as a pgvector `vector` on PostgreSQL.
+
+    Either way the application reads and writes the bytes produced by
+    `theme_index.to_blob`.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if pgvector_enabled(dialect.name):
+            return dialect.type_descriptor(Vector(EMBEDDING_DIM))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not pgvector_enabled(dialect.name):
+            return value
+        return np.frombuffer(value, dtype=np.float32)
+
+    def process_result_value(self, value, dialect):
+        if value is None or not pgvector_enabled(dialect.name):
+            return value
+        return np.asarray(value, dtype=np.float32).tobytes()
@@ -0,0 +1,118 @@
+"""Latency, throughput and similarity drift of the embedding backends against torch.
+
+Runs on the sentences used by the NLP tests. The onnx backends need an export
+first (python -m app.preload_model --export onnx --quantize):
+
+    python -m benchmarks.encoder_benchmark --backends torch torch-int8 onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from app.encoders import BACKENDS, create_encoder
+
+TEST_SENTENCES = [
+    "This is the first sentence.",
+    "This is a similar sentence.",
+    "This is a different topic.",
+    "The impact of climate change on agriculture",
+    "New developments in quantum computing",
+    "Climate change effects on farming and crops",
+    "The history of ancient Rome",
+    "Climate change is hurting crops.",
+    "Farmers face longer droughts.",
+    "Yields are falling.",
+    "Quantum computers use qubits.",
+    "Error correction is the main challenge.",
+]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run(backend: str, model_name: str, repeats: int, batch_size: int, reference=None):
+    encoder = create_encoder(backend, model_name)
+    load_start = time.perf_counter()
+    encoder.load()
+    load_time = time.perf_counter() - load_start
+
+    embeddings = encoder.encode(TEST_SENTENCES, batch_size=batch_size)
+
+    # Latency of one sentence at a time, as when matching a single thesis
+    latencies = []
+    for _ in range(repeats):
+        for sentence in TEST_SENTENCES:
+            start = time.perf_counter()
+            encoder.encode([sentence], batch_size=1)
+            latencies.append(time.perf_counter() - start)
+
+    # Throughput of batched encoding, as during feed ingestion
+    corpus = TEST_SENTENCES * max(1, (repeats * 64) // len(TEST_SENTENCES))
+    start = time.perf_counter()
+    encoder.encode(corpus, batch_size=batch_size)
+    throughput = len(corpus) / (time.perf_counter() - start)
+
+    result = {
+        "backend": backend,
+        "load_seconds": load_time,
+        "latency_p50_ms": percentile_ms(latencies, 50),
+        "latency_p99_ms": percentile_ms(latencies, 99),
+        "sentences_per_second": throughput,
+    }
+    if reference is not None:
+        # Drift of each embedding, and of the pairwise similarities that thesis
+        # selection and the theme threshold are computed from
+        cosines = (embeddings * reference).sum(axis=1)
+        similarity_drift = np.abs(embeddings @ embeddings.T - reference @ reference.T)
+        result.update({
+            "mean_cosine_to_torch": float(cosines.mean()),
+            "min_cosine_to_torch": float(cosines.min()),
+            "max_similarity_drift": float(similarity_drift.max()),
+        })
+    return result, embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=[b for b in BACKENDS if b != "remote"])
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    # Drift is measured against the current torch backend
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+    reference = None
+    results = []
+    for backend in backends:
+        try:
+            result, embeddings = run(backend, args.model, args.repeats, args.batch_size, reference)
+        except Exception as e:
+            print(f"{backend:10} skipped: {str(e)}")
+            continue
+        if backend == "torch":
+            reference = embeddings
+        results.append(result)
+        drift = (
+            f"  cos={result['mean_cosine_to_torch']:.4f} (min {result['min_cosine_to_torch']:.4f})"
+            f"  sim drift={result['max_similarity_drift']:.4f}"
+            if "mean_cosine_to_torch" in result else ""
+        )
+        print(
+            f"{backend:10} load={result['load_seconds']:.2f}s  "
+            f"p50/p99={result['latency_p50_ms']:.2f}/{result['latency_p99_ms']:.2f}ms  "
+            f"{result['sentences_per_second']:.0f} sentences/s{drift}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
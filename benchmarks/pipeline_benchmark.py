@@ -0,0 +1,364 @@
+"""End-to-end benchmark of feed ingestion and the read endpoints at growing database sizes.
+
+Generates RSS and Atom feeds locally, ingests them with FeedProcessor.process_feed
+into a file-backed SQLite database in a scratch directory, and after each
+scaling point times the read endpoints through FastAPI's TestClient. Endpoints
+served from the response cache are timed twice: with the cache cleared before
+every request (the database path), and again as `<endpoint>_cached`:
+
+    python -m benchmarks.pipeline_benchmark --sizes 1000 10000 100000 --output bench.json
+    python -m benchmarks.pipeline_benchmark --sizes 1000 10000 --compare bench.json
+
+By default sentences are embedded with a deterministic hashing encoder so runs
+are fast and comparable across machines; `--encoder model` uses the configured
+EMBEDDING_MODEL and EMBEDDING_BACKEND instead.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from typing import Callable, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+FILLER = ("report", "analysis", "today", "shows", "growing", "evidence", "about", "new", "trend", "experts")
+
+
+class HashingModel:
+    """Stand-in for a SentenceTransformer: the normalized sum of fixed random word vectors.
+
+    Sentences sharing most of their words get similar embeddings, so posts
+    about the same synthetic topic cluster into one theme.
+    """
+
+    def __init__(self, dim: int = 384, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self._words: Dict[str, np.ndarray] = {}
+
+    def _word(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            rng = np.random.default_rng([self.seed, *word.encode("utf-8")])
+            vector = self._words[word] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True):
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().strip(".!?").split():
+                embeddings[row] += self._word(word)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+
+def topic_words(topic: int) -> List[str]:
+    return [f"topic{topic}word{i}" for i in range(8)]
+
+
+def post_text(topic: int, rng: np.random.Generator, sentences: int) -> str:
+    """A few sentences drawn mostly from the topic's vocabulary, as HTML paragraphs."""
+    words = topic_words(topic)
+    paragraphs = []
+    for _ in range(sentences):
+        chosen = list(rng.choice(words, size=6, replace=False)) + list(rng.choice(FILLER, size=2, replace=False))
+        rng.shuffle(chosen)
+        sentence = " ".join(chosen)
+        paragraphs.append(f"<p>{sentence.capitalize()}.</p>")
+    return "".join(paragraphs)
+
+
+def make_feed(
+    feed_number: int, start: int, count: int, topics: int, rng: np.random.Generator,
+    sentences: int, atom: bool
+) -> bytes:
+    """RSS 2.0 or Atom document with `count` entries, numbered from `start`."""
+    base = datetime(2024, 1, 1)
+    items = []
+    for number in range(start, start + count):
+        topic = int(rng.integers(0, topics))
+        link = f"https://bench.example.com/{feed_number}/posts/{number}"
+        published = base + timedelta(minutes=number)
+        title = escape(f"Post {number} on topic {topic}")
+        body = escape(post_text(topic, rng, sentences))
+        if atom:
+            items.append(
+                f"<entry><title>{title}</title><link href=\"{link}\"/><id>{link}</id>"
+                f"<updated>{published.isoformat()}Z</updated><content type=\"html\">{body}</content></entry>"
+            )
+        else:
+            items.append(
+                f"<item><title>{title}</title><link>{link}</link><guid>{link}</guid>"
+                f"<pubDate>{format_datetime(published)}</pubDate><description>{body}</description></item>"
+            )
+    if atom:
+        document = (
+            "<?xml version=\"1.0\" encoding=\"utf-8\"?><feed xmlns=\"http://www.w3.org/2005/Atom\">"
+            f"<title>Benchmark feed {feed_number}</title><id>urn:bench:{feed_number}</id>"
+            f"<updated>{base.isoformat()}Z</updated>{''.join(items)}</feed>"
+        )
+    else:
+        document = (
+            "<?xml version=\"1.0\" encoding=\"utf-8\"?><rss version=\"2.0\"><channel>"
+            f"<title>Benchmark feed {feed_number}</title><link>https://bench.example.com/{feed_number}</link>"
+            f"<description>Synthetic feed</description>{''.join(items)}</channel></rss>"
+        )
+    return document.encode("utf-8")
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000) if len(samples) else 0.0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def time_requests(client, requests: List[tuple], before_each: Optional[Callable[[], None]] = None) -> Dict:
+    """Issue (path, params) requests in order; latency percentiles and throughput.
+
+    `before_each`, if given, runs untimed before every request.
+    """
+    latencies = []
+    elapsed = 0.0
+    for path, params in requests:
+        if before_each is not None:
+            before_each()
+        request_start = time.perf_counter()
+        response = client.get(path, params=params)
+        latencies.append(time.perf_counter() - request_start)
+        elapsed += latencies[-1]
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} {params} returned {response.status_code}: {response.text[:200]}")
+    return {
+        "requests": len(requests),
+        "requests_per_second": len(requests) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99),
+    }
+
+
+def read_workload(client, queries: int, topics: int, rng: np.random.Generator) -> Dict[str, List[tuple]]:
+    """Requests for each read endpoint, using ids and cursors from the current database."""
+    first_page = client.get("/posts", params={"limit": 100})
+    cursor = first_page.headers.get("X-Next-Cursor")
+    theme_ids = [theme["id"] for theme in client.get("/themes", params={"limit": 100, "fields": "id"}).json()]
+
+    def pick_topic():
+        return int(rng.integers(0, topics))
+
+    return {
+        "posts_first_page": [("/posts", {"limit": 50})] * queries,
+        "posts_next_page": [("/posts", {"limit": 50, "cursor": cursor})] * queries if cursor else [],
+        "themes_page": [("/themes", {"limit": 50})] * queries,
+        "theme_timeline": [
+            (f"/themes/{theme_ids[i % len(theme_ids)]}", {"limit": 20}) for i in range(queries)
+        ] if theme_ids else [],
+        "fulltext_search": [
+            ("/posts/search", {"q": f"topic{pick_topic()}word{int(rng.integers(0, 8))}", "limit": 20})
+            for _ in range(queries)
+        ],
+        "semantic_search": [
+            ("/search/semantic", {"q": " ".join(topic_words(pick_topic())[:4]), "k": 10})
+            for _ in range(queries)
+        ],
+    }
+
+
+def run(args) -> Dict:
+    # The app reads its database and index locations at import time
+    workdir = tempfile.mkdtemp(prefix="culldron-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["THEME_INDEX_DIR"] = workdir
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    # Keep cached responses in this process, where the benchmark can clear them
+    os.environ["RESPONSE_CACHE_URL"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import logging
+    logging.basicConfig(level=os.environ["LOG_LEVEL"])
+    logging.getLogger().setLevel(os.environ["LOG_LEVEL"])
+
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session, func, select
+
+    import app.main as main
+    from app.database import create_db_and_tables, engine
+    from app.embedding_cache import EmbeddingCache
+    from app.feed_processor import FeedProcessor
+    from app.models import Post, Theme
+    from app.nlp_processor import NLPProcessor
+    from app.response_cache import RESPONSE_CACHE_ENABLED, get_response_cache, route_tags
+
+    response_cache = get_response_cache() if RESPONSE_CACHE_ENABLED else None
+    rng = np.random.default_rng(args.seed)
+    cache = EmbeddingCache(path=os.path.join(workdir, "embedding_cache.db"))
+    if args.encoder == "hashing":
+        nlp_processor = NLPProcessor(model=HashingModel(args.dim, args.seed), cache=cache, backend="torch")
+    else:
+        nlp_processor = NLPProcessor(cache=cache)
+    feed_processor = FeedProcessor(nlp_processor, max_items=None)
+    create_db_and_tables()
+
+    points = []
+    ingested = 0
+    feed_number = 0
+    try:
+        with TestClient(main.app) as client:
+            # Serve reads from the benchmark's processors rather than the ones built at startup
+            main.nlp_processor = nlp_processor
+            main.feed_processor = feed_processor
+            for size in sorted(args.sizes):
+                topics = max(1, size // args.posts_per_theme)
+                feed_times, stage_times = [], {}
+                ingested_before = ingested
+                ingest_start = time.perf_counter()
+                while ingested < size:
+                    count = min(args.feed_size, size - ingested)
+                    content = make_feed(
+                        feed_number, ingested, count, topics, rng, args.sentences, atom=feed_number % 2 == 1
+                    )
+                    start = time.perf_counter()
+                    result = feed_processor.process_feed(f"https://bench.example.com/{feed_number}.xml", content=content)
+                    feed_times.append(time.perf_counter() - start)
+                    if "error" in result:
+                        raise RuntimeError(f"Ingesting feed {feed_number} failed: {result['error']}")
+                    for stage, seconds in result.get("timings", {}).items():
+                        stage_times[stage] = stage_times.get(stage, 0.0) + seconds
+                    ingested += count
+                    feed_number += 1
+                ingest_time = time.perf_counter() - ingest_start
+
+                with Session(engine) as session:
+                    posts = session.exec(select(func.count(Post.id))).one()
+                    themes = session.exec(select(func.count(Theme.id))).one()
+                endpoints = {}
+                for name, requests in read_workload(client, args.queries, topics, rng).items():
+                    if not requests:
+                        continue
+                    cached = response_cache is not None and route_tags(requests[0][0]) is not None
+                    # Clearing the response cache before each request times the database path
+                    endpoints[name] = time_requests(client, requests, response_cache.clear if cached else None)
+                    if cached:
+                        endpoints[f"{name}_cached"] = time_requests(client, requests)
+                point = {
+                    "posts": posts,
+                    "themes": themes,
+                    "ingest": {
+                        "feeds": len(feed_times),
+                        "seconds": ingest_time,
+                        "posts_per_second": (ingested - ingested_before) / ingest_time if feed_times else 0.0,
+                        "feed_p50_ms": percentile_ms(feed_times, 50),
+                        "feed_p99_ms": percentile_ms(feed_times, 99),
+                        "stage_seconds": stage_times,
+                    },
+                    "endpoints": endpoints,
+                    "peak_rss_mb": peak_rss_mb(),
+                    "database_mb": os.path.getsize(os.path.join(workdir, "bench.db")) / (1024 * 1024),
+                }
+                points.append(point)
+                print_point(point)
+    finally:
+        if args.keep:
+            print(f"Kept benchmark data in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "encoder": args.encoder,
+        "config": {
+            "feed_size": args.feed_size, "posts_per_theme": args.posts_per_theme,
+            "sentences": args.sentences, "queries": args.queries, "seed": args.seed,
+        },
+        "points": points,
+    }
+
+
+def print_point(point: Dict) -> None:
+    ingest = point["ingest"]
+    print(
+        f"posts={point['posts']:>7} themes={point['themes']:>6}  "
+        f"ingest {ingest['posts_per_second']:.0f} posts/s, feed p50/p99={ingest['feed_p50_ms']:.0f}/"
+        f"{ingest['feed_p99_ms']:.0f}ms  peak RSS {point['peak_rss_mb']:.0f}MB"
+    )
+    for name, endpoint in point["endpoints"].items():
+        print(
+            f"    {name:24} p50/p99={endpoint['p50_ms']:.2f}/{endpoint['p99_ms']:.2f}ms  "
+            f"{endpoint['requests_per_second']:.0f} req/s"
+        )
+
+
+def compare(baseline: Dict, current: Dict) -> None:
+    """Print the relative change of each latency and throughput against a baseline run."""
+    print(f"\nChange against {baseline.get('commit') or 'baseline'} (positive latency = slower):")
+    old_points = {point["posts"]: point for point in baseline["points"]}
+    for point in current["points"]:
+        old = old_points.get(point["posts"])
+        if old is None:
+            continue
+        rows = [("ingest posts/s", old["ingest"]["posts_per_second"], point["ingest"]["posts_per_second"]),
+                ("ingest feed p99", old["ingest"]["feed_p99_ms"], point["ingest"]["feed_p99_ms"]),
+                ("peak RSS", old["peak_rss_mb"], point["peak_rss_mb"])]
+        for name, endpoint in point["endpoints"].items():
+            if name in old["endpoints"]:
+                rows.append((f"{name} p50", old["endpoints"][name]["p50_ms"], endpoint["p50_ms"]))
+                rows.append((f"{name} p99", old["endpoints"][name]["p99_ms"], endpoint["p99_ms"]))
+        print(f"posts={point['posts']}")
+        for name, before, after in rows:
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"    {name:30} {before:10.2f} -> {after:10.2f}  {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Post counts at which to measure; the database grows from one to the next")
+    parser.add_argument("--feed-size", type=int, default=500, help="Entries per generated feed")
+    parser.add_argument("--posts-per-theme", type=int, default=10, help="Posts per synthetic topic")
+    parser.add_argument("--sentences", type=int, default=5, help="Sentences per post")
+    parser.add_argument("--queries", type=int, default=200, help="Requests per read endpoint")
+    parser.add_argument("--encoder", choices=["hashing", "model"], default="hashing")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the hashing encoder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database and indexes")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Recall/latency benchmark of the ANN theme index against the exact scan.
+
+Uses synthetic clustered embeddings, so it runs without the sentence model:
+
+    python -m benchmarks.theme_index_benchmark --sizes 1000 10000 100000 --backend ivf
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.ann_index import resolve_backend
+from app.theme_index import ThemeIndex, normalize
+
+
+def synthetic_embeddings(size: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Clustered unit vectors, roughly mimicking sentence-embedding structure."""
+    centers = normalize(rng.normal(size=(max(1, size // 50), dim)))
+    assignment = rng.integers(0, len(centers), size=size)
+    return normalize(centers[assignment] + 0.35 * normalize(rng.normal(size=(size, dim))))
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run(size: int, dim: int, backend: str, queries: int, threshold: float, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    vectors = synthetic_embeddings(size, dim, rng)
+
+    build_start = time.perf_counter()
+    # min_size=size builds the ANN backend once, when the last theme is added
+    index = ThemeIndex(backend=backend, min_size=size)
+    for theme_id, vector in enumerate(vectors, start=1):
+        index.add(theme_id, vector)
+    build_time = time.perf_counter() - build_start
+
+    probes = normalize(vectors[rng.integers(0, size, size=queries)] + 0.25 * normalize(rng.normal(size=(queries, dim))))
+    exact_times, ann_times = [], []
+    top1_hits = decision_hits = 0
+    for probe in probes:
+        start = time.perf_counter()
+        exact_id, exact_score = index.search_exact(probe)
+        exact_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        ann_id, ann_score = index.search(probe)
+        ann_times.append(time.perf_counter() - start)
+
+        top1_hits += ann_id == exact_id
+        decision_hits += (ann_score >= threshold) == (exact_score >= threshold)
+
+    return {
+        "size": size,
+        "dim": dim,
+        "backend": backend,
+        "build_seconds": build_time,
+        "recall_at_1": top1_hits / queries,
+        "threshold_agreement": decision_hits / queries,
+        "exact_p50_ms": percentile_ms(exact_times, 50),
+        "exact_p99_ms": percentile_ms(exact_times, 99),
+        "ann_p50_ms": percentile_ms(ann_times, 50),
+        "ann_p99_ms": percentile_ms(ann_times, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    backend = resolve_backend(args.backend)
+    if backend is None:
+        parser.error("--backend exact has nothing to compare against")
+
+    results = []
+    for size in args.sizes:
+        result = run(size, args.dim, backend, args.queries, args.threshold, args.seed)
+        results.append(result)
+        print(
+            f"{backend:8} n={size:>7}  recall@1={result['recall_at_1']:.3f}  "
+            f"agree={result['threshold_agreement']:.3f}  "
+            f"exact p50/p99={result['exact_p50_ms']:.2f}/{result['exact_p99_ms']:.2f}ms  "
+            f"ann p50/p99={result['ann_p50_ms']:.2f}/{result['ann_p99_ms']:.2f}ms  "
+            f"build={result['build_seconds']:.1f}s"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,104 @@
 import os
+import re
 import pytest
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
 from sqlalchemy.pool import StaticPool
 
+import httpx
+import numpy as np
+
+from app import feed_processor as feed_processor_module
+from app.feed_processor import FeedProcessor
+
+def sqlite_engine(url, **kwargs):
+    """SQLite engine with the same transaction handling as app.database, so savepoints work."""
+    engine = create_engine(url, **kwargs)
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    SQLModel.metadata.create_all(engine)
+    return engine
+
 @pytest.fixture(autouse=True)
 def setup_test_database():
     """Create a test database in memory for each test."""
-    engine = create_engine(
+    engine = sqlite_engine(
         "sqlite://",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-    SQLModel.metadata.create_all(engine)
-    yield engine 
\ No newline at end of file
+    yield engine
+
+TOPICS = ("climate", "quantum", "football")
+
+class KeywordNLP:
+    """Stands in for NLPProcessor: the thesis is the first sentence, embedded by topic keywords."""
+    model_name = "keywords"
+
+    def __init__(self):
+        self.texts = []
+
+    def extract_thesis_batch(self, texts):
+        self.texts.extend(texts)
+        results = []
+        for text in texts:
+            words = re.findall(r"[a-z]+", text.lower())
+            embedding = np.array([words.count(topic) for topic in TOPICS], dtype=np.float32)
+            results.append(([text.split(".")[0]], embedding) if embedding.any() else ([], None))
+        return results
+
+    def find_similar_theme(self, embedding, theme_index, threshold=0.8):
+        theme_id, similarity = theme_index.search(embedding)
+        return (True, theme_id) if similarity >= threshold else (False, None)
+
+@pytest.fixture
+def feed_processor(setup_test_database, monkeypatch, tmp_path):
+    """A FeedProcessor writing to the test database, with a keyword thesis extractor."""
+    monkeypatch.setenv("THEME_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(feed_processor_module, "engine", setup_test_database)
+    processor = FeedProcessor(KeywordNLP())
+    with Session(setup_test_database) as session:
+        processor.load_theme_index(session)
+        processor.load_post_index(session)
+    return processor
+
+@pytest.fixture
+def serve_feeds(monkeypatch):
+    """Route feed downloads to `handler(request) -> httpx.Response` instead of the network.
+
+    Returns the list of requests made, for asserting on conditional headers.
+    """
+    requests = []
+
+    def serve(handler):
+        def record(request):
+            requests.append(request)
+            return handler(request)
+        transport = httpx.MockTransport(record)
+        client = httpx.Client(transport=transport)
+        monkeypatch.setattr(httpx, "stream", client.stream)
+        return transport
+    serve.requests = requests
+    return serve
+
+@pytest.fixture
+def api(setup_test_database, feed_processor, monkeypatch):
+    """A client for the API on the test database, skipping the startup model loading."""
+    from fastapi.testclient import TestClient
+
+    from app import main, pagination, search
+    from app.response_cache import get_response_cache
+
+    for module in (main, pagination, search):
+        monkeypatch.setattr(module, "engine", setup_test_database)
+    monkeypatch.setattr(main, "feed_processor", feed_processor)
+    get_response_cache().clear()
+    yield TestClient(main.app)
+    get_response_cache().clear()
@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import sqlite_engine
+from test_feed_processor import ENTRIES, RSS_HEADERS, make_feed
+
+from app import feed_processor as feed_processor_module
+from app.batch_ingest import BatchIngester
+
+@pytest.fixture(autouse=True)
+def file_database(feed_processor, monkeypatch, tmp_path):
+    # Validators are read from executor threads, which need their own connections
+    engine = sqlite_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    monkeypatch.setattr(feed_processor_module, "engine", engine)
+    return engine
+
+@pytest.fixture
+def mock_http(monkeypatch):
+    """Serve BatchIngester's AsyncClient from an async `handler(request)`."""
+    def serve(handler):
+        client_class = httpx.AsyncClient
+        monkeypatch.setattr(
+            httpx, "AsyncClient", lambda **kwargs: client_class(transport=httpx.MockTransport(handler), **kwargs)
+        )
+    return serve
+
+def ingest(feed_processor, feed_urls, **kwargs):
+    ingester = BatchIngester(feed_processor, **kwargs)
+    try:
+        return asyncio.run(ingester.ingest(feed_urls))
+    finally:
+        ingester.shutdown()
+
+def test_fetches_are_limited_per_host_and_overall(feed_processor, mock_http):
+    active = {"total": 0}
+    peaks = {"total": 0}
+
+    async def handler(request):
+        host = request.url.host
+        for key in ("total", host):
+            active[key] = active.get(key, 0) + 1
+            peaks[key] = max(peaks.get(key, 0), active[key])
+        await asyncio.sleep(0.02)
+        for key in ("total", host):
+            active[key] -= 1
+        return httpx.Response(200, headers=RSS_HEADERS, content=make_feed([]))
+
+    mock_http(handler)
+    feed_urls = [f"https://{host}.example.com/{number}.xml" for host in ("a", "b", "c") for number in range(4)]
+    report = ingest(feed_processor, feed_urls, max_concurrency=5, per_host=2)
+    assert report["failed"] == 0 and len(report["feeds"]) == 12
+    assert all(peaks[f"{host}.example.com"] == 2 for host in ("a", "b", "c"))
+    assert peaks["total"] == 5
+
+def test_failing_feeds_do_not_affect_the_others(feed_processor, mock_http):
+    async def handler(request):
+        if request.url.path == "/down.xml":
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/missing.xml":
+            return httpx.Response(404)
+        if request.url.path == "/broken.xml":
+            return httpx.Response(200, headers=RSS_HEADERS, content=b"<html>Not a feed")
+        return httpx.Response(200, headers=RSS_HEADERS, content=make_feed(ENTRIES))
+
+    mock_http(handler)
+    feed_urls = ["https://example.com/down.xml", "https://example.com/feed.xml", "https://example.com/missing.xml",
+                 "https://example.com/broken.xml", "https://example.com/feed.xml"]
+    report = ingest(feed_processor, feed_urls)
+
+    feeds = {feed["feed_url"]: feed for feed in report["feeds"]}
+    assert len(report["feeds"]) == 4  # duplicate URLs are fetched once
+    assert feeds["https://example.com/down.xml"]["message"] == "Error fetching feed"
+    assert "404" in feeds["https://example.com/missing.xml"]["error"]
+    assert "error" in feeds["https://example.com/broken.xml"]
+    assert feeds["https://example.com/feed.xml"]["processed"] == 3
+    assert (report["processed"], report["skipped"], report["failed"], report["not_modified"]) == (3, 0, 3, 0)
+    assert report["message"] == "Processed 1 of 4 feeds"
+
+def test_unchanged_feeds_are_not_reprocessed(feed_processor, mock_http):
+    async def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={**RSS_HEADERS, "ETag": '"v1"'}, content=make_feed(ENTRIES))
+
+    mock_http(handler)
+    assert ingest(feed_processor, ["https://example.com/feed.xml"])["processed"] == 3
+    report = ingest(feed_processor, ["https://example.com/feed.xml"])
+    assert (report["processed"], report["not_modified"]) == (0, 1)
+    assert feed_processor.get_feed_validators("https://example.com/feed.xml") == ('"v1"', None)
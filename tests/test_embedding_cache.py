@@ -0,0 +1,33 @@
+import numpy as np
+from app.embedding_cache import EmbeddingCache, cache_key
+
+def test_cache_key_normalizes_whitespace_and_includes_model():
+    assert cache_key("m", " Read  more\n") == cache_key("m", "Read more")
+    assert cache_key("m", "Read more") != cache_key("other", "Read more")
+
+def test_lru_is_bounded_by_bytes_and_backed_by_disk(tmp_path):
+    cache = EmbeddingCache(max_bytes=2 * 16, path=str(tmp_path / "cache.db"))
+    keys = [cache_key("m", str(i)) for i in range(3)]
+    cache.put_many(keys, np.eye(3, 4, dtype=np.float32))
+
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_bytes"] == 32
+
+    # The evicted first vector comes back from disk
+    vectors = cache.get_many(keys + [cache_key("m", "new")])
+    assert np.array_equal(vectors[0], [1, 0, 0, 0])
+    assert vectors[3] is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (2, 1, 1)
+
+def test_disk_tier_defaults_to_data_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("THEME_INDEX_DIR", raising=False)
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    EmbeddingCache(disk=False).get_many([cache_key("m", "text")])
+    assert list(tmp_path.iterdir()) == []
+
+    cache = EmbeddingCache()
+    cache.put_many([cache_key("m", "text")], np.ones((1, 4), dtype=np.float32))
+    assert cache.path == str(tmp_path / "data" / "embedding_cache.db")
+    assert (tmp_path / "data" / "embedding_cache.db").exists()
@@ -0,0 +1,15 @@
+import pytest
+from app.encoders import OnnxEncoder, TorchEncoder, create_encoder
+
+def test_create_encoder_selects_backend():
+    assert isinstance(create_encoder("torch", "m"), TorchEncoder)
+    assert create_encoder("torch-int8", "m").quantize
+    onnx = create_encoder("onnx-int8", "m")
+    assert isinstance(onnx, OnnxEncoder) and onnx.quantize
+    with pytest.raises(ValueError):
+        create_encoder("tensorflow", "m")
+
+def test_onnx_encoder_requires_export(tmp_path):
+    encoder = OnnxEncoder("m", directory=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        encoder.load()
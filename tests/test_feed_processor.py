@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import httpx
+from sqlmodel import Session, select
+
+from app import feed_processor as feed_processor_module
+from app.feed_processor import FEED_POLL_INTERVAL
+from app.models import Feed, Post, Theme
+
+def make_feed(entries):
+    items = "".join(
+        f"<item><title>{title}</title><link>https://example.com/{number}</link>"
+        f"<description>{body}</description></item>"
+        for number, (title, body) in enumerate(entries)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>{items}</channel></rss>'.encode()
+
+RSS_HEADERS = {"Content-Type": "application/rss+xml"}
+
+ENTRIES = [
+    ("Climate", "Climate change is hurting crops. Farmers adapt."),
+    ("Quantum", "Quantum computers use qubits. Quantum error correction is hard."),
+    ("Football", "Football season starts. The football league expands."),
+]
+
+def test_reingesting_skips_unchanged_entries(feed_processor, setup_test_database):
+    nlp = feed_processor.nlp_processor
+    first = feed_processor.process_feed("https://example.com/feed", make_feed(ENTRIES))
+    assert first["processed"] == 3
+
+    with Session(setup_test_database) as session:
+        feed = session.exec(select(Feed)).one()
+    # Ingesting a feed pushes back its next scheduled poll
+    assert feed.next_poll_at >= datetime.utcnow() + timedelta(seconds=FEED_POLL_INTERVAL - 60)
+
+    extracted = len(nlp.texts)
+    again = feed_processor.process_feed("https://example.com/feed", make_feed(ENTRIES))
+    assert (again["processed"], again["skipped"]) == (0, 3)
+    assert len(nlp.texts) == extracted
+
+    changed = [("Climate policy", ENTRIES[0][1]), (ENTRIES[1][0], "Quantum sensors are improving."), ENTRIES[2]]
+    result = feed_processor.process_feed("https://example.com/feed", make_feed(changed))
+    assert (result["processed"], result["skipped"]) == (2, 1)
+    assert nlp.texts[extracted:] == [changed[0][1], changed[1][1]]
+    with Session(setup_test_database) as session:
+        posts = session.exec(select(Post).order_by(Post.url)).all()
+    assert [post.title for post in posts] == ["Climate policy", "Quantum", "Football"]
+    assert posts[1].content == "Quantum sensors are improving."
+
+def test_duplicate_link_falls_back_to_per_post_writes(feed_processor, setup_test_database):
+    entries = ENTRIES[:2] + [("Football", "Football season starts. The football league expands.")]
+    document = make_feed(entries).replace(b"https://example.com/2", b"https://example.com/0")
+    result = feed_processor.process_feed("https://example.com/feed", document)
+    assert result["processed"] == 2
+
+    with Session(setup_test_database) as session:
+        posts = session.exec(select(Post).order_by(Post.url)).all()
+        themes = session.exec(select(Theme).order_by(Theme.id)).all()
+    assert [post.title for post in posts] == ["Climate", "Quantum"]
+    # The theme created for the rejected duplicate is not left behind empty
+    assert [theme.post_count for theme in themes] == [1, 1]
+    assert {post.theme_id for post in posts} == {theme.id for theme in themes}
+    assert len(feed_processor.theme_index) == 2
+
+def test_download_is_timed_as_its_own_stage(feed_processor, serve_feeds):
+    serve_feeds(lambda request: httpx.Response(200, headers=RSS_HEADERS, content=make_feed(ENTRIES)))
+    result = feed_processor.process_feed("https://example.com/feed")
+    assert result["processed"] == 3
+    assert {"fetch", "parse", "thesis", "write"} <= set(result["timings"])
+
+def test_conditional_get_skips_unmodified_feeds_and_stores_new_validators(
+    feed_processor, setup_test_database, serve_feeds, monkeypatch
+):
+    versions = {"etag": '"v1"', "body": make_feed(ENTRIES[:2])}
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == versions["etag"]:
+            return httpx.Response(304, headers={"ETag": versions["etag"]})
+        headers = {**RSS_HEADERS, "ETag": versions["etag"], "Last-Modified": "Mon, 01 Jan 2024 10:00:00 GMT"}
+        return httpx.Response(200, headers=headers, content=versions["body"])
+
+    def stored_feed():
+        with Session(setup_test_database) as session:
+            return session.exec(select(Feed)).one()
+
+    serve_feeds(handler)
+    assert feed_processor.process_feed("https://example.com/feed")["processed"] == 2
+    feed = stored_feed()
+    assert (feed.etag, feed.last_modified, feed.last_status) == ('"v1"', "Mon, 01 Jan 2024 10:00:00 GMT", 200)
+
+    # A 304 ends processing before anything is parsed
+    parsed = []
+    with monkeypatch.context() as patch:
+        patch.setattr(feed_processor_module, "iter_entries", lambda body: parsed.append(body) or iter(()))
+        patch.setattr(feed_processor_module.feedparser, "parse", lambda *args, **kwargs: parsed.append(args))
+        result = feed_processor.process_feed("https://example.com/feed")
+    assert result["not_modified"] and result["processed"] == 0
+    assert parsed == []
+    assert serve_feeds.requests[-1].headers["If-None-Match"] == '"v1"'
+    assert serve_feeds.requests[-1].headers["If-Modified-Since"] == "Mon, 01 Jan 2024 10:00:00 GMT"
+    feed = stored_feed()
+    assert (feed.etag, feed.last_status) == ('"v1"', 304)
+
+    versions.update(etag='"v2"', body=make_feed(ENTRIES))
+    assert feed_processor.process_feed("https://example.com/feed")["processed"] == 1
+    feed = stored_feed()
+    assert (feed.etag, feed.last_status) == ('"v2"', 200)
@@ -0,0 +1,47 @@
+import io
+import xml.etree.ElementTree as ET
+
+import feedparser
+import pytest
+
+from app.feed_stream import iter_entries
+
+RSS = b"""<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>Feed</title>
+<item><title>First &amp; one</title><link>https://example.com/1</link>
+<pubDate>Mon, 01 Jan 2024 10:00:00 GMT</pubDate><description>Short</description>
+<content:encoded><![CDATA[<p>Full <b>body</b> of the first post.</p>]]></content:encoded></item>
+<item><title>Second</title><link>https://example.com/2</link><description>Second body.</description></item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>Feed</title>
+<entry><title>Atom post</title><link href="https://example.com/a"/><id>urn:a</id>
+<updated>2024-01-02T10:00:00Z</updated><content type="html">&lt;p&gt;Atom body.&lt;/p&gt;</content></entry>
+</feed>"""
+
+@pytest.mark.parametrize("document", [RSS, ATOM])
+def test_streamed_entries_match_feedparser(document):
+    expected = feedparser.parse(document).entries
+    streamed = list(iter_entries(io.BytesIO(document)))
+    assert len(streamed) == len(expected)
+    for entry, reference in zip(streamed, expected):
+        for key in ("title", "link", "id", "published_parsed", "updated_parsed", "summary"):
+            assert entry.get(key) == reference.get(key)
+        assert [c.value for c in entry.get("content", [])] == [c.value for c in reference.get("content", [])]
+
+def test_malformed_feed_is_recovered_by_feedparser():
+    document = RSS.replace(b"</channel></rss>", b"<item><title>broken")
+    streamed = list(iter_entries(io.BytesIO(document)))
+    assert [entry.get("link") for entry in streamed] == [entry.get("link") for entry in feedparser.parse(document).entries]
+    assert streamed[0].link == "https://example.com/1"
+
+def test_document_without_entries_raises():
+    with pytest.raises(ET.ParseError):
+        list(iter_entries(io.BytesIO(b"<html><body>Not a feed")))
+
+def test_html_entities_fall_back_to_feedparser():
+    document = RSS.replace(b"Second</title>", b"Second&nbsp;&mdash; post</title>")
+    streamed = list(iter_entries(io.BytesIO(document)))
+    assert [entry.link for entry in streamed] == ["https://example.com/1", "https://example.com/2"]
+    assert streamed[1].title == "Second — post"
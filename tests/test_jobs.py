@@ -0,0 +1,60 @@
+import threading
+import time
+
+from conftest import KeywordNLP, sqlite_engine
+
+from app import feed_processor as feed_processor_module
+from app import jobs as jobs_module
+from app.jobs import JobQueue
+
+FEED = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>
+<item><title>Climate</title><link>https://example.com/1</link><description>Climate change is hurting crops.</description></item>
+</channel></rss>"""
+
+class BlockingNLP(KeywordNLP):
+    """Holds the feed processor's write lock in theme assignment until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.assigning = threading.Event()
+        self.release = threading.Event()
+
+    def find_similar_theme(self, embedding, theme_index, threshold=0.8):
+        self.assigning.set()
+        self.release.wait(10)
+        return super().find_similar_theme(embedding, theme_index, threshold)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_submit_returns_while_a_feed_is_being_processed(feed_processor, monkeypatch, tmp_path):
+    # Threads need their own connections, which the shared in-memory test database can't give them
+    engine = sqlite_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    monkeypatch.setattr(feed_processor_module, "engine", engine)
+    monkeypatch.setattr(jobs_module, "engine", engine)
+    nlp = BlockingNLP()
+    feed_processor.nlp_processor = nlp
+    feed_path = tmp_path / "feed.xml"
+    feed_path.write_bytes(FEED.replace(b"example.com/1", b"example.com/2"))
+
+    writer = threading.Thread(target=feed_processor.process_feed, args=("https://example.com/feed", FEED))
+    writer.start()
+    queue = JobQueue(feed_processor, workers=1)
+    try:
+        assert nlp.assigning.wait(5)
+        start = time.time()
+        job = queue.submit(str(feed_path))
+        assert time.time() - start < 1
+        # The job starts and records progress while the other feed holds the write lock
+        assert wait_for(lambda: queue.get(job.id).status == "running")
+    finally:
+        nlp.release.set()
+        writer.join()
+        queue.shutdown()
+    assert queue.get(job.id).status == "completed"
+    assert queue.get(job.id).processed == 1
@@ -0,0 +1,128 @@
+import json
+from datetime import datetime
+from email.utils import format_datetime
+
+def make_feed(entries):
+    """RSS document of (link number, published date, body) entries."""
+    items = "".join(
+        f"<item><title>Post {number}</title><link>https://example.com/{number}</link>"
+        f"<pubDate>{format_datetime(published)}</pubDate><description>{body}</description></item>"
+        for number, published, body in entries
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>{items}</channel></rss>'.encode()
+
+CLIMATE = "Climate change is hurting crops."
+QUANTUM = "Quantum computers use qubits."
+MIXED = "Climate models run on quantum computers."
+
+def day(number):
+    return datetime(2024, 1, number)
+
+def themes_by_thesis(api):
+    return {theme["thesis"]: theme for theme in api.get("/themes").json()}
+
+def test_theme_timeline_pages_oldest_first_within_dates(api, feed_processor):
+    entries = [(number, day(number), f"{CLIMATE} Story {number}.") for number in (5, 1, 3, 2, 4)]
+    feed_processor.process_feed("https://example.com/feed", make_feed(entries))
+    theme = themes_by_thesis(api)["Climate change is hurting crops"]
+    assert (theme["post_count"], theme["first_seen_at"], theme["last_seen_at"]) == (
+        5, "2024-01-01T00:00:00", "2024-01-05T00:00:00"
+    )
+
+    pages, cursor = [], None
+    while True:
+        response = api.get(f"/themes/{theme['id']}", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        assert response.json()["post_count"] == 5
+        pages.append([post["title"] for post in response.json()["posts"]])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [["Post 1", "Post 2"], ["Post 3", "Post 4"], ["Post 5"]]
+
+    window = api.get(f"/themes/{theme['id']}", params={"start": "2024-01-02", "end": "2024-01-04"})
+    assert [post["title"] for post in window.json()["posts"]] == ["Post 2", "Post 3", "Post 4"]
+    assert "X-Next-Cursor" not in window.headers
+    assert api.get("/themes/999").status_code == 404
+
+def test_theme_stats_follow_reingest_and_merge(api, feed_processor):
+    feed_processor.process_feed("https://example.com/feed", make_feed([
+        (1, day(1), CLIMATE), (2, day(2), CLIMATE), (3, day(3), QUANTUM), (4, day(4), MIXED),
+    ]))
+    themes = themes_by_thesis(api)
+    assert {thesis: theme["post_count"] for thesis, theme in themes.items()} == {
+        "Climate change is hurting crops": 2, "Quantum computers use qubits": 1, "Climate models run on quantum computers": 1
+    }
+
+    # A changed post moves to another theme, taking its count and date with it
+    feed_processor.process_feed("https://example.com/feed", make_feed([
+        (1, day(1), CLIMATE), (2, day(2), QUANTUM), (3, day(3), QUANTUM), (4, day(4), MIXED),
+    ]))
+    themes = themes_by_thesis(api)
+    assert themes["Climate change is hurting crops"]["post_count"] == 1
+    quantum = themes["Quantum computers use qubits"]
+    assert (quantum["post_count"], quantum["first_seen_at"], quantum["last_seen_at"]) == (
+        2, "2024-01-02T00:00:00", "2024-01-03T00:00:00"
+    )
+
+    # Merging folds the mixed theme into the larger quantum theme, widening its dates
+    assert feed_processor.recluster_themes(threshold=0.7)["merged"] == 1
+    themes = themes_by_thesis(api)
+    assert {thesis: theme["post_count"] for thesis, theme in themes.items()} == {
+        "Climate change is hurting crops": 1, "Quantum computers use qubits": 3
+    }
+    quantum = themes["Quantum computers use qubits"]
+    assert (quantum["first_seen_at"], quantum["last_seen_at"]) == ("2024-01-02T00:00:00", "2024-01-04T00:00:00")
+    timeline = api.get(f"/themes/{quantum['id']}").json()
+    assert [post["title"] for post in timeline["posts"]] == ["Post 2", "Post 3", "Post 4"]
+
+def test_theme_stats_skip_posts_that_failed_to_save(api, feed_processor):
+    # Post 3 repeats the link of post 1, so it is rejected along with the theme created for it
+    document = make_feed([(1, day(1), CLIMATE), (2, day(2), CLIMATE), (3, day(3), QUANTUM)])
+    feed_processor.process_feed("https://example.com/feed", document.replace(b"example.com/3", b"example.com/1"))
+    themes = api.get("/themes").json()
+    assert [(theme["post_count"], theme["first_seen_at"], theme["last_seen_at"]) for theme in themes] == [
+        (2, "2024-01-01T00:00:00", "2024-01-02T00:00:00")
+    ]
+
+def test_posts_pages_project_fields(api, feed_processor):
+    entries = [(number, day(6 - number), f"{CLIMATE} Story {number}.") for number in range(1, 6)]
+    feed_processor.process_feed("https://example.com/feed", make_feed(entries))
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, "fields": "title,published_at", "order_by": "published_at"}
+        response = api.get("/posts", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        assert all(set(post) == {"title", "published_at"} for post in response.json())
+        pages.append([post["title"] for post in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [["Post 5", "Post 4"], ["Post 3", "Post 2"], ["Post 1"]]
+
+    response = api.get("/posts", params={"fields": "id,embedding,secret"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: embedding, secret"
+    assert api.get("/themes", params={"fields": "content"}).status_code == 400
+    assert api.get("/posts", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_posts_stream_as_ndjson(api, feed_processor):
+    entries = [(number, day(number), f"{CLIMATE} Story {number}.") for number in range(1, 6)]
+    feed_processor.process_feed("https://example.com/feed", make_feed(entries))
+
+    def stream(**params):
+        response = api.get("/posts", params={"format": "ndjson", "fields": "id,title", **params})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert "X-Next-Cursor" not in response.headers
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    rows = stream()
+    assert [row["title"] for row in rows] == [f"Post {number}" for number in range(1, 6)]
+    assert all(set(row) == {"id", "title"} for row in rows)
+    assert len(stream(limit=2)) == 2
+
+    # A cursor from a JSON page resumes the stream after that page
+    cursor = api.get("/posts", params={"limit": 2}).headers["X-Next-Cursor"]
+    assert [row["title"] for row in stream(cursor=cursor)] == ["Post 3", "Post 4", "Post 5"]
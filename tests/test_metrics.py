@@ -0,0 +1,21 @@
+from app.metrics import observe_feed, render
+from app.profiling import StackSampler
+from app.text_processing import split_sentences
+
+def test_observe_feed_is_rendered():
+    observe_feed({"parse": 0.2, "write": 0.05, "total": 1.5}, processed=3, skipped=2, failed=1)
+    body, content_type = render()
+    text = body.decode()
+    assert content_type.startswith("text/plain")
+    assert 'pipeline_stage_seconds_count{stage="parse"}' in text
+    assert "feed_processing_seconds_count" in text
+    assert 'feed_entries_total{result="skipped"}' in text
+
+def test_stack_sampler_records_app_frames():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    try:
+        split_sentences("<p>" + "Prices rose again this week. " * 50000 + "</p>")
+    finally:
+        sampler.stop()
+    assert "text_processing.py:split_sentences" in sampler.folded()
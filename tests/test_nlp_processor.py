@@ -1,8 +1,9 @@
 import pytest
+from app.embedding_cache import EmbeddingCache
 from app.nlp_processor import NLPProcessor
 
 def test_extract_thesis():
-    processor = NLPProcessor()
+    processor = NLPProcessor(cache=EmbeddingCache(disk=False))
     
     # Test with a simple text
     text = "This is the first sentence. This is a similar sentence. This is a different topic."
@@ -13,7 +14,7 @@ def test_extract_thesis():
     assert all(s in text for s in thesis)
 
 def test_find_similar_theme():
-    processor = NLPProcessor()
+    processor = NLPProcessor(cache=EmbeddingCache(disk=False))
     
     # Test with similar themes
     existing_themes = [
@@ -35,4 +36,21 @@ def test_find_similar_theme():
         existing_themes
     )
     assert not is_similar
-    assert theme_id is None 
\ No newline at end of file
+    assert theme_id is None
+
+def test_extract_thesis_batch_matches_single():
+    processor = NLPProcessor(cache=EmbeddingCache(disk=False))
+    
+    texts = [
+        "Climate change is hurting crops. Farmers face longer droughts. Yields are falling.",
+        "",
+        "Quantum computers use qubits. Error correction is the main challenge."
+    ]
+    results = processor.extract_thesis_batch(texts)
+    
+    assert len(results) == len(texts)
+    assert results[1] == ([], None)
+    for text, (thesis, embedding) in zip(texts, results):
+        if text:
+            assert thesis == processor.extract_thesis(text)
+            assert abs(float((embedding ** 2).sum()) - 1.0) < 1e-4
@@ -0,0 +1,56 @@
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+import numpy as np
+import pytest
+from app.nlp_worker import EmbeddingServer, RemoteEncoder, parse_address
+
+class LengthEncoder:
+    """Embeds a text as [len(text), 1] and records the size of each batch."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode(self, texts, batch_size):
+        self.batch_sizes.append(len(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+def test_parse_address():
+    assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+    assert parse_address("/tmp/nlp.sock") == "/tmp/nlp.sock"
+
+def test_concurrent_requests_are_batched():
+    encoder = LengthEncoder()
+    server = EmbeddingServer(encoder, max_batch=64, max_wait=0.2)
+    listener = Listener(("127.0.0.1", 0), backlog=64, authkey=b"test-key")
+    threading.Thread(target=server.serve_forever, args=(listener,), daemon=True).start()
+    client = RemoteEncoder("m", address="%s:%d" % listener.address, spawn=False, authkey="test-key")
+
+    results = {}
+    def request(i):
+        results[i] = client.encode(["x" * i, "y"], batch_size=2)
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(1, 9):
+        assert results[i].tolist() == [[i, 1.0], [1, 1.0]]
+    assert sum(encoder.batch_sizes) == 16
+    assert len(encoder.batch_sizes) < 8
+
+def test_wrong_authkey_is_rejected():
+    server = EmbeddingServer(LengthEncoder())
+    listener = Listener(("127.0.0.1", 0), backlog=64, authkey=b"test-key")
+    threading.Thread(target=server.serve_forever, args=(listener,), daemon=True).start()
+    client = RemoteEncoder("m", address="%s:%d" % listener.address, spawn=False, authkey="wrong")
+
+    with pytest.raises(AuthenticationError):
+        client.encode(["x"], batch_size=1)
+
+def test_empty_authkey_starts_a_private_worker():
+    client = RemoteEncoder("m", address="0.0.0.0:8765", spawn=False, authkey="")
+    assert not client.shared
+    assert client.address == "127.0.0.1:0" and len(client.authkey) == 32
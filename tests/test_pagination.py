@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, parse_fields
+
+def test_cursor_round_trip():
+    published_at = datetime(2024, 1, 2, 3, 4, 5)
+    assert decode_cursor(encode_cursor([42]), "id") == [42]
+    assert decode_cursor(encode_cursor([published_at, 42]), "published_at") == [published_at, 42]
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor("not-a-cursor", "id")
+    assert excinfo.value.status_code == 400
+
+def test_parse_fields():
+    allowed = ("id", "title", "content")
+    assert parse_fields(None, allowed) == ["id", "title", "content"]
+    assert parse_fields("id, title", allowed) == ["id", "title"]
+    with pytest.raises(HTTPException):
+        parse_fields("id,secret", allowed)
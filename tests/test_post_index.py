@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from app.post_index import PostIndex
+from app.theme_index import normalize
+
+def test_search_ranks_stored_posts(tmp_path):
+    index = PostIndex(str(tmp_path / "posts.f32"), model_name="test")
+    vectors = normalize(np.random.default_rng(0).normal(size=(50, 8)))
+    index.update((post_id, vectors[post_id]) for post_id in range(1, 50, 2))
+
+    assert len(index) == 25
+    assert index.search(vectors[7], 1) == [(7, pytest.approx(1.0, abs=1e-5))]
+    # Posts without an embedding are never returned, even when filtered for
+    assert [post_id for post_id, _ in index.search(vectors[8], 50)] == sorted(
+        range(1, 50, 2), key=lambda i: -float(vectors[i] @ vectors[8])
+    )
+    filtered = index.search(vectors[7], 3, post_ids=[8, 9, 11])
+    assert sorted(post_id for post_id, _ in filtered) == [9, 11]
+
+def test_update_clears_rows_and_grows_file(tmp_path):
+    index = PostIndex(str(tmp_path / "posts.f32"), model_name="test")
+    index.update([(3, np.ones(4))])
+    index.update([(3, None), (5000, np.ones(4))])
+
+    assert len(index) == 1
+    assert index.size == 5001
+    assert [post_id for post_id, _ in index.search(np.ones(4), 5)] == [5000]
@@ -0,0 +1,50 @@
+from app.response_cache import ALL, ResponseCache, etag_matches, response_key, route_tags, theme_tag
+
+def store(cache, key, body, tags):
+    return cache.set(key, body, {"content-type": "application/json"}, cache.versions(tags))
+
+def test_route_tags_and_keys():
+    assert route_tags("/themes/7") == (ALL, theme_tag(7))
+    assert route_tags("/posts") == (ALL, "posts")
+    assert route_tags("/posts/search") is None
+    assert route_tags("/metrics") is None
+    assert response_key("/posts", [("limit", "5"), ("cursor", "a")]) == response_key("/posts", [("cursor", "a"), ("limit", "5")])
+
+def test_invalidation_is_per_tag():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    theme_one = store(cache, "/themes/1?", b'{"theme_id": 1}', route_tags("/themes/1"))
+    store(cache, "/themes/2?", b'{"theme_id": 2}', route_tags("/themes/2"))
+    assert cache.get("/themes/1?").etag == theme_one.etag
+
+    cache.invalidate([theme_tag(1)])
+    assert cache.get("/themes/1?") is None
+    assert cache.get("/themes/2?") is not None
+
+    cache.invalidate([ALL])
+    assert cache.get("/themes/2?") is None
+
+def test_entry_rendered_before_invalidation_is_stale():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    versions = cache.versions(route_tags("/posts"))
+    cache.invalidate(["posts"])
+    cache.set("/posts?", b"[]", {}, versions)
+    assert cache.get("/posts?") is None
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    for number in range(3):
+        store(cache, f"/posts?cursor={number}", b"[]", route_tags("/posts"))
+    assert cache.get("/posts?cursor=0") is None
+    assert cache.get("/posts?cursor=2") is not None
+
+    expired = ResponseCache(max_entries=2, ttl=0)
+    store(expired, "/posts?", b"[]", route_tags("/posts"))
+    assert expired.get("/posts?") is None
+
+def test_etag_matching():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc", "def"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"def"', etag)
+    assert not etag_matches(None, etag)
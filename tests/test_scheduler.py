@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app import scheduler as scheduler_module
+from app.models import Feed
+from app.scheduler import FeedScheduler
+
+class RecordingScheduler:
+    """Records the poll jobs FeedScheduler starts instead of running them."""
+
+    def __init__(self):
+        self.polled = []
+
+    def add_job(self, func, args, **kwargs):
+        self.polled.extend(args)
+
+def test_next_poll_at_backs_off_with_jitter():
+    scheduler = FeedScheduler(None, interval=100, max_backoff=350)
+    for error_count, delay in [(0, 100), (1, 200), (2, 350), (10, 350)]:
+        before = datetime.utcnow()
+        next_poll_at = scheduler._next_poll_at(error_count)
+        after = datetime.utcnow()
+        assert before + timedelta(seconds=delay) <= next_poll_at <= after + timedelta(seconds=delay + 10)
+
+def test_poll_due_feeds_skips_feeds_already_running(setup_test_database, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "engine", setup_test_database)
+    now = datetime.utcnow()
+    with Session(setup_test_database) as session:
+        session.add_all([
+            Feed(url="https://example.com/new"),
+            Feed(url="https://example.com/due", next_poll_at=now - timedelta(minutes=1)),
+            Feed(url="https://example.com/later", next_poll_at=now + timedelta(hours=1)),
+            Feed(url="https://example.com/inactive", active=False),
+        ])
+        session.commit()
+
+    scheduler = FeedScheduler(None)
+    scheduler.scheduler = RecordingScheduler()
+    scheduler.poll_due_feeds()
+    assert sorted(scheduler.scheduler.polled) == ["https://example.com/due", "https://example.com/new"]
+
+    # Polls still running are not started again on the next tick
+    scheduler.poll_due_feeds()
+    assert len(scheduler.scheduler.polled) == 2
+
+    scheduler._running.discard("https://example.com/due")
+    scheduler.poll_due_feeds()
+    assert scheduler.scheduler.polled[2:] == ["https://example.com/due"]
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app import database, search
+from app.models import Post
+from app.search import fts_query, search_posts, semantic_search
+
+def test_fts_query_quotes_words():
+    assert fts_query("climate change") == '"climate" "change"'
+    assert fts_query('AND "drought" -NEAR(') == '"AND" "drought" "NEAR"'
+    assert fts_query("!!") == ""
+
+@pytest.fixture
+def search_database(setup_test_database, monkeypatch):
+    monkeypatch.setattr(database, "engine", setup_test_database)
+    monkeypatch.setattr(search, "engine", setup_test_database)
+    database._create_search_index()
+    return setup_test_database
+
+def add_posts(engine, posts):
+    with Session(engine) as session:
+        for number, (title, content) in enumerate(posts):
+            session.add(Post(
+                title=title, content=content, url=f"https://example.com/{number}",
+                published_at=datetime(2024, 1, 1 + number)
+            ))
+        session.commit()
+
+def titles(results):
+    return [result["title"] for result in results]
+
+def test_title_matches_rank_first_with_snippets(search_database):
+    add_posts(search_database, [
+        ("Farming news", "Droughts are getting longer and harder on farmers."),
+        ("Drought warning", "Reservoirs are low across the region."),
+        ("Football", "The season starts next week."),
+    ])
+    results, next_cursor = search_posts("drought", None, 10)
+    assert titles(results) == ["Drought warning", "Farming news"]
+    assert next_cursor is None
+    assert "<b>Droughts</b>" in results[1]["snippet"]
+    assert results[0]["score"] <= results[1]["score"]
+
+def test_index_follows_updates_and_deletes(search_database):
+    add_posts(search_database, [("Quantum computing", "Qubits are fragile."), ("Weather", "Rain is expected.")])
+    with Session(search_database) as session:
+        quantum, weather = session.exec(select(Post).order_by(Post.id)).all()
+        weather.content = "Qubits might forecast rain one day."
+        session.add(weather)
+        session.delete(quantum)
+        session.commit()
+
+    assert titles(search_posts("qubits", None, 10)[0]) == ["Weather"]
+    assert search_posts("fragile", None, 10)[0] == []
+    assert search_posts("expected", None, 10)[0] == []
+
+def test_cursor_pages_through_all_matches(search_database):
+    add_posts(search_database, [(f"Solar report {number}", "Solar panels " * (number + 1)) for number in range(5)])
+    pages, cursor = [], None
+    while True:
+        results, cursor = search_posts("solar", cursor, 2)
+        pages.append(titles(results))
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(sum(pages, [])) == [f"Solar report {number}" for number in range(5)]
+    # Later pages never rank better than earlier ones
+    everything = titles(search_posts("solar", None, 10)[0])
+    assert sum(pages, []) == everything
+
+def test_semantic_search_embeds_query_as_a_thesis_and_filters_exactly(
+    search_database, feed_processor, monkeypatch
+):
+    entries = "".join(
+        f"<item><title>Post {number}</title><link>https://example.com/{number}</link>"
+        f"<pubDate>Mon, {number + 1:02d} Jan 2024 10:00:00 GMT</pubDate><description>{body}</description></item>"
+        for number, body in enumerate([
+            "Climate change is hurting crops.", "Quantum climate models are improving.",
+            "Quantum computers use qubits.", "Climate policy climate targets are slipping.",
+        ])
+    )
+    document = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>{entries}</channel></rss>'
+    feed_processor.process_feed("https://example.com/feed", document.encode())
+
+    nlp = feed_processor.nlp_processor
+    extracted = len(nlp.texts)
+    results = semantic_search(feed_processor, "Climate and quantum climate research.", k=2, kind="posts")
+    assert nlp.texts[extracted:] == ["Climate and quantum climate research."]
+    assert [post["title"] for post in results["posts"]] == ["Post 1", "Post 0"]
+    assert "themes" not in results
+
+    start = datetime(2024, 1, 3)
+    expected = semantic_search(feed_processor, "climate", k=2, kind="posts", start=start)["posts"]
+    assert [post["title"] for post in expected] == ["Post 3", "Post 2"]
+    # Broad filters rank the index first and check candidates in SQL, with the same result
+    monkeypatch.setattr(search, "FILTERED_SCAN_ROWS", 0)
+    assert semantic_search(feed_processor, "climate", k=2, kind="posts", start=start)["posts"] == expected
+    assert semantic_search(feed_processor, "!!", k=2) == {"query": "!!", "posts": [], "themes": []}
@@ -0,0 +1,48 @@
+from app.text_processing import sample_sentences, split_sentences, strip_html
+
+def test_strip_html_drops_scripts_and_unescapes():
+    html = "<p>Prices rose &amp; fell.</p><script>var x = 1;</script><style>p {}</style><div>Next block</div>"
+    text = strip_html(html)
+    assert "var x" not in text and "p {}" not in text
+    assert "Prices rose & fell." in text
+    assert "\n" in text.split("fell.")[1]
+
+def test_split_sentences_skips_markup_urls_and_fragments():
+    html = (
+        "<h2>Menu</h2><p>Inflation hit 3.5 percent in May. See https://example.com/report.html for details. "
+        "Economists expect v2.1 of the model soon!</p><p>Read more</p>"
+    )
+    assert split_sentences(html) == [
+        "Inflation hit 3.5 percent in May.",
+        "See for details.",
+        "Economists expect v2.1 of the model soon!",
+    ]
+
+def test_split_sentences_keeps_short_text():
+    assert split_sentences("Hello world") == ["Hello world"]
+    assert split_sentences("<p> </p>") == []
+
+def test_sample_sentences_keeps_lead_and_spread():
+    sentences = [f"Sentence number {i}." for i in range(100)]
+    sampled = sample_sentences(sentences, 10)
+    assert len(sampled) == 10
+    assert sampled[:5] == sentences[:5]
+    assert sampled[-1] in sentences[90:]
+    assert sample_sentences(sentences[:5], 10) == sentences[:5]
+    assert sample_sentences(sentences, 0) == sentences
+
+def test_split_sentences_keeps_closing_quotes_and_brackets():
+    text = (
+        'He said "Stop the vote." Then the crowd left. (It was late at night.) '
+        '"Go home," they said!" Nobody moved at all.'
+    )
+    assert split_sentences(text) == [
+        'He said "Stop the vote."',
+        "Then the crowd left.",
+        "(It was late at night.)",
+        '"Go home," they said!"',
+        "Nobody moved at all.",
+    ]
+    assert split_sentences('The report ("final.") Was published today.') == [
+        'The report ("final.")', "Was published today."
+    ]
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.models import Post, Theme
+from app.theme_clustering import find_merges, recluster_themes
+from app.theme_index import to_blob
+
+def test_find_merges_absorbs_into_largest_theme_without_chaining():
+    ids = np.array([1, 2, 3, 4])
+    matrix = np.array([
+        [1.0, 0.0, 0.0],
+        [0.95, 0.31, 0.0],  # close to theme 1
+        [0.6, 0.8, 0.0],  # close to theme 2 but not to theme 1
+        [0.0, 0.0, 1.0],
+    ])
+    counts = np.array([1, 5, 1, 1])
+
+    merges = find_merges(ids, matrix, counts, threshold=0.9, chunk_size=2)
+    assert merges == {1: 2}
+    assert find_merges(ids, matrix, counts, threshold=0.7, chunk_size=1) == {1: 2, 3: 2}
+
+def test_recluster_reassigns_posts_and_folds_stats(setup_test_database):
+    with Session(setup_test_database) as session:
+        themes = [
+            Theme(thesis="a", post_count=2, first_seen_at=datetime(2024, 1, 5), last_seen_at=datetime(2024, 1, 6)),
+            Theme(thesis="b", post_count=1, first_seen_at=datetime(2024, 1, 1), last_seen_at=datetime(2024, 1, 2)),
+            Theme(thesis="c", post_count=1, first_seen_at=datetime(2024, 2, 1), last_seen_at=datetime(2024, 2, 1)),
+        ]
+        session.add_all(themes)
+        session.flush()
+        vectors = {
+            themes[0].id: [np.array([1.0, 0.0]), np.array([1.0, 0.1])],
+            themes[1].id: [np.array([1.0, 0.05])],
+            themes[2].id: [np.array([0.0, 1.0])],
+        }
+        for theme_id, embeddings in vectors.items():
+            for i, embedding in enumerate(embeddings):
+                session.add(Post(
+                    title="t", url=f"https://example.com/{theme_id}/{i}", content="c",
+                    published_at=datetime(2024, 1, 1), theme_id=theme_id,
+                    embedding=to_blob(embedding), embedding_model="model"
+                ))
+        session.commit()
+
+        result = recluster_themes(session, "model", threshold=0.95)
+        assert result == {"themes": 3, "merged": 1, "remaining": 2, "centroids_recomputed": 3}
+
+        remaining = session.exec(select(Theme).order_by(Theme.id)).all()
+        assert [theme.thesis for theme in remaining] == ["a", "c"]
+        assert remaining[0].post_count == 3
+        assert remaining[0].first_seen_at == datetime(2024, 1, 1)
+        assert remaining[0].last_seen_at == datetime(2024, 1, 6)
+        assert np.allclose(np.frombuffer(remaining[0].embedding, dtype=np.float32), [1.0, 0.05])
+        assert set(session.exec(select(Post.theme_id)).all()) == {remaining[0].id, remaining[1].id}
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlmodel import Session, select
+
+from app.models import Post, Theme
+from app.theme_index import ThemeIndex, encode_stale_themes, from_blob, normalize, to_blob
+
+def test_search_returns_closest_theme():
+    index = ThemeIndex()
+    index.add(1, np.array([1.0, 0.0, 0.0]))
+    index.add(2, np.array([0.0, 2.0, 0.0]))
+
+    theme_id, similarity = index.search(np.array([0.1, 0.9, 0.0]))
+    assert theme_id == 2
+    assert similarity == pytest.approx(0.9 / np.linalg.norm([0.1, 0.9]), rel=1e-5)
+
+def test_add_grows_matrix_and_keeps_rows():
+    index = ThemeIndex()
+    vectors = normalize(np.random.default_rng(0).normal(size=(40, 8)))
+    for i, vector in enumerate(vectors):
+        index.add(i + 1, vector)
+
+    assert len(index) == 40
+    assert np.allclose(index.matrix, vectors, atol=1e-6)
+    assert index.search(vectors[17]) == (18, pytest.approx(1.0, abs=1e-5))
+
+def test_empty_index_and_blob_round_trip():
+    assert ThemeIndex().search(np.ones(4)) == (None, 0.0)
+    vector = np.arange(4, dtype=np.float32)
+    assert np.array_equal(from_blob(to_blob(vector)), vector)
+
+def test_add_rejects_dimension_mismatch():
+    index = ThemeIndex()
+    index.add(1, np.ones(4))
+    with pytest.raises(ValueError):
+        index.add(2, np.ones(3))
+
+def _clustered(size, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.normal(size=(size // 20, dim)))
+    return normalize(centers[rng.integers(0, len(centers), size=size)] + 0.3 * normalize(rng.normal(size=(size, dim))))
+
+def test_ivf_backend_matches_exact_search():
+    vectors = _clustered(2000)
+    index = ThemeIndex(backend="ivf", min_size=1000)
+    for i, vector in enumerate(vectors):
+        index.add(i + 1, vector)
+
+    hits = sum(index.search(v)[0] == index.search_exact(v)[0] for v in vectors[:200])
+    assert hits >= 190
+
+def test_ann_backend_persists_and_restores(tmp_path):
+    vectors = _clustered(600)
+    index = ThemeIndex(backend="ivf", min_size=500, model_name="test-model")
+    for i, vector in enumerate(vectors[:550]):
+        index.add(i + 1, vector)
+    index.save(str(tmp_path))
+    assert (tmp_path / "theme_index.ivf").exists()
+
+    restored = ThemeIndex(model_name="test-model")
+    for i, vector in enumerate(vectors):
+        restored.add(i + 1, vector)
+    restored.backend = "ivf"
+    restored._restore_ann(str(tmp_path))
+
+    assert len(restored._ann) == 600
+    assert restored.search(vectors[590])[0] == 591
+
+def test_remove_drops_rows():
+    index = ThemeIndex()
+    index.add(1, np.array([1.0, 0.0]))
+    index.add(2, np.array([0.0, 1.0]))
+    index.add(3, np.array([1.0, 1.0]))
+
+    index.remove([2])
+    assert index.ids == [1, 3]
+    assert index.search(np.array([0.0, 1.0]))[0] == 3
+
+def test_update_replaces_rows_in_place():
+    index = ThemeIndex()
+    index.add(1, np.array([1.0, 0.0]))
+    index.add(2, np.array([0.0, 1.0]))
+    index.update({2: np.array([3.0, 0.3]), 99: np.array([1.0, 1.0])})
+
+    assert index.ids == [1, 2]
+    assert np.allclose(index.matrix[1], normalize(np.array([3.0, 0.3])))
+    assert index.search(np.array([1.0, 0.1]))[0] == 2
+
+class ThesisProcessor:
+    """Stands in for NLPProcessor; records the texts it extracts theses from."""
+    model_name = "model"
+
+    def __init__(self):
+        self.texts = []
+
+    def extract_thesis_batch(self, texts):
+        self.texts.extend(texts)
+        return [([text], np.array([0.0, 1.0])) for text in texts]
+
+def test_stale_themes_use_post_centroid_or_thesis_extraction(setup_test_database):
+    with Session(setup_test_database) as session:
+        with_posts = Theme(thesis="with posts", embedding=to_blob(np.array([9.0, 9.0])), embedding_model="old")
+        without_posts = Theme(thesis="without posts")
+        session.add_all([with_posts, without_posts])
+        session.flush()
+        for i, embedding in enumerate([[1.0, 0.0], [0.5, 0.5]]):
+            session.add(Post(
+                title="t", url=f"https://example.com/{i}", content="c", published_at=datetime(2024, 1, 1),
+                theme_id=with_posts.id, embedding=to_blob(np.array(embedding)), embedding_model="model"
+            ))
+        session.commit()
+
+        processor = ThesisProcessor()
+        assert encode_stale_themes(session, processor) == 2
+        assert processor.texts == ["without posts"]
+        embeddings = dict(session.exec(select(Theme.thesis, Theme.embedding)).all())
+        assert np.allclose(from_blob(embeddings["with posts"]), [0.75, 0.25])
+        assert np.allclose(from_blob(embeddings["without posts"]), [0.0, 1.0])
+        assert encode_stale_themes(session, processor) == 0
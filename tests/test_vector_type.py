@@ -0,0 +1,20 @@
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+
+from app.models import Theme
+from app.theme_index import to_blob
+from app.vector_type import EMBEDDING_DIM, EmbeddingType, pgvector_enabled
+
+def test_embedding_column_type_per_dialect():
+    assert pgvector_enabled("postgresql")
+    assert not pgvector_enabled("sqlite")
+    assert "VECTOR(384)" in str(CreateTable(Theme.__table__).compile(dialect=postgresql.psycopg2.dialect()))
+    assert "embedding BLOB" in str(CreateTable(Theme.__table__).compile(dialect=sqlite.dialect()))
+
+def test_embedding_round_trips_as_blob():
+    dialect = postgresql.psycopg2.dialect()
+    embedding_type = EmbeddingType().dialect_impl(dialect)
+    blob = to_blob(np.arange(EMBEDDING_DIM, dtype=np.float32))
+    bound = embedding_type.bind_processor(dialect)(blob)
+    assert embedding_type.result_processor(dialect, None)(bound) == blob